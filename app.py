@@ -2,8 +2,21 @@ from flask import Flask
 from flask_migrate import Migrate
 from flask_jwt_extended import JWTManager
 from flask_cors import CORS
-from datetime import timedelta
+from werkzeug.middleware.proxy_fix import ProxyFix
 from models import db
+from config import Config, engine_options, replica_binds
+from cache import cache
+from compression import compression
+from commands import blog_cli
+from hashing import hasher
+from jobs import jobs
+from ratelimit import limiter
+from revocation import revocations
+from replicas import router as replica_router
+from search import search_engine
+from serializers import FastJSONProvider
+import entities
+import metrics
 
 from views import (
     UserRegisterAPI, LoginAPI,
@@ -11,54 +24,100 @@ from views import (
     CommentListAPI, CommentDetailAPI,
     CategoryListAPI, CategoryDetailAPI,
     UserListAPI, UserDetailAPI, UserRoleAPI, UserProfileAPI,
-    StatsAPI
+    StatsAPI, SearchAPI,
+    PostBatchAPI, CommentBatchDeleteAPI, PostCategoriesAPI,
+    UserFollowAPI, CategoryFollowAPI, FeedAPI
 )
 
-app = Flask(__name__)
-CORS(app)
+migrate = Migrate()
+jwt = JWTManager()
 
-# DB config
-app.secret_key = "clave_secreta"
-app.config['SQLALCHEMY_DATABASE_URI'] = "mysql+pymysql://root:@localhost/miniblog"
-app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
-# JWT config
-app.config['JWT_SECRET_KEY'] = 'jwt_clave_secreta'  
-app.config['JWT_ACCESS_TOKEN_EXPIRES'] = timedelta(hours=24)
+@jwt.token_in_blocklist_loader
+def check_if_token_revoked(jwt_header, jwt_payload):
+    """Rechaza los tokens emitidos antes de desactivar al usuario o cambiarle el rol"""
+    return revocations.is_revoked(jwt_payload)
 
-# Inicialización
-db.init_app(app)
-migrate = Migrate(app, db)
-jwt = JWTManager(app)
 
+def create_app(test_config=None):
+    """Crea la aplicación. La configuración sale de config.Config (variables de
+    entorno) y se puede sobreescribir con el diccionario test_config."""
+    app = Flask(__name__)
+    app.json = FastJSONProvider(app)
+    CORS(app)
 
-#### Registro de rutas ####
+    app.config.from_object(Config)
+    if test_config:
+        app.config.update(test_config)
+    app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', engine_options(app.config))
+    app.config.setdefault('SQLALCHEMY_BINDS', replica_binds(app.config))
 
-# Auth
-app.add_url_rule('/api/register', view_func=UserRegisterAPI.as_view('api_register'))
-app.add_url_rule('/api/login', view_func=LoginAPI.as_view('api_login'))
+    # Inicialización
+    db.init_app(app)
+    migrate.init_app(app, db)
+    jwt.init_app(app)
+    cache.init_app(app)
+    entities.init_app(app)
+    hasher.init_app(app)
+    jobs.init_app(app)
+    revocations.init_app(app)
+    replica_router.init_app(app)
+    search_engine.init_app(app)
+    metrics.init_app(app)
+    limiter.init_app(app)
+    # Después de metrics: sus after_request corren antes, así las métricas ven el tamaño comprimido
+    compression.init_app(app)
+    app.cli.add_command(blog_cli)
 
-# Posts
-app.add_url_rule('/api/posts', view_func=PostListAPI.as_view('api_posts'))
-app.add_url_rule('/api/posts/<int:post_id>', view_func=PostDetailAPI.as_view('api_post_detail'))
+    # Detrás de proxies la IP de la conexión es la del proxy: ProxyFix toma la
+    # del cliente de X-Forwarded-For (la usan los límites de peticiones por IP)
+    if app.config.get('PROXY_FIX_X_FOR'):
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=app.config['PROXY_FIX_X_FOR'])
 
-# Comentarios
-app.add_url_rule('/api/posts/<int:post_id>/comments', view_func=CommentListAPI.as_view('api_post_comments'))
-app.add_url_rule('/api/comments/<int:comment_id>', view_func=CommentDetailAPI.as_view('api_comment_detail'))
+    register_routes(app)
+    return app
 
-# Categorias
-app.add_url_rule('/api/categories', view_func=CategoryListAPI.as_view('api_categories'))
-app.add_url_rule('/api/categories/<int:category_id>', view_func=CategoryDetailAPI.as_view('api_category_detail'))
 
-# Usuarios (Admin)
-app.add_url_rule('/api/users/me', view_func=UserProfileAPI.as_view('api_user_profile')) # ruta adicional para ver el perfil de uno mismo sin indicar el id
-app.add_url_rule('/api/users', view_func=UserListAPI.as_view('api_users'))
-app.add_url_rule('/api/users/<int:user_id>', view_func=UserDetailAPI.as_view('api_user_detail'))
-app.add_url_rule('/api/users/<int:user_id>/role', view_func=UserRoleAPI.as_view('api_user_role'))
+def register_routes(app):
 
-# Estadísticas
-app.add_url_rule('/api/stats', view_func=StatsAPI.as_view('api_stats'))
+    # Auth
+    app.add_url_rule('/api/register', view_func=UserRegisterAPI.as_view('api_register'))
+    app.add_url_rule('/api/login', view_func=LoginAPI.as_view('api_login'))
+
+    # Posts
+    app.add_url_rule('/api/posts', view_func=PostListAPI.as_view('api_posts'))
+    app.add_url_rule('/api/posts/<int:post_id>', view_func=PostDetailAPI.as_view('api_post_detail'))
+    app.add_url_rule('/api/posts/<int:post_id>/categories', view_func=PostCategoriesAPI.as_view('api_post_categories'))
+
+    # Comentarios
+    app.add_url_rule('/api/posts/<int:post_id>/comments', view_func=CommentListAPI.as_view('api_post_comments'))
+    app.add_url_rule('/api/comments/<int:comment_id>', view_func=CommentDetailAPI.as_view('api_comment_detail'))
+
+    # Operaciones en lote
+    app.add_url_rule('/api/posts:batch', view_func=PostBatchAPI.as_view('api_posts_batch'))
+    app.add_url_rule('/api/comments:batch-delete', view_func=CommentBatchDeleteAPI.as_view('api_comments_batch_delete'))
+
+    # Categorias
+    app.add_url_rule('/api/categories', view_func=CategoryListAPI.as_view('api_categories'))
+    app.add_url_rule('/api/categories/<int:category_id>', view_func=CategoryDetailAPI.as_view('api_category_detail'))
+
+    # Usuarios (Admin)
+    app.add_url_rule('/api/users/me', view_func=UserProfileAPI.as_view('api_user_profile')) # ruta adicional para ver el perfil de uno mismo sin indicar el id
+    app.add_url_rule('/api/users', view_func=UserListAPI.as_view('api_users'))
+    app.add_url_rule('/api/users/<int:user_id>', view_func=UserDetailAPI.as_view('api_user_detail'))
+    app.add_url_rule('/api/users/<int:user_id>/role', view_func=UserRoleAPI.as_view('api_user_role'))
+
+    # Seguimientos y feed
+    app.add_url_rule('/api/users/<int:user_id>/follow', view_func=UserFollowAPI.as_view('api_user_follow'))
+    app.add_url_rule('/api/categories/<int:category_id>/follow', view_func=CategoryFollowAPI.as_view('api_category_follow'))
+    app.add_url_rule('/api/feed', view_func=FeedAPI.as_view('api_feed'))
+
+    # Búsqueda
+    app.add_url_rule('/api/search', view_func=SearchAPI.as_view('api_search'))
+
+    # Estadísticas
+    app.add_url_rule('/api/stats', view_func=StatsAPI.as_view('api_stats'))
 
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    create_app().run(debug=True)
@@ -0,0 +1,363 @@
+"""Modo de despliegue ASGI (opcional).
+
+Los GET públicos más pedidos (listado y detalle de posts, comentarios de un
+post y categorías) se atienden con corrutinas sobre el engine asyncio de
+SQLAlchemy, así una petición que espera a la base no ocupa un hilo. Pasan
+por los mismos decoradores (réplicas, GET condicionales, cache), las mismas
+consultas y los mismos serializadores que las vistas de views.py. El resto
+de las rutas, y los listados en streaming, los atiende la app Flask de
+siempre en un pool de ASGI_SYNC_THREADS hilos.
+
+Necesita el driver asyncio de la base (aiomysql para MySQL, aiosqlite para
+SQLite) y un servidor ASGI:
+
+    pip install aiomysql uvicorn
+    uvicorn asgi:create_asgi_app --factory --workers 4
+"""
+import asyncio
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import abort, g, request
+from sqlalchemy import select
+from sqlalchemy.orm import Session, selectinload
+
+import metrics
+from cache import cache
+from conditional import conditional
+from config import engine_options
+from entities import users
+from models import Post, Category
+from pagination import keyset_query, split_page, get_page_size, requested_position, InvalidCursor
+from ratelimit import rate_limit
+from replicas import read_replica
+from serializers import post_serializer, category_serializer
+from streaming import requested_stream_format
+from views import (
+    parse_post_filters, post_fieldset, comment_page_query, comment_page,
+    post_list_version, post_detail_version, comment_list_version, category_list_version
+)
+
+
+# Drivers asyncio equivalentes a los de DATABASE_URL
+ASYNC_DRIVERS = {
+    'mysql': 'mysql+aiomysql',
+    'mysql+pymysql': 'mysql+aiomysql',
+    'sqlite': 'sqlite+aiosqlite',
+    'postgresql': 'postgresql+asyncpg',
+    'postgresql+psycopg2': 'postgresql+asyncpg',
+}
+
+
+def async_url(url):
+    """URL para create_async_engine a partir de la URL síncrona"""
+    scheme, separator, rest = url.partition('://')
+    return ASYNC_DRIVERS.get(scheme, scheme) + separator + rest
+
+
+class ReadSession(Session):
+    """Sesión de las vistas async: lee de la réplica elegida por read_replica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None:
+            return async_db.engines[replica].sync_engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class AsyncDatabase:
+    """Engines asyncio (primario y réplicas) y la sesión de cada petición"""
+
+    def __init__(self):
+        self.engines = {}
+        self.sessionmaker = None
+
+    def init_app(self, app):
+        from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
+
+        config = app.config
+        urls = {None: config.get('ASYNC_DATABASE_URL') or config['SQLALCHEMY_DATABASE_URI']}
+        for bind_key, options in config.get('SQLALCHEMY_BINDS', {}).items():
+            if bind_key.startswith('replica'):
+                urls[bind_key] = options['url'] if isinstance(options, dict) else options
+
+        for bind_key, url in urls.items():
+            url = async_url(url)
+            name = '%s_async' % (bind_key or 'primary')
+            engine = create_async_engine(url, **engine_options(config, url, name, asyncio=True))
+            metrics.instrument_engine(name, engine.sync_engine)
+            metrics.instrument_queries(engine.sync_engine)
+            self.engines[bind_key] = engine
+        self.sessionmaker = async_sessionmaker(self.engines[None], sync_session_class=ReadSession)
+
+    @property
+    def session(self):
+        """AsyncSession de la petición en curso (se crea en el primer uso)"""
+        session = g.get('async_session')
+        if session is None:
+            session = g.async_session = self.sessionmaker(info={'replica': g.get('read_replica')})
+        return session
+
+    async def remove(self):
+        session = g.pop('async_session', None)
+        if session is not None:
+            await session.close()
+
+    async def dispose(self):
+        for engine in self.engines.values():
+            await engine.dispose()
+
+
+async_db = AsyncDatabase()
+
+
+def async_validator(version):
+    """Validador para conditional() que ejecuta la consulta de `version` con el engine asyncio"""
+    async def validator(**kwargs):
+        statement, token = version(**kwargs)
+        row = (await async_db.session.execute(statement)).first()
+        return None if row is None else token(*row)
+    return validator
+
+
+#### VISTAS ASYNC (mismas respuestas que las de views.py) ####
+
+@rate_limit('post_list', '120/minute')
+@read_replica
+@conditional(async_validator(post_list_version))
+@cache.cached('post', 'category')
+async def post_list():
+    try:
+        filters = parse_post_filters(request.args)
+    except ValueError:
+        return {"error": "Fecha inválida, usar formato ISO (AAAA-MM-DD)"}, 400
+    try:
+        serializer, load = post_fieldset(request.args.get('fields'))
+    except ValueError as err:
+        return {"error": str(err)}, 400
+
+    statement = select(Post).where(Post.is_published == True, *filters).options(*load)
+    try:
+        statement, limit = keyset_query(statement, Post.created_at, Post.id)
+    except InvalidCursor as err:
+        return {"error": str(err)}, 400
+
+    posts, next_cursor = split_page((await async_db.session.scalars(statement)).all(), limit)
+    await users.prime(async_db.session)
+    return {
+        "items": serializer.dump_many(posts),
+        "next_cursor": next_cursor
+    }, 200
+
+
+@read_replica
+@conditional(async_validator(post_detail_version))
+@cache.cached('post:{post_id}', 'post:bulk', 'category')
+async def post_detail(post_id):
+    post = (await async_db.session.scalars(
+        select(Post).where(Post.id == post_id).options(selectinload(Post.categories))
+    )).first()
+    if post is None:
+        abort(404)
+    await users.prime(async_db.session)
+    return post_serializer.dump(post), 200
+
+
+@read_replica
+@conditional(async_validator(comment_list_version))
+@cache.cached('comment:{post_id}', 'comment:bulk', 'post:{post_id}', 'post:bulk')
+async def comment_list(post_id):
+    limit = get_page_size()
+    try:
+        position = requested_position()
+    except InvalidCursor as err:
+        return {"error": str(err)}, 400
+
+    rows = (await async_db.session.execute(comment_page_query(post_id, position, limit))).all()
+    if not rows:
+        abort(404)
+    await users.prime(async_db.session)
+    return comment_page(rows, limit), 200
+
+
+@read_replica
+@conditional(async_validator(category_list_version))
+@cache.cached('category')
+async def category_list():
+    categories = (await async_db.session.scalars(select(Category).order_by(Category.id))).all()
+    return category_serializer.dump_many(categories), 200
+
+
+# endpoint de app.py -> vista async que lo reemplaza en los GET
+ASYNC_VIEWS = {
+    'api_posts': post_list,
+    'api_post_detail': post_detail,
+    'api_post_comments': comment_list,
+    'api_categories': category_list,
+}
+
+
+#### APLICACIÓN ASGI ####
+
+class AsgiApp:
+    """Aplicación ASGI que envuelve a la app Flask"""
+
+    def __init__(self, flask_app):
+        self.flask = flask_app
+        self.executor = ThreadPoolExecutor(flask_app.config.get('ASGI_SYNC_THREADS', 16), thread_name_prefix='wsgi')
+        async_db.init_app(flask_app)
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return
+        environ = build_environ(scope)
+        if scope['method'] in ('GET', 'HEAD'):
+            response = await self._dispatch_async(environ)
+            if response is not None:
+                return await self._send_response(environ, response, send)
+        await self._call_wsgi(environ, receive, send)
+
+    async def _dispatch_async(self, environ):
+        """Respuesta de la vista async de la ruta, o None si la atiende Flask"""
+        app = self.flask
+        ctx = app.request_context(environ)
+        ctx.push()
+        try:
+            view = ASYNC_VIEWS.get(request.endpoint)
+            if view is None or requested_stream_format():
+                return None
+            # Mismo ciclo que Flask.full_dispatch_request, con la vista esperada
+            try:
+                try:
+                    rv = app.preprocess_request()
+                    if rv is None:
+                        rv = await view(**request.view_args)
+                except Exception as err:
+                    rv = app.handle_user_exception(err)
+                return app.finalize_request(rv)
+            except Exception as err:
+                return app.handle_exception(err)
+            finally:
+                await async_db.remove()
+        finally:
+            ctx.pop()
+
+    async def _send_response(self, environ, response, send):
+        # Lo mismo que haría el servidor WSGI: sin cuerpo en HEAD ni en 304 y
+        # sin las cabeceras de entidad en un 304
+        headers = response.get_wsgi_headers(environ)
+        body = b''.join(response.get_app_iter(environ))
+        response.close()
+        await send({
+            'type': 'http.response.start',
+            'status': response.status_code,
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _call_wsgi(self, environ, receive, send):
+        """Atiende la petición con la app Flask en el pool de hilos.
+
+        El cuerpo de la respuesta se envía a medida que Flask lo genera, así
+        los listados en streaming siguen llegando de a partes.
+        """
+        body = io.BytesIO()
+        while True:
+            message = await receive()
+            if message['type'] == 'http.disconnect':
+                return
+            body.write(message.get('body', b''))
+            if not message.get('more_body'):
+                break
+        body.seek(0)
+        environ['wsgi.input'] = body
+
+        loop = asyncio.get_running_loop()
+
+        def emit(message):
+            asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+        def run():
+            pending = []
+
+            def start_response(status, headers, exc_info=None):
+                pending[:] = [{
+                    'type': 'http.response.start',
+                    'status': int(status.split(' ', 1)[0]),
+                    'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers]
+                }]
+
+            output = self.flask(environ, start_response)
+            try:
+                for chunk in output:
+                    if pending:
+                        emit(pending.pop())
+                    if chunk:
+                        emit({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+                if pending:
+                    emit(pending.pop())
+                emit({'type': 'http.response.body'})
+            finally:
+                if hasattr(output, 'close'):
+                    output.close()
+
+        await loop.run_in_executor(self.executor, run)
+
+    async def _lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await async_db.dispose()
+                self.executor.shutdown(wait=False)
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+
+def build_environ(scope):
+    """Environ WSGI equivalente al scope HTTP de ASGI (sin el cuerpo)"""
+    script_name = scope.get('root_path', '').encode('utf8').decode('latin1')
+    path_info = scope['path'].encode('utf8').decode('latin1')
+    if path_info.startswith(script_name):
+        path_info = path_info[len(script_name):]
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': script_name,
+        'PATH_INFO': path_info,
+        'QUERY_STRING': scope.get('query_string', b'').decode('latin1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': 'HTTP/%s' % scope.get('http_version', '1.1'),
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope.get('headers', []):
+        name = name.decode('latin1')
+        if name == 'content-length':
+            key = 'CONTENT_LENGTH'
+        elif name == 'content-type':
+            key = 'CONTENT_TYPE'
+        else:
+            key = 'HTTP_' + name.upper().replace('-', '_')
+        value = value.decode('latin1')
+        environ[key] = environ[key] + ',' + value if key in environ else value
+    return environ
+
+
+def create_asgi_app(test_config=None):
+    """Fábrica para el servidor ASGI (uvicorn asgi:create_asgi_app --factory)"""
+    from app import create_app
+
+    return AsgiApp(create_app(test_config))
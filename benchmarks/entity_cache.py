@@ -0,0 +1,102 @@
+"""Consultas por petición con y sin el cache de entidades (entities.py).
+
+Recorre las rutas que leen categorías o autores dos veces sobre la misma
+app, primero con el cache desactivado y después activado (y sin cache de
+respuestas, para que cada petición llegue a la vista), y reporta por ruta
+consultas por petición, latencias y queries_saved: cuántas consultas por
+petición se ahorran. El JSON tiene el mismo formato que benchmarks.run.
+
+Uso (desde la raíz del proyecto):
+
+    python -m benchmarks.entity_cache --reset --output entity_cache.json
+"""
+import argparse
+import platform
+import sys
+import time
+from datetime import datetime
+
+from benchmarks.run import (
+    QUERIES_RE, AppClient, add_common_arguments, create_benchmark_app, finish, login_tokens, parse_common, summarize
+)
+
+
+def requests_to_measure(volumes):
+    """(nombre, método, ruta) de cada operación; las de seguir se alternan para volver al estado inicial"""
+    category = min(2, volumes['categories'])
+    return [
+        ('categories.list', 'GET', '/api/categories'),
+        ('posts.list', 'GET', '/api/posts'),
+        ('posts.detail', 'GET', '/api/posts/1'),
+        ('comments.list', 'GET', '/api/posts/1/comments'),
+        ('categories.follow', 'POST', '/api/categories/%d/follow' % category),
+        ('categories.unfollow', 'DELETE', '/api/categories/%d/follow' % category),
+    ]
+
+
+def measure(client, headers, method, path, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        status, timing, _ = client.request(method, path, headers=headers)
+        latency = time.perf_counter() - started
+        match = QUERIES_RE.search(timing)
+        samples.append((latency, int(match.group(1)) if match else None, status))
+    return summarize(samples, sum(sample[0] for sample in samples))
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Consultas ahorradas por el cache de entidades')
+    add_common_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=100, help='Peticiones por ruta y modo')
+    return parse_common(parser, argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Sin cache de respuestas: cada petición tiene que pasar por la vista
+    app = create_benchmark_app(args, CACHE_BACKEND='none')
+    import entities
+
+    client = AppClient(app)
+    _, tokens = login_tokens(client, args.volumes, 2)
+    headers = {'Authorization': 'Bearer %s' % tokens[-1]}
+
+    operations = {}
+    for mode, enabled in (('uncached', False), ('cached', True)):
+        with app.app_context():
+            entities.users.configure(app.config['ENTITY_CACHE_USERS'] if enabled else 0, app.config['ENTITY_CACHE_TTL'])
+            entities.categories.configure(
+                app.config['ENTITY_CACHE_CATEGORIES'] if enabled else 0, app.config['ENTITY_CACHE_TTL'])
+        for name, method, path in requests_to_measure(args.volumes):
+            client.request(method, path, headers=headers)  # calentamiento
+            operations['entities.%s.%s' % (name, mode)] = measure(client, headers, method, path, args.repeat)
+
+    for name, method, path in requests_to_measure(args.volumes):
+        before = operations['entities.%s.uncached' % name]['queries_per_request']
+        after = operations['entities.%s.cached' % name]
+        if before is not None and after['queries_per_request'] is not None:
+            after['queries_saved'] = round(before - after['queries_per_request'], 3)
+
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'volumes': args.volumes,
+            'target': args.database,
+            'repeat': args.repeat,
+            'python': platform.python_version()
+        },
+        'total': None,
+        'operations': operations
+    }
+    exit_code = finish(args, report)
+
+    for name, result in sorted(operations.items()):
+        print('%-40s %6.2f consultas  p50 %8.3f ms%s' % (
+            name, result['queries_per_request'] or 0, result['p50_ms'],
+            '  ahorro %.2f' % result['queries_saved'] if 'queries_saved' in result else ''), file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
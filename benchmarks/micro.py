@@ -0,0 +1,167 @@
+"""Microbenchmarks de las piezas que no dependen del HTTP.
+
+Mide los serializadores precompilados contra marshmallow, el índice de
+búsqueda en memoria (construcción y consultas) sobre los datos generados y
+lo que agregan a cada petición el límite de peticiones y la autenticación
+(decodificar el JWT y consultar el índice de revocaciones).
+El JSON tiene el mismo formato que benchmarks.run, así que --compare
+funciona igual.
+
+Uso (desde la raíz del proyecto):
+
+    python -m benchmarks.micro --repeat 200 --output micro.json
+"""
+import argparse
+import platform
+import random
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy.orm import joinedload, selectinload
+
+from benchmarks.run import add_common_arguments, create_benchmark_app, finish, parse_common, summarize
+from benchmarks.seed import WORDS
+
+
+def measure(fn, repeat):
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started, None, 200))
+    return summarize(samples, sum(sample[0] for sample in samples))
+
+
+def serializer_operations(page_size):
+    from models import Post, Comment
+    from schemas import PostSchema, CommentSchema
+    from serializers import post_serializer, comment_serializer
+
+    posts = Post.query.options(joinedload(Post.author), selectinload(Post.categories)) \
+        .order_by(Post.id).limit(page_size).all()
+    comments = Comment.query.options(joinedload(Comment.author)).order_by(Comment.id).limit(page_size).all()
+    post_schema = PostSchema(many=True, exclude=('excerpt',))
+    comment_schema = CommentSchema(many=True)
+
+    return {
+        'serialize.posts.marshmallow': lambda: post_schema.dump(posts),
+        'serialize.posts.compiled': lambda: post_serializer.dump_many(posts),
+        'serialize.comments.marshmallow': lambda: comment_schema.dump(comments),
+        'serialize.comments.compiled': lambda: comment_serializer.dump_many(comments),
+    }
+
+
+def search_operations(seed):
+    from search import MemorySearchEngine
+
+    rng = random.Random(seed)
+    engine = MemorySearchEngine()
+    engine.build()
+
+    return {
+        'search.build': lambda: MemorySearchEngine().build(),
+        'search.query.posts': lambda: engine.search('posts', ' '.join(rng.sample(WORDS, 2)), 0, 20),
+        'search.query.comments': lambda: engine.search('comments', ' '.join(rng.sample(WORDS, 2)), 0, 20),
+    }
+
+
+def ratelimit_operations(app, clients=10000):
+    """El bucket en memoria solo y una vista trivial con y sin @rate_limit,
+    dentro de un contexto de petición (el costo que se suma a cada una)"""
+    from ratelimit import MemoryBackend, RateLimiter, parse_limit
+
+    backend = MemoryBackend()
+    interval, burst = parse_limit('1000000/second')
+    keys = ['ip:10.0.%d.%d' % (index // 256, index % 256) for index in range(clients)]
+    counter = iter(range(10 ** 9))
+
+    limiter = RateLimiter()
+    limiter.backend = MemoryBackend()
+    plain = lambda: None
+    limited = limiter.limit('micro', '1000000/second')(plain)
+    context = app.test_request_context('/api/posts')
+    context.push()
+
+    return {
+        'ratelimit.hit.same_key': lambda: backend.hit('ip:10.0.0.1', interval, burst),
+        'ratelimit.hit.many_keys': lambda: backend.hit(keys[next(counter) % clients], interval, burst),
+        'ratelimit.view.plain': plain,
+        'ratelimit.view.limited': limited,
+    }
+
+
+def auth_operations(app, user_id=1):
+    """El índice de revocaciones solo (la consulta por petición y la
+    sincronización con la base) y una vista trivial con y sin @jwt_required,
+    dentro de un contexto de petición con el token de un usuario generado"""
+    from flask_jwt_extended import create_access_token, jwt_required
+    from models import User, db
+    from revocation import revocations
+
+    with app.app_context():
+        user = db.session.get(User, user_id)
+        token = create_access_token(identity=str(user.id), additional_claims={
+            'email': user.email, 'role': user.role, 'name': user.name, 'ver': user.token_version
+        })
+    payload = {'sub': str(user.id), 'ver': user.token_version}
+
+    plain = lambda: None
+    protected = jwt_required()(plain)
+    context = app.test_request_context('/api/posts', headers={'Authorization': 'Bearer ' + token})
+    context.push()
+
+    return {
+        'auth.revocation.check': lambda: revocations.is_revoked(payload),
+        'auth.revocation.sync': revocations._sync,
+        'auth.view.public': plain,
+        'auth.view.jwt_required': protected,
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Microbenchmarks de serialización, búsqueda, límites de peticiones y autenticación')
+    add_common_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=200, help='Repeticiones por operación')
+    parser.add_argument('--build-repeat', type=int, default=5, help='Repeticiones de la construcción del índice')
+    parser.add_argument('--page-size', type=int, default=100, help='Filas por volcado')
+    return parse_common(parser, argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    app = create_benchmark_app(args)
+
+    operations = {}
+    with app.app_context():
+        for name, fn in serializer_operations(args.page_size).items():
+            operations[name] = measure(fn, args.repeat)
+        for name, fn in search_operations(args.seed).items():
+            operations[name] = measure(fn, args.build_repeat if name == 'search.build' else args.repeat)
+    for name, fn in ratelimit_operations(app).items():
+        operations[name] = measure(fn, args.repeat * 50)
+    for name, fn in auth_operations(app).items():
+        # La sincronización es una consulta a la base: con las repeticiones normales alcanza
+        operations[name] = measure(fn, args.repeat if name == 'auth.revocation.sync' else args.repeat * 50)
+
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'volumes': args.volumes,
+            'target': args.database,
+            'repeat': args.repeat,
+            'page_size': args.page_size,
+            'python': platform.python_version()
+        },
+        'total': None,
+        'operations': operations
+    }
+    exit_code = finish(args, report)
+
+    for name, result in sorted(operations.items()):
+        print('%-32s p50 %8.3f ms  p95 %8.3f ms' % (name, result['p50_ms'], result['p95_ms']), file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+"""Compara las respuestas del modo ASGI (asgi.py) con las de la app Flask.
+
+Carga los datos sintéticos y envía las mismas peticiones a las dos apps
+sobre la misma base: las lecturas que atienden las vistas async (filtros,
+cursores, 404, 304 y errores de validación), rutas que se delegan a Flask y
+escrituras hechas por un modo y leídas por el otro. Termina con código 1 si
+algún status, cuerpo o validador (ETag / Last-Modified) difiere.
+
+Uso (desde la raíz del proyecto, necesita el driver asyncio de la base):
+
+    python -m benchmarks.parity --users 20 --posts 200 --comments 1000
+"""
+import argparse
+import asyncio
+import json
+import sys
+
+from benchmarks.run import (
+    AppClient, AsgiClient, add_common_arguments, create_benchmark_app, login_tokens,
+    parse_common, start_event_loop
+)
+
+COMPARED_HEADERS = ('ETag', 'Last-Modified', 'Content-Type')
+
+
+def read_paths(volumes):
+    missing = volumes['posts'] + 1000
+    return [
+        '/api/posts',
+        '/api/posts?limit=5',
+        '/api/posts?limit=500',
+        '/api/posts?category=categoria-1',
+        '/api/posts?category=1&limit=3',
+        '/api/posts?author=bench2',
+        '/api/posts?since=2024-01-01T10:00:00&until=2024-01-02',
+        '/api/posts?since=ayer',
+        '/api/posts?cursor=invalido',
+        '/api/posts?stream=ndjson',
+        '/api/posts?fields=id,title,excerpt&limit=5',
+        '/api/posts?fields=author,categories,comment_count',
+        '/api/posts?fields=desconocido',
+        '/api/posts/1',
+        '/api/posts/%d' % volumes['posts'],
+        '/api/posts/%d' % missing,
+        '/api/posts/1/comments',
+        '/api/posts/1/comments?limit=2',
+        '/api/posts/%d/comments' % missing,
+        '/api/posts/1/comments?cursor=invalido',
+        '/api/categories',
+        '/api/categories?stream=json',
+        '/api/search?q=python',
+    ]
+
+
+class Comparison:
+    """Envía cada petición a los dos modos y acumula las diferencias"""
+
+    def __init__(self, wsgi, asgi):
+        self.clients = {'wsgi': wsgi, 'asgi': asgi}
+        self.checked = 0
+        self.mismatches = []
+
+    def check(self, method, path, headers=None):
+        responses = {mode: client.fetch(method, path, headers) for mode, client in self.clients.items()}
+        self.checked += 1
+        expected, got = responses['wsgi'], responses['asgi']
+        fields = [('status', expected[0], got[0]), ('body', expected[2], got[2])]
+        fields += [(name, expected[1].get(name), got[1].get(name)) for name in COMPARED_HEADERS]
+        for field, wsgi_value, asgi_value in fields:
+            if wsgi_value != asgi_value:
+                self.mismatches.append({
+                    'request': '%s %s' % (method, path), 'field': field,
+                    'wsgi': _short(wsgi_value), 'asgi': _short(asgi_value)
+                })
+        return expected
+
+    def check_pages(self, path):
+        """Recorre las páginas siguiendo next_cursor (a lo sumo 5)"""
+        for _ in range(5):
+            status, _, body = self.check('GET', path)
+            if status != 200:
+                return
+            cursor = json.loads(body).get('next_cursor')
+            if not cursor:
+                return
+            path = '%s%scursor=%s' % (path.split('cursor=')[0].rstrip('&?'), '&' if '?' in path else '?', cursor)
+
+    def check_not_modified(self, path):
+        """La respuesta 304 con el ETag y con la fecha del otro modo"""
+        _, headers, _ = self.clients['wsgi'].fetch('GET', path)
+        if headers.get('ETag'):
+            self.check('GET', path, {'If-None-Match': headers['ETag']})
+        if headers.get('Last-Modified'):
+            self.check('GET', path, {'If-Modified-Since': headers['Last-Modified']})
+
+
+def _short(value):
+    if isinstance(value, bytes):
+        value = value.decode('utf-8', 'replace')
+    if isinstance(value, str) and len(value) > 300:
+        return value[:300] + '...'
+    return value
+
+
+def run_checks(comparison, volumes, user, admin):
+    paths = read_paths(volumes)
+    for path in paths:
+        comparison.check('GET', path)
+        comparison.check('HEAD', path)
+    comparison.check_pages('/api/posts?limit=7')
+    comparison.check_pages('/api/posts/1/comments?limit=3')
+    for path in ('/api/posts', '/api/posts/1', '/api/posts/1/comments', '/api/categories'):
+        comparison.check_not_modified(path)
+    comparison.check('GET', '/api/posts', {'Accept-Encoding': 'gzip'})
+
+    # Escrituras (van a Flask en los dos modos) seguidas de lecturas en ambos:
+    # la cache y los validadores tienen que reflejar el cambio igual
+    wsgi, asgi = comparison.clients['wsgi'], comparison.clients['asgi']
+    writes = [
+        (asgi, 'POST', '/api/posts', user, {'title': 'Paridad', 'content': 'Post creado por el modo ASGI'}),
+        (wsgi, 'POST', '/api/posts/1/comments', user, {'text': 'Comentario creado por el modo WSGI'}),
+        (asgi, 'PUT', '/api/categories/1', admin, {'name': 'categoria-paridad'}),
+        (wsgi, 'PUT', '/api/posts/1', admin, {'content': 'Contenido editado'}),
+    ]
+    for client, method, path, headers, body in writes:
+        status, _, response = client.fetch(method, path, headers, body)
+        if status >= 300:
+            comparison.mismatches.append({'request': '%s %s' % (method, path), 'field': 'write',
+                                          'wsgi': None, 'asgi': _short(response)})
+        for read_path in ('/api/posts', '/api/posts/1', '/api/posts/1/comments', '/api/categories'):
+            comparison.check('GET', read_path)
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Paridad de respuestas entre el modo WSGI y el ASGI')
+    add_common_arguments(parser)
+    parser.add_argument('--with-cache', action='store_true', help='Comparar también con la cache de respuestas activa')
+    return parse_common(parser, argv)
+
+
+def main(argv=None):
+    from asgi import AsgiApp, async_db
+
+    args = parse_args(argv)
+    # Sin la cache de respuestas, para que ningún modo devuelva lo que armó el otro
+    app = create_benchmark_app(args, **({} if args.with_cache else {'CACHE_BACKEND': 'none'}))
+    loop = start_event_loop()
+    wsgi = AppClient(app)
+    asgi = AsgiClient(AsgiApp(app), loop)
+
+    admin, tokens = login_tokens(wsgi, args.volumes, 2)
+    comparison = Comparison(wsgi, asgi)
+    try:
+        run_checks(comparison, args.volumes,
+                   {'Authorization': 'Bearer ' + tokens[-1]}, {'Authorization': 'Bearer ' + admin})
+    finally:
+        asyncio.run_coroutine_threadsafe(async_db.dispose(), loop).result()
+
+    report = {'checked': comparison.checked, 'mismatches': comparison.mismatches}
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    print('%d peticiones comparadas, %d diferencias' % (comparison.checked, len(comparison.mismatches)),
+          file=sys.stderr)
+    return 1 if comparison.mismatches else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,145 @@
+"""Bytes enviados y leídos de la base por el listado de posts.
+
+Pide la misma página completa y con ?fields= (p. ej. solo título y
+extracto), sin comprimir y con cada codificación disponible (gzip y, con el
+paquete brotli, br). Por operación reporta, además de las latencias, el
+tamaño medio del cuerpo en la respuesta (bytes_wire) y los bytes de las
+filas que devolvió la base por petición (db_bytes_read): las consultas de
+cada petición se vuelven a ejecutar sobre la conexión DBAPI y se suman los
+tamaños de los valores. El JSON tiene el mismo formato que benchmarks.run.
+
+Uso (desde la raíz del proyecto):
+
+    python -m benchmarks.payload --reset --output payload.json
+    python -m benchmarks.payload --no-seed --fields id,title,excerpt --compare payload.json
+"""
+import argparse
+import platform
+import sys
+import time
+from datetime import datetime
+
+from sqlalchemy import event
+
+from benchmarks.run import add_common_arguments, create_benchmark_app, finish, parse_common, summarize
+
+
+DEFAULT_FIELDS = 'id,title,excerpt,created_at,author'
+
+
+def _value_size(value):
+    if value is None:
+        return 0
+    if isinstance(value, str):
+        return len(value.encode())
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    return 8  # números y fechas: aproximado, igual en todas las variantes
+
+
+class ReadMeter:
+    """Guarda los SELECT de una petición y mide cuántos bytes devuelven"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+        self.active = False
+        event.listen(engine, 'before_cursor_execute', self._capture)
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        if self.active and statement.lstrip().upper().startswith('SELECT'):
+            self.statements.append((statement, parameters))
+
+    def bytes_read(self):
+        """Bytes de las filas de los SELECT capturados (y los olvida)"""
+        statements, self.statements = self.statements, []
+        total = 0
+        connection = self.engine.raw_connection()
+        try:
+            cursor = connection.cursor()
+            for statement, parameters in statements:
+                cursor.execute(statement, parameters)
+                total += sum(_value_size(value) for row in cursor.fetchall() for value in row)
+            cursor.close()
+        finally:
+            connection.close()
+        return total
+
+
+def variants(page_size, fields, encodings):
+    """(nombre, ruta, cabeceras) de cada combinación de campos y codificación"""
+    paths = {
+        'full': '/api/posts?limit=%d' % page_size,
+        'fields': '/api/posts?limit=%d&fields=%s' % (page_size, fields),
+    }
+    for name, path in paths.items():
+        for encoding in encodings:
+            headers = {'Accept-Encoding': encoding} if encoding != 'identity' else {}
+            yield 'payload.posts.%s.%s' % (name, encoding), path, headers
+
+
+def measure(client, meter, path, headers, repeat):
+    samples, wire, read = [], 0, 0
+    for _ in range(repeat):
+        meter.active = True
+        started = time.perf_counter()
+        response = client.get(path, headers=headers)
+        body = response.get_data()
+        samples.append((time.perf_counter() - started, None, response.status_code))
+        meter.active = False
+        wire += len(body)
+        read += meter.bytes_read()
+    result = summarize(samples, sum(sample[0] for sample in samples))
+    result['bytes_wire'] = round(wire / repeat)
+    result['db_bytes_read'] = round(read / repeat)
+    return result
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Bytes en la respuesta y leídos de la base por el listado de posts')
+    add_common_arguments(parser)
+    parser.add_argument('--repeat', type=int, default=50, help='Peticiones por variante')
+    parser.add_argument('--page-size', type=int, default=50, help='Posts por página')
+    parser.add_argument('--fields', default=DEFAULT_FIELDS, help='Campos de la variante con ?fields=')
+    return parse_common(parser, argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    # Sin cache de respuestas: cada petición tiene que leer de la base
+    app = create_benchmark_app(args, CACHE_BACKEND='none', MAX_PAGE_SIZE=max(args.page_size, 100))
+    from compression import compression
+    from models import db
+
+    encodings = ('identity',) + compression.encodings
+    client = app.test_client()
+    operations = {}
+    with app.app_context():
+        meter = ReadMeter(db.engine)
+        for name, path, headers in variants(args.page_size, args.fields, encodings):
+            client.get(path, headers=headers)  # calentamiento
+            operations[name] = measure(client, meter, path, headers, args.repeat)
+
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'volumes': args.volumes,
+            'target': args.database,
+            'repeat': args.repeat,
+            'page_size': args.page_size,
+            'fields': args.fields,
+            'python': platform.python_version()
+        },
+        'total': None,
+        'operations': operations
+    }
+    exit_code = finish(args, report)
+
+    for name, result in sorted(operations.items()):
+        print('%-34s wire %9d B  db %9d B  p50 %8.3f ms' % (
+            name, result['bytes_wire'], result['db_bytes_read'], result['p50_ms']), file=sys.stderr)
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
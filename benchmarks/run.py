@@ -0,0 +1,578 @@
+"""Benchmark de la API completa.
+
+Carga una base SQLite o MySQL con datos sintéticos, recorre las rutas con
+una mezcla de lecturas y escrituras y reporta latencias p50/p95/p99,
+throughput y consultas SQL por petición en JSON. Con --compare contrasta el
+resultado con una corrida anterior y termina con código 1 si hay regresiones.
+
+Uso (desde la raíz del proyecto):
+
+    python -m benchmarks.run --mix mixed --requests 5000 --output resultado.json
+    python -m benchmarks.run --mix read --compare baseline.json
+    python -m benchmarks.run --mix read --mode asgi --concurrency 64
+    python -m benchmarks.run --stream-profile --output streaming.json
+"""
+import argparse
+import asyncio
+import json
+import math
+import multiprocessing
+import os
+import platform
+import re
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from datetime import datetime
+
+from werkzeug.datastructures import Headers
+
+from benchmarks.scenarios import MIXES, OPERATIONS, Context, pick
+from benchmarks.seed import DEFAULT_VOLUMES, PASSWORD, seed
+
+
+QUERIES_RE = re.compile(r'db;desc="(\d+) queries"')
+
+# Métricas de una operación que se comparan con la línea base
+# (campo, True si un valor mayor es peor)
+COMPARED_FIELDS = (('p50_ms', True), ('p95_ms', True), ('p99_ms', True),
+                   ('throughput_rps', False), ('queries_per_request', True),
+                   ('bytes_wire', True), ('db_bytes_read', True),
+                   ('ttfb_p50_ms', True), ('peak_rss_kb', True))
+
+# Con menos muestras los tiempos de una operación son demasiado ruidosos
+MIN_SAMPLES = 30
+
+
+#### CLIENTES ####
+
+class AppClient:
+    """Ejecuta las peticiones dentro del proceso con el cliente de pruebas de Flask"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, headers=None, json=None):
+        status, response_headers, body = self.fetch(method, path, headers, json)
+        return status, response_headers.get('Server-Timing', ''), body
+
+    def fetch(self, method, path, headers=None, json=None):
+        """(status, headers, cuerpo) de la respuesta"""
+        response = self.client.open(path, method=method, headers=headers, json=json)
+        return response.status_code, response.headers, response.get_data()
+
+
+class HttpClient:
+    """Ejecuta las peticiones contra un servidor ya levantado (--target)"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def request(self, method, path, headers=None, json=None):
+        headers = dict(headers or {})
+        data = None
+        if json is not None:
+            data = _json_dumps(json).encode()
+            headers['Content-Type'] = 'application/json'
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with urllib.request.urlopen(req, timeout=60) as response:
+                return response.status, response.headers.get('Server-Timing', ''), response.read()
+        except urllib.error.HTTPError as err:
+            return err.code, err.headers.get('Server-Timing', ''), err.read()
+
+
+class AsgiClient:
+    """Ejecuta las peticiones dentro del proceso contra la app ASGI (--mode asgi).
+
+    Todos los hilos del benchmark comparten un event loop en otro hilo, como
+    las conexiones de un worker de uvicorn.
+    """
+
+    def __init__(self, asgi_app, loop):
+        self.app = asgi_app
+        self.loop = loop
+
+    def request(self, method, path, headers=None, json=None):
+        status, response_headers, body = self.fetch(method, path, headers, json)
+        return status, response_headers.get('Server-Timing', ''), body
+
+    def fetch(self, method, path, headers=None, json=None):
+        """(status, headers, cuerpo) de la respuesta"""
+        future = asyncio.run_coroutine_threadsafe(self._fetch(method, path, headers, json), self.loop)
+        return future.result()
+
+    async def _fetch(self, method, path, headers, json):
+        headers = dict(headers or {})
+        body = b''
+        if json is not None:
+            body = _json_dumps(json).encode()
+            headers['Content-Type'] = 'application/json'
+            headers['Content-Length'] = str(len(body))
+        path, _, query = path.partition('?')
+        scope = {
+            'type': 'http', 'method': method, 'path': path, 'query_string': query.encode(),
+            'http_version': '1.1', 'scheme': 'http', 'server': ('localhost', 80),
+            'headers': [(name.lower().encode('latin-1'), value.encode('latin-1')) for name, value in headers.items()]
+        }
+        messages = []
+
+        async def receive():
+            return {'type': 'http.request', 'body': body}
+
+        async def send(message):
+            messages.append(message)
+
+        await self.app(scope, receive, send)
+        start = messages[0]
+        response_headers = Headers([(name.decode('latin-1'), value.decode('latin-1')) for name, value in start['headers']])
+        return start['status'], response_headers, b''.join(message.get('body', b'') for message in messages[1:])
+
+
+def start_event_loop():
+    """Event loop en un hilo aparte para AsgiClient"""
+    loop = asyncio.new_event_loop()
+    threading.Thread(target=loop.run_forever, name='asgi-loop', daemon=True).start()
+    return loop
+
+
+def _json_dumps(obj):
+    # En request() el parámetro `json` tapa al módulo
+    return json.dumps(obj)
+
+
+#### PREPARACIÓN ####
+
+def create_benchmark_app(args, **overrides):
+    from app import create_app
+    from models import db
+
+    # Toda la carga sale de un mismo cliente: sin límites de peticiones
+    config = dict(overrides, SQLALCHEMY_DATABASE_URI=args.database)
+    config.setdefault('RATELIMIT_BACKEND', 'none')
+    if args.bcrypt_rounds:
+        config['BCRYPT_ROUNDS'] = args.bcrypt_rounds
+    app = create_app(config)
+
+    if not args.no_seed:
+        with app.app_context():
+            if args.reset:
+                db.drop_all()
+            db.create_all()
+            from models import User
+            if db.session.query(User.id).first() is not None:
+                sys.exit('La base ya tiene datos: usar --reset para vaciarla o --no-seed para reutilizarla')
+            started = time.perf_counter()
+            rows = seed(args.volumes, args.seed, app.config['BCRYPT_ROUNDS'])
+            _log('%d filas generadas en %.1f s' % (rows, time.perf_counter() - started))
+    return app
+
+
+def login_tokens(client, volumes, count):
+    """Tokens obtenidos por LoginAPI: el del admin (usuario 1) y los de `count` usuarios"""
+    tokens = []
+    for user_id in range(1, min(count, volumes['users']) + 1):
+        status, _, body = client.request('POST', '/api/login', json={
+            'email': 'bench%d@example.com' % user_id, 'password': PASSWORD
+        })
+        if status != 200:
+            sys.exit('No se pudo iniciar sesión como bench%d (%d): %s' % (user_id, status, body[:200]))
+        tokens.append(json.loads(body)['access_token'])
+    return tokens[0], tokens
+
+
+#### EJECUCIÓN ####
+
+class Recorder:
+    """Muestras por operación: (latencia en segundos, consultas o None, status)"""
+
+    def __init__(self):
+        self.samples = {}
+        self._lock = threading.Lock()
+
+    def add(self, name, latency, queries, status):
+        with self._lock:
+            self.samples.setdefault(name, []).append((latency, queries, status))
+
+
+def worker(make_client, ctx, mix, budget, deadline, recorder):
+    client = make_client()
+    weights = MIXES[mix]
+    while budget.take() and time.monotonic() < deadline:
+        name = pick(ctx, weights)
+        fn, creates = OPERATIONS[name]
+        call = fn(ctx)
+        if call is None:
+            budget.give_back()
+            continue
+        method, path, kwargs = call
+
+        started = time.perf_counter()
+        status, server_timing, body = client.request(method, path, **kwargs)
+        latency = time.perf_counter() - started
+
+        match = QUERIES_RE.search(server_timing)
+        if recorder is not None:
+            recorder.add(name, latency, int(match.group(1)) if match else None, status)
+        if creates and status < 300:
+            ctx.remember(creates[0], json.loads(body), creates[1])
+
+
+class Budget:
+    """Cantidad total de peticiones compartida entre los hilos (None = sin límite)"""
+
+    def __init__(self, total):
+        self.remaining = total
+        self._lock = threading.Lock()
+
+    def take(self):
+        if self.remaining is None:
+            return True
+        with self._lock:
+            if self.remaining <= 0:
+                return False
+            self.remaining -= 1
+            return True
+
+    def give_back(self):
+        if self.remaining is not None:
+            with self._lock:
+                self.remaining += 1
+
+
+def run_phase(make_client, args, admin, tokens, requests, duration, recorder):
+    budget = Budget(requests)
+    deadline = time.monotonic() + (duration if duration else float('inf'))
+    threads = [
+        threading.Thread(target=worker, args=(
+            make_client, Context(args.volumes, tokens, admin, args.seed + index),
+            args.mix, budget, deadline, recorder
+        ))
+        for index in range(args.concurrency)
+    ]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - started
+
+
+#### REPORTE ####
+
+def percentile(sorted_values, fraction):
+    """Percentil por rango más cercano"""
+    if not sorted_values:
+        return None
+    rank = math.ceil(fraction * len(sorted_values))
+    return sorted_values[max(rank, 1) - 1]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(sample[0] for sample in samples)
+    queries = [sample[1] for sample in samples if sample[1] is not None]
+    statuses = {}
+    for sample in samples:
+        statuses[str(sample[2])] = statuses.get(str(sample[2]), 0) + 1
+    return {
+        'requests': len(samples),
+        'errors': sum(1 for sample in samples if sample[2] >= 500),
+        'rejected': sum(1 for sample in samples if sample[2] == 429),
+        'status': statuses,
+        'mean_ms': round(sum(latencies) / len(latencies) * 1000, 3),
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'max_ms': round(latencies[-1] * 1000, 3),
+        'throughput_rps': round(len(samples) / elapsed, 2) if elapsed else None,
+        'queries_per_request': round(sum(queries) / len(queries), 3) if queries else None
+    }
+
+
+def pool_metrics(client):
+    """Resumen de las métricas del pool leídas de /metrics"""
+    status, _, body = client.request('GET', '/metrics')
+    if status != 200:
+        return None
+    result = {}
+    for line in body.decode().splitlines():
+        if line.startswith('#'):
+            continue
+        for metric in ('db_pool_checkouts_total', 'db_pool_timeouts_total',
+                       'db_pool_wait_seconds_sum', 'db_pool_wait_seconds_count'):
+            if line.startswith(metric + '{pool="'):
+                labels, value = line[len(metric):].rsplit(' ', 1)
+                pool = labels[len('{pool="'):-len('"}')]
+                result.setdefault(pool, {})[metric] = float(value)
+    for values in result.values():
+        count = values.pop('db_pool_wait_seconds_count', 0)
+        wait = values.pop('db_pool_wait_seconds_sum', 0)
+        values['mean_wait_ms'] = round(wait / count * 1000, 3) if count else None
+    return result
+
+
+def build_report(args, recorder, elapsed, pool):
+    everything = [sample for samples in recorder.samples.values() for sample in samples]
+    return {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'mix': getattr(args, 'mix', None),
+            'mode': getattr(args, 'mode', None),
+            'concurrency': getattr(args, 'concurrency', None),
+            'volumes': args.volumes,
+            'target': getattr(args, 'target', None) or args.database,
+            'python': platform.python_version()
+        },
+        'elapsed_seconds': round(elapsed, 3),
+        'total': summarize(everything, elapsed) if everything else None,
+        'operations': {
+            name: summarize(samples, elapsed) for name, samples in sorted(recorder.samples.items())
+        },
+        'pool': pool
+    }
+
+
+def compare(report, baseline, threshold):
+    """Lista de regresiones de `report` respecto de `baseline`"""
+    regressions = []
+    sections = dict(baseline.get('operations', {}))
+    sections['total'] = baseline.get('total')
+    current = dict(report.get('operations', {}))
+    current['total'] = report.get('total')
+
+    for name, base in sorted(sections.items(), key=lambda item: item[0]):
+        now = current.get(name)
+        if not base or not now:
+            continue
+        for field, higher_is_worse in COMPARED_FIELDS:
+            old, new = base.get(field), now.get(field)
+            if old is None or new is None:
+                continue
+            if field == 'queries_per_request':
+                # Una consulta más por petición ya es una regresión (p. ej. un N+1)
+                worse = new > old + 0.5
+            elif min(base.get('requests', 0), now.get('requests', 0)) < MIN_SAMPLES:
+                continue
+            elif higher_is_worse:
+                worse = new > old * (1 + threshold)
+            else:
+                worse = new < old * (1 - threshold)
+            if worse:
+                regressions.append({'operation': name, 'field': field, 'baseline': old, 'current': new})
+    return regressions
+
+
+#### STREAMING: PRIMER BYTE Y MEMORIA ####
+
+def _proc_status_kb(field):
+    """Campo de /proc/self/status en KB (solo Linux), o None"""
+    try:
+        with open('/proc/self/status') as status:
+            for line in status:
+                if line.startswith(field + ':'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _reset_peak_rss():
+    """Reinicia el pico de RSS (VmHWM) del proceso; False si el sistema no lo permite"""
+    try:
+        with open('/proc/self/clear_refs', 'w') as clear_refs:
+            clear_refs.write('5')
+        return True
+    except OSError:
+        return False
+
+
+def _stream_sample(app, path, results):
+    """Una petición en un proceso hijo, para que el pico de RSS sea solo suyo:
+    (latencia, tiempo al primer byte, status, bytes, KB de RSS por encima del inicial)"""
+    from models import db
+
+    with app.app_context():
+        # Las conexiones heredadas del padre no se usan desde el hijo
+        db.engine.dispose(close=False)
+    client = app.test_client()
+    measure_peak = _reset_peak_rss()
+    rss_before = _proc_status_kb('VmRSS')
+
+    started = time.perf_counter()
+    response = client.get(path, buffered=False)
+    first_byte, size = None, 0
+    for chunk in response.response:
+        if first_byte is None:
+            first_byte = time.perf_counter() - started
+        size += len(chunk)
+    latency = time.perf_counter() - started
+    response.close()
+
+    peak = _proc_status_kb('VmHWM') if measure_peak else None
+    results.put((latency, first_byte if first_byte is not None else latency, response.status_code, size,
+                 peak - rss_before if peak is not None and rss_before is not None else None))
+
+
+def stream_profile(args):
+    """Listado completo de posts en una sola respuesta y en streaming (JSON y
+    NDJSON): además de las latencias, el tiempo hasta el primer byte y el pico
+    de RSS que agrega cada petición. Cada petición corre en un proceso hijo
+    (fork) para medir su pico de memoria por separado."""
+    posts = args.volumes['posts']
+    # Sin cache ni compresión, y con una página que entra entera para comparar con el streaming
+    app = create_benchmark_app(args, CACHE_BACKEND='none', COMPRESS_ALGORITHMS='', MAX_PAGE_SIZE=max(posts, 100))
+    variants = {
+        'stream.posts.single_response': '/api/posts?limit=%d' % posts,
+        'stream.posts.json': '/api/posts?stream=json',
+        'stream.posts.ndjson': '/api/posts?stream=ndjson',
+    }
+    context = multiprocessing.get_context('fork')
+    operations = {}
+    for name, path in variants.items():
+        samples = []
+        for _ in range(args.stream_repeat):
+            results = context.Queue()
+            process = context.Process(target=_stream_sample, args=(app, path, results))
+            process.start()
+            samples.append(results.get())
+            process.join()
+        result = summarize([(latency, None, status) for latency, _, status, _, _ in samples],
+                           sum(sample[0] for sample in samples))
+        first_bytes = sorted(sample[1] for sample in samples)
+        peaks = [sample[4] for sample in samples if sample[4] is not None]
+        result['ttfb_p50_ms'] = round(percentile(first_bytes, 0.50) * 1000, 3)
+        result['ttfb_p95_ms'] = round(percentile(first_bytes, 0.95) * 1000, 3)
+        result['peak_rss_kb'] = max(peaks) if peaks else None
+        result['bytes_wire'] = round(sum(sample[3] for sample in samples) / len(samples))
+        operations[name] = result
+
+    report = {
+        'meta': {
+            'started_at': datetime.utcnow().isoformat(),
+            'mix': 'stream-profile',
+            'volumes': args.volumes,
+            'target': args.database,
+            'repeat': args.stream_repeat,
+            'python': platform.python_version()
+        },
+        'total': None,
+        'operations': operations
+    }
+    exit_code = finish(args, report)
+    for name, result in sorted(operations.items()):
+        _log('%-30s ttfb p50 %8.1f ms  total p50 %8.1f ms  pico RSS %s KB' % (
+            name, result['ttfb_p50_ms'], result['p50_ms'], result['peak_rss_kb']))
+    return exit_code
+
+
+def _log(message):
+    print(message, file=sys.stderr)
+
+
+def add_common_arguments(parser):
+    """Opciones compartidas con benchmarks.micro: base, volúmenes y comparación"""
+    parser.add_argument('--database', default='sqlite:///' + os.path.join(tempfile.gettempdir(), 'miniblog-bench.db'),
+                        help='URL de la base a usar (SQLite o MySQL)')
+    parser.add_argument('--no-seed', action='store_true', help='No generar datos (la base ya está cargada)')
+    parser.add_argument('--reset', action='store_true', help='Vaciar la base antes de generar los datos')
+    for name, default in DEFAULT_VOLUMES.items():
+        parser.add_argument('--' + name, type=int, default=default, help='Cantidad de %s a generar' % name)
+    parser.add_argument('--seed', type=int, default=1, help='Semilla de los datos y de la mezcla')
+    parser.add_argument('--bcrypt-rounds', type=int, help='Costo de bcrypt (por defecto el de la configuración)')
+    parser.add_argument('--output', help='Archivo donde guardar el JSON (por defecto stdout)')
+    parser.add_argument('--compare', help='JSON de una corrida anterior para detectar regresiones')
+    parser.add_argument('--threshold', type=float, default=0.2,
+                        help='Empeoramiento tolerado en latencia y throughput (0.2 = 20%%)')
+
+
+def parse_common(parser, argv):
+    args = parser.parse_args(argv)
+    args.volumes = {name: getattr(args, name) for name in DEFAULT_VOLUMES}
+    return args
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description='Benchmark de la API del blog')
+    add_common_arguments(parser)
+    parser.add_argument('--target', help='URL de un servidor ya levantado; por defecto se usa la app en el proceso')
+    parser.add_argument('--mode', choices=('wsgi', 'asgi'), default='wsgi',
+                        help='App en el proceso: Flask (wsgi) o asgi.AsgiApp con el engine asyncio (asgi)')
+    parser.add_argument('--mix', choices=sorted(MIXES), default='mixed', help='Mezcla de operaciones')
+    parser.add_argument('--requests', type=int, default=2000, help='Peticiones a medir (0 = sin límite)')
+    parser.add_argument('--duration', type=float, help='Duración máxima de la medición en segundos')
+    parser.add_argument('--warmup', type=int, default=100, help='Peticiones previas que no se miden')
+    parser.add_argument('--concurrency', type=int, default=4, help='Hilos que envían peticiones')
+    parser.add_argument('--users-with-token', type=int, default=10, help='Usuarios que inician sesión')
+    parser.add_argument('--stream-profile', action='store_true',
+                        help='En lugar de la mezcla: primer byte y pico de RSS del listado completo con y sin streaming')
+    parser.add_argument('--stream-repeat', type=int, default=30, help='Peticiones por variante con --stream-profile')
+    return parse_common(parser, argv)
+
+
+def finish(args, report):
+    """Compara con la línea base si se pidió, escribe el JSON y devuelve el código de salida"""
+    exit_code = 0
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as baseline_file:
+            regressions = compare(report, json.load(baseline_file), args.threshold)
+        report['regressions'] = regressions
+        for item in regressions:
+            _log('REGRESIÓN %(operation)s %(field)s: %(baseline)s -> %(current)s' % item)
+        if regressions:
+            exit_code = 1
+
+    output = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as output_file:
+            output_file.write(output + '\n')
+    else:
+        print(output)
+    return exit_code
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.stream_profile:
+        return stream_profile(args)
+
+    if args.target:
+        if not args.no_seed:
+            # Se cargan los datos en la base del servidor antes de medir
+            create_benchmark_app(args)
+        make_client = lambda: HttpClient(args.target)
+    elif args.mode == 'asgi':
+        from asgi import AsgiApp, async_db
+
+        asgi_app = AsgiApp(create_benchmark_app(args))
+        loop = start_event_loop()
+        make_client = lambda: AsgiClient(asgi_app, loop)
+    else:
+        app = create_benchmark_app(args)
+        make_client = lambda: AppClient(app)
+
+    admin, tokens = login_tokens(make_client(), args.volumes, args.users_with_token)
+
+    if args.warmup:
+        run_phase(make_client, args, admin, tokens, args.warmup, None, None)
+
+    recorder = Recorder()
+    elapsed = run_phase(make_client, args, admin, tokens, args.requests or None, args.duration, recorder)
+    report = build_report(args, recorder, elapsed, pool_metrics(make_client()))
+    if args.mode == 'asgi' and not args.target:
+        asyncio.run_coroutine_threadsafe(async_db.dispose(), loop).result()
+    exit_code = finish(args, report)
+
+    total = report['total']
+    if total:
+        _log('%d peticiones en %.1f s: %.1f req/s, p50 %.1f ms, p95 %.1f ms, p99 %.1f ms' % (
+            total['requests'], elapsed, total['throughput_rps'],
+            total['p50_ms'], total['p95_ms'], total['p99_ms']
+        ))
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
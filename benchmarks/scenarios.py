@@ -0,0 +1,305 @@
+import itertools
+import random
+
+from benchmarks.seed import PASSWORD, WORDS
+
+
+class Context:
+    """Estado de un hilo del benchmark: tokens y entidades creadas por él.
+
+    Las operaciones de borrado y edición usan lo que creó el mismo hilo, así
+    la corrida no depende de qué filas siguen existiendo.
+    """
+
+    _ids = itertools.count(1)
+
+    def __init__(self, volumes, tokens, admin_token, seed):
+        self.volumes = volumes
+        self.tokens = tokens  # tokens[i] es el de bench{i + 1} (login_tokens)
+        self.admin = {'Authorization': 'Bearer ' + admin_token}
+        self.rng = random.Random(seed)
+        self.created = {'post': [], 'comment': [], 'category': [], 'user': [], 'user_follow': [], 'category_follow': []}
+
+    def user(self):
+        return {'Authorization': 'Bearer ' + self.rng.choice(self.tokens)}
+
+    def user_with_id(self):
+        """(id del usuario, cabeceras con su token)"""
+        index = self.rng.randrange(len(self.tokens))
+        return index + 1, {'Authorization': 'Bearer ' + self.tokens[index]}
+
+    def post_id(self):
+        return self.rng.randint(1, self.volumes['posts'])
+
+    def unique(self, prefix):
+        return '%s%d%d' % (prefix, self.rng.randint(0, 10 ** 6), next(self._ids))
+
+    def remember(self, kind, body, key):
+        if isinstance(body, dict) and body.get(key) is not None:
+            self.created[kind].append(body[key])
+
+    def take(self, kind):
+        return self.created[kind].pop() if self.created[kind] else None
+
+
+# Cada operación devuelve (método, ruta, kwargs) o None si todavía no tiene
+# sobre qué actuar (p. ej. borrar antes de haber creado)
+
+def posts_list(ctx):
+    return 'GET', '/api/posts', {}
+
+
+def posts_filter(ctx):
+    if ctx.rng.random() < 0.5:
+        return 'GET', '/api/posts?category=categoria-%d' % ctx.rng.randint(1, ctx.volumes['categories']), {}
+    return 'GET', '/api/posts?author=%d' % ctx.rng.randint(1, ctx.volumes['users']), {}
+
+
+def posts_detail(ctx):
+    return 'GET', '/api/posts/%d' % ctx.post_id(), {}
+
+
+def posts_stream(ctx):
+    return 'GET', '/api/posts?stream=ndjson', {}
+
+
+def posts_create(ctx):
+    return 'POST', '/api/posts', {'headers': ctx.user(), 'json': {
+        'title': 'Benchmark ' + ctx.rng.choice(WORDS), 'content': ' '.join(ctx.rng.sample(WORDS, 12))
+    }}
+
+
+def posts_update(ctx):
+    return 'PUT', '/api/posts/%d' % ctx.post_id(), {'headers': ctx.admin, 'json': {
+        'content': ' '.join(ctx.rng.sample(WORDS, 12))
+    }}
+
+
+def posts_batch(ctx):
+    return 'POST', '/api/posts:batch', {'headers': ctx.user(), 'json': {'posts': [
+        {'title': 'Lote ' + ctx.rng.choice(WORDS), 'content': ' '.join(ctx.rng.sample(WORDS, 12))}
+        for _ in range(5)
+    ]}}
+
+
+def posts_categories(ctx):
+    names = ['categoria-%d' % ctx.rng.randint(1, ctx.volumes['categories']) for _ in range(2)]
+    return 'PUT', '/api/posts/%d/categories' % ctx.post_id(), {'headers': ctx.admin, 'json': {'categories': names}}
+
+
+def posts_delete(ctx):
+    post_id = ctx.take('post')
+    if post_id is None:
+        return None
+    return 'DELETE', '/api/posts/%d' % post_id, {'headers': ctx.admin}
+
+
+def comments_list(ctx):
+    return 'GET', '/api/posts/%d/comments' % ctx.post_id(), {}
+
+
+def comments_create(ctx):
+    return 'POST', '/api/posts/%d/comments' % ctx.post_id(), {'headers': ctx.user(), 'json': {
+        'text': ' '.join(ctx.rng.sample(WORDS, 8))
+    }}
+
+
+def comments_update(ctx):
+    comment_id = ctx.created['comment'][-1] if ctx.created['comment'] else None
+    if comment_id is None:
+        return None
+    return 'PUT', '/api/comments/%d' % comment_id, {'headers': ctx.admin, 'json': {'text': 'editado'}}
+
+
+def comments_delete(ctx):
+    comment_id = ctx.take('comment')
+    if comment_id is None:
+        return None
+    return 'DELETE', '/api/comments/%d' % comment_id, {'headers': ctx.admin}
+
+
+def comments_batch_delete(ctx):
+    ids = [ctx.take('comment') for _ in range(min(5, len(ctx.created['comment'])))]
+    if not ids:
+        return None
+    return 'POST', '/api/comments:batch-delete', {'headers': ctx.admin, 'json': {'ids': ids}}
+
+
+def categories_list(ctx):
+    return 'GET', '/api/categories', {}
+
+
+def categories_create(ctx):
+    return 'POST', '/api/categories', {'headers': ctx.admin, 'json': {'name': ctx.unique('bench-')}}
+
+
+def categories_update(ctx):
+    category_id = ctx.created['category'][-1] if ctx.created['category'] else None
+    if category_id is None:
+        return None
+    return 'PUT', '/api/categories/%d' % category_id, {'headers': ctx.admin, 'json': {'name': ctx.unique('bench-')}}
+
+
+def categories_delete(ctx):
+    category_id = ctx.take('category')
+    if category_id is None:
+        return None
+    return 'DELETE', '/api/categories/%d' % category_id, {'headers': ctx.admin}
+
+
+def categories_follow(ctx):
+    category_id = ctx.rng.randint(1, ctx.volumes['categories'])
+    headers = ctx.user()
+    ctx.created['category_follow'].append((headers, category_id))
+    return 'POST', '/api/categories/%d/follow' % category_id, {'headers': headers}
+
+
+def categories_unfollow(ctx):
+    follow = ctx.take('category_follow')
+    if follow is None:
+        return None
+    headers, category_id = follow
+    return 'DELETE', '/api/categories/%d/follow' % category_id, {'headers': headers}
+
+
+def search(ctx):
+    return 'GET', '/api/search?q=%s' % '+'.join(ctx.rng.sample(WORDS, 2)), {}
+
+
+def stats(ctx):
+    return 'GET', '/api/stats', {'headers': ctx.admin}
+
+
+def users_list(ctx):
+    return 'GET', '/api/users', {'headers': ctx.admin}
+
+
+def users_stream(ctx):
+    return 'GET', '/api/users?stream=ndjson', {'headers': ctx.admin}
+
+
+def users_me(ctx):
+    return 'GET', '/api/users/me', {'headers': ctx.user()}
+
+
+def users_detail(ctx):
+    return 'GET', '/api/users/%d' % ctx.rng.randint(1, ctx.volumes['users']), {'headers': ctx.admin}
+
+
+def users_role(ctx):
+    user_id = ctx.created['user'][-1] if ctx.created['user'] else None
+    if user_id is None:
+        return None
+    return 'PATCH', '/api/users/%d/role' % user_id, {'headers': ctx.admin, 'json': {'role': 'moderator'}}
+
+
+def users_delete(ctx):
+    user_id = ctx.take('user')
+    if user_id is None:
+        return None
+    return 'DELETE', '/api/users/%d' % user_id, {'headers': ctx.admin}
+
+
+def users_follow(ctx):
+    follower_id, headers = ctx.user_with_id()
+    user_id = ctx.rng.randint(1, ctx.volumes['users'])
+    if user_id == follower_id:
+        return None
+    ctx.created['user_follow'].append((headers, user_id))
+    return 'POST', '/api/users/%d/follow' % user_id, {'headers': headers}
+
+
+def users_unfollow(ctx):
+    follow = ctx.take('user_follow')
+    if follow is None:
+        return None
+    headers, user_id = follow
+    return 'DELETE', '/api/users/%d/follow' % user_id, {'headers': headers}
+
+
+def feed(ctx):
+    return 'GET', '/api/feed', {'headers': ctx.user()}
+
+
+def auth_register(ctx):
+    name = ctx.unique('nuevo')
+    return 'POST', '/api/register', {'json': {
+        'username': name, 'email': name + '@example.com', 'password': PASSWORD
+    }}
+
+
+def auth_login(ctx):
+    user_id = ctx.rng.randint(1, ctx.volumes['users'])
+    return 'POST', '/api/login', {'json': {'email': 'bench%d@example.com' % user_id, 'password': PASSWORD}}
+
+
+# nombre -> (función, (tipo creado, clave en la respuesta) o None)
+OPERATIONS = {
+    'posts.list': (posts_list, None),
+    'posts.filter': (posts_filter, None),
+    'posts.detail': (posts_detail, None),
+    'posts.stream': (posts_stream, None),
+    'posts.create': (posts_create, ('post', 'post_id')),
+    'posts.update': (posts_update, None),
+    'posts.delete': (posts_delete, None),
+    'posts.batch': (posts_batch, None),
+    'posts.categories': (posts_categories, None),
+    'comments.list': (comments_list, None),
+    'comments.create': (comments_create, ('comment', 'comment_id')),
+    'comments.update': (comments_update, None),
+    'comments.delete': (comments_delete, None),
+    'comments.batch_delete': (comments_batch_delete, None),
+    'categories.list': (categories_list, None),
+    'categories.create': (categories_create, ('category', 'category_id')),
+    'categories.update': (categories_update, None),
+    'categories.delete': (categories_delete, None),
+    'categories.follow': (categories_follow, None),
+    'categories.unfollow': (categories_unfollow, None),
+    'search': (search, None),
+    'stats': (stats, None),
+    'users.list': (users_list, None),
+    'users.stream': (users_stream, None),
+    'users.me': (users_me, None),
+    'users.detail': (users_detail, None),
+    'users.role': (users_role, None),
+    'users.delete': (users_delete, None),
+    'users.follow': (users_follow, None),
+    'users.unfollow': (users_unfollow, None),
+    'feed': (feed, None),
+    'auth.register': (auth_register, ('user', 'id')),
+    'auth.login': (auth_login, None),
+}
+
+# Mezclas de operaciones con su peso relativo
+MIXES = {
+    # Tráfico típico de lectura
+    'read': {
+        'posts.list': 30, 'posts.filter': 10, 'posts.detail': 25, 'comments.list': 20,
+        'categories.list': 5, 'search': 5, 'users.me': 3, 'stats': 2
+    },
+    # Todas las rutas registradas en app.py, con tres cuartas partes de lecturas
+    'mixed': {
+        'posts.list': 20, 'posts.filter': 8, 'posts.detail': 18, 'comments.list': 15,
+        'categories.list': 4, 'search': 4, 'users.me': 2, 'users.detail': 1, 'users.list': 1,
+        'stats': 2, 'posts.stream': 1, 'feed': 4,
+        'posts.create': 6, 'posts.update': 2, 'posts.delete': 2, 'posts.batch': 0.5, 'posts.categories': 0.5,
+        'comments.create': 7, 'comments.update': 1, 'comments.delete': 2, 'comments.batch_delete': 0.5,
+        'categories.create': 1, 'categories.update': 0.5, 'categories.delete': 0.5,
+        'categories.follow': 0.3, 'categories.unfollow': 0.2, 'users.follow': 0.5, 'users.unfollow': 0.3,
+        'auth.register': 0.5, 'auth.login': 1, 'users.role': 0.3, 'users.delete': 0.3
+    },
+    'write': {
+        'posts.create': 30, 'posts.update': 15, 'posts.delete': 10,
+        'comments.create': 35, 'comments.delete': 10
+    },
+    # Throughput de autenticación (bcrypt en el pool de procesos)
+    'login': {'auth.login': 1},
+    # Respuestas en streaming de los listados completos
+    'stream': {'posts.stream': 3, 'users.stream': 1},
+    'search': {'search': 1},
+}
+
+
+def pick(ctx, weights):
+    names = list(weights)
+    return ctx.rng.choices(names, [weights[name] for name in names])[0]
@@ -0,0 +1,79 @@
+import random
+from datetime import datetime, timedelta
+
+from passlib.hash import bcrypt_sha256
+
+import stats
+from cache import cache
+from commands import _Importer
+
+
+# Contraseña de todos los usuarios generados; el usuario 1 es admin
+PASSWORD = 'benchmark'
+
+WORDS = (
+    'python', 'flask', 'base', 'datos', 'consulta', 'indice', 'cache', 'servidor', 'usuario',
+    'rendimiento', 'memoria', 'proceso', 'red', 'archivo', 'prueba', 'error', 'tabla', 'fila',
+    'columna', 'conexion', 'pool', 'replica', 'transaccion', 'bloqueo', 'latencia', 'carga',
+    'busqueda', 'texto', 'categoria', 'comentario', 'publicacion', 'perfil', 'token', 'sesion'
+)
+
+DEFAULT_VOLUMES = {'users': 200, 'categories': 20, 'posts': 2000, 'comments': 10000}
+
+
+def _sentence(rng, words):
+    return ' '.join(rng.choice(WORDS) for _ in range(words)).capitalize()
+
+
+def generate_rows(volumes, seed=1, rounds=12):
+    """Filas en el formato de `flask blog export` con los volúmenes pedidos"""
+    rng = random.Random(seed)
+    # Un solo hash compartido: generar uno por usuario tardaría minutos con el costo real
+    password_hash = bcrypt_sha256.using(rounds=rounds).hash(PASSWORD)
+    start = datetime(2024, 1, 1)
+
+    for user_id in range(1, volumes['users'] + 1):
+        yield {
+            'type': 'user', 'id': user_id, 'name': 'bench%d' % user_id,
+            'email': 'bench%d@example.com' % user_id, 'role': 'admin' if user_id == 1 else 'user',
+            'is_active': True, 'created_at': start.isoformat(), 'password_hash': password_hash
+        }
+
+    categories = ['categoria-%d' % index for index in range(1, volumes['categories'] + 1)]
+    for name in categories:
+        yield {'type': 'category', 'name': name}
+
+    post_dates = []
+    for post_id in range(1, volumes['posts'] + 1):
+        created_at = start + timedelta(minutes=post_id)
+        post_dates.append(created_at)
+        yield {
+            'type': 'post', 'id': post_id, 'title': _sentence(rng, 5),
+            'content': ' '.join(_sentence(rng, 12) + '.' for _ in range(4)),
+            'created_at': created_at.isoformat(), 'updated_at': created_at.isoformat(),
+            'user_id': rng.randint(1, volumes['users']), 'is_published': True,
+            'categories': rng.sample(categories, min(len(categories), rng.randint(0, 3)))
+        }
+
+    if not post_dates:
+        return
+    for comment_id in range(1, volumes['comments'] + 1):
+        post_id = rng.randint(1, len(post_dates))
+        created_at = post_dates[post_id - 1] + timedelta(seconds=rng.randint(1, 86400))
+        yield {
+            'type': 'comment', 'id': comment_id, 'text': _sentence(rng, 10),
+            'created_at': created_at.isoformat(), 'updated_at': created_at.isoformat(),
+            'user_id': rng.randint(1, volumes['users']), 'post_id': post_id, 'is_visible': True
+        }
+
+
+def seed(volumes, seed=1, rounds=12, batch_size=1000):
+    """Carga los datos con el mismo camino que `flask blog import` y devuelve las filas insertadas"""
+    importer = _Importer(batch_size)
+    for row in generate_rows(volumes, seed, rounds):
+        importer.add(row)
+    importer.flush()
+
+    stats.rebuild()
+    cache.invalidate('post', 'post:bulk', 'comment:bulk', 'category')
+    return importer.total
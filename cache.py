@@ -0,0 +1,248 @@
+import inspect
+import json
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from itertools import chain
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+class MemoryBackend:
+    """Backend en memoria del proceso con política LRU y expiración por TTL"""
+
+    def __init__(self, max_entries=1024):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, value = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                self.evictions += 1
+                return None
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def get_versions(self, tags):
+        with self._lock:
+            return [self._versions.get(tag, 0) for tag in tags]
+
+    def bump(self, tags):
+        with self._lock:
+            for tag in tags:
+                self._versions[tag] = self._versions.get(tag, 0) + 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._versions.clear()
+
+
+class RedisBackend:
+    """Backend compartido entre procesos (requiere el paquete redis)"""
+
+    def __init__(self, url, prefix='miniblog:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("CACHE_BACKEND='redis' requiere instalar el paquete redis")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+
+    @property
+    def evictions(self):
+        return self.client.info('stats').get('evicted_keys', 0)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return None if value is None else json.loads(value)
+
+    def set(self, key, value, ttl):
+        self.client.setex(self.prefix + key, ttl, json.dumps(value))
+
+    def get_versions(self, tags):
+        keys = [self.prefix + 'tag:' + tag for tag in tags]
+        return [int(v or 0) for v in self.client.mget(keys)]
+
+    def bump(self, tags):
+        pipe = self.client.pipeline()
+        for tag in tags:
+            pipe.incr(self.prefix + 'tag:' + tag)
+        pipe.execute()
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+class ResponseCache:
+    """Cache de respuestas de los GET públicos.
+
+    Cada respuesta se guarda bajo una clave que incluye la versión de sus
+    etiquetas ('post', 'post:3', ...). Invalidar una etiqueta incrementa su
+    versión, con lo que las entradas viejas dejan de encontrarse y terminan
+    saliendo por LRU o TTL.
+    """
+
+    def __init__(self):
+        self.backend = None
+        self.ttl = 60
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        backend = app.config.get('CACHE_BACKEND', 'memory')
+        self.ttl = app.config.get('CACHE_TTL', 60)
+        if backend == 'memory':
+            self.backend = MemoryBackend(app.config.get('CACHE_MAX_ENTRIES', 1024))
+        elif backend == 'redis':
+            self.backend = RedisBackend(app.config['CACHE_REDIS_URL'])
+        else:
+            self.backend = None
+
+    def cached(self, *tags):
+        """Decorador para cachear la respuesta de un GET (también de una vista async).
+
+        Las etiquetas pueden usar los argumentos de la ruta, p. ej. 'post:{post_id}'.
+        Solo se guardan las respuestas con código 200. Las respuestas leídas de
+        una réplica se guardan aparte, para que un cliente que acaba de
+        escribir no reciba una copia armada con datos atrasados.
+        """
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    if self.backend is None:
+                        return await fn(*args, **kwargs)
+                    key, cached = self._lookup(tags, kwargs)
+                    if cached is not None:
+                        return cached[0], cached[1]
+                    return self._store(key, await fn(*args, **kwargs))
+                return async_wrapper
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                if self.backend is None:
+                    return fn(*args, **kwargs)
+                key, cached = self._lookup(tags, kwargs)
+                if cached is not None:
+                    return cached[0], cached[1]
+                return self._store(key, fn(*args, **kwargs))
+            return wrapper
+        return decorator
+
+    def _lookup(self, tags, kwargs):
+        """Clave de la petición en curso y la respuesta guardada (o None)"""
+        resolved = [tag.format(**kwargs) for tag in tags]
+        versions = self.backend.get_versions(resolved)
+        source = 'replica' if g.get('read_replica') else 'primary'
+        key = 'resp:%s:%s|%s' % (
+            source, request.full_path,
+            ','.join('%s=%d' % pair for pair in zip(resolved, versions))
+        )
+        # Las etiquetas solo las invalidan los commits que ve el backend; el
+        # validador de conditional() cambia también con las escrituras de otros procesos
+        validator = g.get('validator')
+        if validator is not None:
+            key += '|v=' + validator
+        cached = self.backend.get(key)
+        self._count('hits' if cached is not None else 'misses')
+        return key, cached
+
+    def _store(self, key, result):
+        if isinstance(result, tuple) and len(result) == 2 and result[1] == 200:
+            self.backend.set(key, list(result), self.ttl)
+        return result
+
+    def invalidate(self, *tags):
+        if self.backend is not None and tags:
+            self.backend.bump(tags)
+
+    def stats(self):
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.backend.evictions if self.backend is not None else 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + 1)
+
+
+cache = ResponseCache()
+
+
+#### Invalidación a partir de los commits ####
+
+def _tags_for_instance(obj):
+    """Etiquetas afectadas por el alta, edición o baja de una instancia"""
+    from models import Post, Comment, Category
+
+    if isinstance(obj, Post):
+        return {'post', 'post:%s' % obj.id}
+    if isinstance(obj, Comment):
+        return {'comment:%s' % obj.post_id}
+    if isinstance(obj, Category):
+        return {'category'}
+    return set()
+
+
+def _tags_for_bulk(mapper):
+    """Etiquetas afectadas por un UPDATE/DELETE masivo sobre una tabla"""
+    from models import Post, Comment, Category
+
+    cls = mapper.class_ if mapper is not None else None
+    if cls is Post:
+        return {'post', 'post:bulk'}
+    if cls is Comment:
+        return {'comment:bulk'}
+    if cls is Category:
+        return {'category'}
+    return set()
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_flush_tags(session, flush_context):
+    tags = session.info.setdefault('cache_tags', set())
+    for obj in chain(session.new, session.dirty, session.deleted):
+        tags.update(_tags_for_instance(obj))
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _collect_bulk_tags(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        tags = orm_execute_state.session.info.setdefault('cache_tags', set())
+        tags.update(_tags_for_bulk(orm_execute_state.bind_mapper))
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    tags = session.info.pop('cache_tags', None)
+    if tags:
+        cache.invalidate(*tags)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    session.info.pop('cache_tags', None)
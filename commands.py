@@ -0,0 +1,303 @@
+import json
+import time
+from datetime import datetime, timedelta
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import select, insert
+from sqlalchemy.orm import aliased
+
+import feed
+import stats
+from cache import cache
+from jobs import jobs
+from models import db, User, UserCredential, Post, Category, Comment, post_category, user_follow, category_follow
+from softdelete import purge
+
+blog_cli = AppGroup('blog', help='Tareas de mantenimiento del blog')
+
+
+@blog_cli.command('rebuild-counters')
+def rebuild_counters():
+    """Reconstruye los contadores y las estadísticas desde cero"""
+    stats.rebuild()
+    click.echo('Contadores reconstruidos')
+
+
+@blog_cli.command('run-jobs')
+@click.option('--once', is_flag=True, help='Procesar los trabajos pendientes y terminar')
+def run_jobs(once):
+    """Procesa la cola de trabajos en primer plano"""
+    if once:
+        click.echo('%d trabajos procesados' % jobs.run_pending())
+        return
+    click.echo('Procesando trabajos (Ctrl+C para terminar)')
+    try:
+        jobs.run_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+@blog_cli.command('purge-deleted')
+@click.option('--older-than-days', type=int, default=None,
+              help='Días desde el borrado lógico (por defecto SOFT_DELETE_RETENTION_DAYS)')
+@click.option('--chunk-size', default=500, show_default=True, help='Filas por transacción')
+@click.option('--pause', default=0.1, show_default=True, help='Segundos de espera entre lotes')
+def purge_deleted(older_than_days, chunk_size, pause):
+    """Borra definitivamente los comentarios, posts y usuarios dados de baja"""
+    if older_than_days is None:
+        older_than_days = current_app.config['SOFT_DELETE_RETENTION_DAYS']
+    cutoff = datetime.utcnow() - timedelta(days=older_than_days)
+    # Primero los comentarios y después los posts, así el ON DELETE CASCADE
+    # de cada lote encuentra poco para borrar
+    for model in (Comment, Post, User):
+        removed = purge(db.session, model, cutoff, chunk_size, pause)
+        click.echo('%s: %d filas borradas' % (model.__tablename__, removed))
+
+
+#### EXPORTACIÓN / IMPORTACIÓN (NDJSON) ####
+
+# Orden en el que se exportan e importan los tipos, respetando las claves foráneas;
+# los seguimientos van al final para que al importarlos ya estén los posts del feed
+EXPORT_ORDER = ('user', 'category', 'post', 'comment', 'user_follow', 'category_follow')
+
+DATETIME_FIELDS = ('created_at', 'updated_at')
+
+
+def _stream(connection, statement, batch_size):
+    """Itera el resultado con un cursor del lado del servidor"""
+    result = connection.execution_options(yield_per=batch_size).execute(statement)
+    for row in result:
+        yield row._asdict()
+
+
+def _export_users(connection, batch_size):
+    statement = select(
+        User.id, User.name, User.email, User.role, User.is_active, User.created_at,
+        UserCredential.password_hash
+    ).outerjoin(UserCredential, UserCredential.user_id == User.id) \
+     .where(User.deleted_at.is_(None)).order_by(User.id)
+    return _stream(connection, statement, batch_size)
+
+
+def _export_categories(connection, batch_size):
+    statement = select(Category.id, Category.name).order_by(Category.id)
+    return _stream(connection, statement, batch_size)
+
+
+def _export_posts(connection, batch_size):
+    statement = select(
+        Post.id, Post.title, Post.content, Post.created_at, Post.updated_at,
+        Post.user_id, Post.is_published
+    ).where(Post.deleted_at.is_(None)).order_by(Post.id)
+    posts = _stream(connection, statement, batch_size)
+
+    # Las categorías se leen en un segundo cursor (otra conexión) ordenado
+    # igual que los posts, y se combinan sin cargarlas todas en memoria
+    with db.engine.connect() as categories_connection:
+        links = _stream(categories_connection, select(
+            post_category.c.post_id, Category.name
+        ).join(Category, Category.id == post_category.c.category_id)
+         .order_by(post_category.c.post_id), batch_size)
+        link = next(links, None)
+
+        for post in posts:
+            names = []
+            while link is not None and link['post_id'] <= post['id']:
+                if link['post_id'] == post['id']:
+                    names.append(link['name'])
+                link = next(links, None)
+            post['categories'] = names
+            yield post
+
+
+def _export_comments(connection, batch_size):
+    statement = select(
+        Comment.id, Comment.text, Comment.created_at, Comment.updated_at,
+        Comment.user_id, Comment.post_id, Comment.is_visible
+    ).where(Comment.deleted_at.is_(None)).order_by(Comment.id)
+    return _stream(connection, statement, batch_size)
+
+
+def _export_user_follows(connection, batch_size):
+    # Solo entre usuarios exportados (sin los dados de baja)
+    follower, followed = aliased(User), aliased(User)
+    statement = select(
+        user_follow.c.follower_id, user_follow.c.followed_id, user_follow.c.created_at
+    ).join(follower, follower.id == user_follow.c.follower_id) \
+     .join(followed, followed.id == user_follow.c.followed_id) \
+     .where(follower.deleted_at.is_(None), followed.deleted_at.is_(None)) \
+     .order_by(user_follow.c.follower_id, user_follow.c.followed_id)
+    return _stream(connection, statement, batch_size)
+
+
+def _export_category_follows(connection, batch_size):
+    # La categoría va por nombre, igual que en los posts
+    statement = select(
+        category_follow.c.user_id, Category.name.label('category'), category_follow.c.created_at
+    ).join(Category, Category.id == category_follow.c.category_id) \
+     .join(User, User.id == category_follow.c.user_id) \
+     .where(User.deleted_at.is_(None)) \
+     .order_by(category_follow.c.user_id, category_follow.c.category_id)
+    return _stream(connection, statement, batch_size)
+
+
+EXPORTERS = {
+    'user': _export_users,
+    'category': _export_categories,
+    'post': _export_posts,
+    'comment': _export_comments,
+    'user_follow': _export_user_follows,
+    'category_follow': _export_category_follows
+}
+
+
+@blog_cli.command('export')
+@click.argument('output', type=click.File('w', encoding='utf-8'), default='-')
+@click.option('--batch-size', default=1000, show_default=True, help='Filas por lectura del cursor')
+def export_data(output, batch_size):
+    """Exporta usuarios, categorías, posts, comentarios y seguimientos como NDJSON"""
+    started = time.perf_counter()
+    total = 0
+
+    with db.engine.connect() as connection:
+        for kind in EXPORT_ORDER:
+            for row in EXPORTERS[kind](connection, batch_size):
+                row['type'] = kind
+                for field in DATETIME_FIELDS:
+                    if row.get(field) is not None:
+                        row[field] = row[field].isoformat()
+                output.write(json.dumps(row, ensure_ascii=False) + '\n')
+                total += 1
+
+    _report('exportadas', total, started)
+
+
+class _Importer:
+    """Acumula filas por tipo y las inserta en lotes con executemany"""
+
+    def __init__(self, batch_size):
+        self.batch_size = batch_size
+        self.kind = None
+        self.rows = []
+        self.total = 0
+        self.categories = {
+            name: category_id for category_id, name in db.session.query(Category.id, Category.name)
+        }
+
+    def add(self, row):
+        kind = row.pop('type')
+        if kind not in EXPORTERS:
+            raise click.ClickException('Tipo de fila desconocido: %s' % kind)
+        if kind != self.kind or len(self.rows) >= self.batch_size:
+            self.flush()
+            self.kind = kind
+        for field in DATETIME_FIELDS:
+            if row.get(field):
+                row[field] = datetime.fromisoformat(row[field])
+        self.rows.append(row)
+
+    def flush(self):
+        if not self.rows:
+            return
+        getattr(self, '_insert_%s' % self.kind)(self.rows)
+        db.session.commit()
+        self.total += len(self.rows)
+        self.rows = []
+
+    def _insert_user(self, rows):
+        db.session.execute(insert(User.__table__), [{
+            'id': row['id'], 'name': row['name'], 'email': row['email'],
+            'role': row.get('role', 'user'), 'is_active': row.get('is_active', True),
+            'created_at': row.get('created_at')
+        } for row in rows])
+        # Los hashes se copian tal cual: las contraseñas siguen funcionando
+        credentials = [
+            {'user_id': row['id'], 'password_hash': row['password_hash']}
+            for row in rows if row.get('password_hash')
+        ]
+        if credentials:
+            db.session.execute(insert(UserCredential.__table__), credentials)
+
+    def _insert_category(self, rows):
+        # Las categorías se identifican por nombre; las existentes se reutilizan
+        new = [{'name': row['name']} for row in rows if row['name'] not in self.categories]
+        if new:
+            db.session.execute(insert(Category.__table__), new)
+            names = [row['name'] for row in new]
+            self.categories.update(
+                (name, category_id) for category_id, name in
+                db.session.query(Category.id, Category.name).filter(Category.name.in_(names))
+            )
+
+    def _insert_post(self, rows):
+        db.session.execute(insert(Post.__table__), [{
+            'id': row['id'], 'title': row['title'], 'content': row['content'],
+            'created_at': row.get('created_at'), 'updated_at': row.get('updated_at'),
+            'user_id': row['user_id'], 'is_published': row.get('is_published', True)
+        } for row in rows])
+        links = [
+            {'post_id': row['id'], 'category_id': self.categories[name]}
+            for row in rows for name in row.get('categories', [])
+            if name in self.categories
+        ]
+        if links:
+            db.session.execute(insert(post_category), links)
+
+    def _insert_comment(self, rows):
+        db.session.execute(insert(Comment.__table__), [{
+            'id': row['id'], 'text': row['text'],
+            'created_at': row.get('created_at'), 'updated_at': row.get('updated_at'),
+            'user_id': row['user_id'], 'post_id': row['post_id'],
+            'is_visible': row.get('is_visible', True)
+        } for row in rows])
+
+
+    def _insert_user_follow(self, rows):
+        db.session.execute(insert(user_follow), [{
+            'follower_id': row['follower_id'], 'followed_id': row['followed_id'],
+            'created_at': row.get('created_at') or datetime.utcnow()
+        } for row in rows])
+        # El feed no se exporta: se arma con los últimos posts de lo que sigue cada usuario
+        for row in rows:
+            feed.backfill_user(row['follower_id'], row['followed_id'])
+
+    def _insert_category_follow(self, rows):
+        rows = [row for row in rows if row['category'] in self.categories]
+        if not rows:
+            return
+        db.session.execute(insert(category_follow), [{
+            'user_id': row['user_id'], 'category_id': self.categories[row['category']],
+            'created_at': row.get('created_at') or datetime.utcnow()
+        } for row in rows])
+        for row in rows:
+            feed.backfill_category(row['user_id'], self.categories[row['category']])
+
+
+@blog_cli.command('import')
+@click.argument('source', type=click.File('r', encoding='utf-8'), default='-')
+@click.option('--batch-size', default=1000, show_default=True, help='Filas por INSERT')
+@click.option('--skip-counters', is_flag=True, help='No reconstruir los contadores al terminar')
+def import_data(source, batch_size, skip_counters):
+    """Importa un archivo NDJSON generado por `flask blog export`"""
+    started = time.perf_counter()
+    importer = _Importer(batch_size)
+
+    for line in source:
+        if line.strip():
+            importer.add(json.loads(line))
+    importer.flush()
+
+    _report('importadas', importer.total, started)
+
+    if not skip_counters:
+        stats.rebuild()
+        click.echo('Contadores reconstruidos')
+    cache.invalidate('post', 'post:bulk', 'comment:bulk', 'category')
+
+
+def _report(action, total, started):
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed else 0
+    click.echo('%d filas %s en %.1f s (%.0f filas/s)' % (total, action, elapsed, rate), err=True)
@@ -0,0 +1,119 @@
+"""Compresión de las respuestas (gzip o brotli) según Accept-Encoding.
+
+Se comprimen los cuerpos JSON y de texto desde COMPRESS_MIN_SIZE bytes (por
+debajo el encabezado y el costo de CPU no compensan) y los listados en
+streaming, de a un lote por vez. brotli es opcional: sin el paquete se
+ofrece solo gzip.
+
+Las respuestas comprimidas llevan el ETag como débil (W/"..."): el cuerpo
+cambia con la codificación, pero la representación es la misma y los GET
+condicionales (conditional.py) lo comparan así.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+import metrics
+
+try:
+    import brotli
+except ImportError:  # dependencia opcional
+    brotli = None
+
+
+COMPRESSIBLE_TYPES = ('application/json', 'application/x-ndjson', 'text/')
+
+responses_compressed = metrics.registry.counter('http_responses_compressed_total', 'Respuestas enviadas comprimidas')
+
+
+def _compressible(response):
+    mimetype = response.mimetype or ''
+    return any(mimetype.startswith(prefix) for prefix in COMPRESSIBLE_TYPES)
+
+
+def _gzip_stream(chunks, level):
+    # wbits=31: formato gzip en lugar de zlib
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    for chunk in chunks:
+        # Cada lote se envía apenas se genera, sin esperar a llenar el bloque
+        data = compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def _brotli_stream(chunks, quality):
+    compressor = brotli.Compressor(quality=quality)
+    for chunk in chunks:
+        data = compressor.process(chunk) + compressor.flush()
+        if data:
+            yield data
+    yield compressor.finish()
+
+
+class Compressor:
+    """Comprime en after_request las respuestas que el cliente acepta comprimidas"""
+
+    def __init__(self):
+        self.encodings = ()
+        self.min_size = 1024
+        self.gzip_level = 6
+        self.brotli_quality = 4
+
+    def init_app(self, app):
+        config = app.config
+        available = {'gzip'} if brotli is None else {'gzip', 'br'}
+        # En orden de preferencia, p. ej. 'br,gzip'; vacío desactiva la compresión
+        self.encodings = tuple(
+            name.strip() for name in config.get('COMPRESS_ALGORITHMS', 'br,gzip').split(',')
+            if name.strip() in available
+        )
+        self.min_size = config.get('COMPRESS_MIN_SIZE', 1024)
+        self.gzip_level = config.get('COMPRESS_GZIP_LEVEL', 6)
+        self.brotli_quality = config.get('COMPRESS_BROTLI_QUALITY', 4)
+        if self.encodings:
+            app.after_request(self._after_request)
+
+    def negotiate(self):
+        """Codificación a usar según Accept-Encoding, o None"""
+        return request.accept_encodings.best_match(self.encodings)
+
+    def compress(self, data, encoding):
+        if encoding == 'br':
+            return brotli.compress(data, quality=self.brotli_quality)
+        # mtime=0: el mismo cuerpo da siempre los mismos bytes
+        return gzip.compress(data, compresslevel=self.gzip_level, mtime=0)
+
+    def _after_request(self, response):
+        if response.status_code != 200 or response.direct_passthrough or not _compressible(response) \
+                or 'Content-Encoding' in response.headers:
+            return response
+        # La respuesta depende de Accept-Encoding aunque esta vez no se comprima
+        response.vary.add('Accept-Encoding')
+        encoding = self.negotiate()
+        if encoding is None:
+            return response
+
+        if response.is_streamed:
+            chunks = response.iter_encoded()
+            if encoding == 'br':
+                response.response = _brotli_stream(chunks, self.brotli_quality)
+            else:
+                response.response = _gzip_stream(chunks, self.gzip_level)
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(self.compress(data, encoding))
+
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        responses_compressed.inc(encoding=encoding)
+        return response
+
+
+compression = Compressor()
@@ -0,0 +1,73 @@
+import hashlib
+import inspect
+from datetime import timezone
+from functools import wraps
+
+from flask import g, request
+from werkzeug.http import http_date
+
+
+def conditional(validator):
+    """Decorador para GET condicionales con ETag y Last-Modified.
+
+    `validator` recibe los argumentos de la ruta y devuelve la tupla
+    (last_modified, token) obtenida con una consulta barata, o None si el
+    recurso no existe. Si el cliente ya tiene la versión vigente se responde
+    304 sin cargar ni serializar las filas; si no, el cache de respuestas busca
+    la copia de esa misma versión. Sobre una vista async (asgi.py)
+    el validador también tiene que ser una corrutina.
+    """
+    def decorator(fn):
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                validated = await validator(**kwargs)
+                if validated is None:
+                    return await fn(*args, **kwargs)
+                headers, not_modified = _evaluate(validated)
+                if not_modified:
+                    return '', 304, headers
+                return _with_headers(await fn(*args, **kwargs), headers)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            validated = validator(**kwargs)
+            if validated is None:
+                return fn(*args, **kwargs)
+            headers, not_modified = _evaluate(validated)
+            if not_modified:
+                return '', 304, headers
+            return _with_headers(fn(*args, **kwargs), headers)
+        return wrapper
+    return decorator
+
+
+def _evaluate(validated):
+    """Cabeceras del validador y si el cliente ya tiene esa versión"""
+    last_modified, token = validated
+    if last_modified is not None:
+        last_modified = last_modified.replace(microsecond=0)
+
+    # La ruta completa forma parte del ETag porque cada página es una representación distinta
+    digest = hashlib.sha1(('%s|%s' % (request.full_path, token)).encode()).hexdigest()
+    # El cache de respuestas lo agrega a la clave: una copia armada antes de que otro
+    # proceso cambiara la tabla no se sirve con el ETag nuevo
+    g.validator = digest
+    headers = {'ETag': '"%s"' % digest}
+    if last_modified is not None:
+        headers['Last-Modified'] = http_date(last_modified.replace(tzinfo=timezone.utc))
+
+    if request.if_none_match:
+        # Comparación débil (RFC 9110): las respuestas comprimidas llevan el ETag como W/"..."
+        return headers, request.if_none_match.contains_weak(digest)
+    if request.if_modified_since and last_modified is not None:
+        since = request.if_modified_since.astimezone(timezone.utc).replace(tzinfo=None)
+        return headers, last_modified <= since
+    return headers, False
+
+
+def _with_headers(result, headers):
+    if isinstance(result, tuple) and len(result) == 2 and result[1] == 200:
+        return result[0], result[1], headers
+    return result
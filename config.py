@@ -0,0 +1,146 @@
+import os
+from datetime import timedelta
+
+
+def env_int(name, default):
+    return int(os.environ.get(name, default))
+
+
+def env_bool(name, default):
+    return os.environ.get(name, str(default)).lower() in ('1', 'true', 'yes', 'on')
+
+
+class Config:
+    """Configuración por defecto, sobreescribible con variables de entorno"""
+
+    SECRET_KEY = os.environ.get('SECRET_KEY', 'clave_secreta')
+
+    # Base de datos
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'mysql+pymysql://root:@localhost/miniblog')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+
+    # Pool de conexiones
+    DB_POOL_SIZE = env_int('DB_POOL_SIZE', 10)
+    DB_MAX_OVERFLOW = env_int('DB_MAX_OVERFLOW', 20)
+    DB_POOL_TIMEOUT = env_int('DB_POOL_TIMEOUT', 30)
+    DB_POOL_RECYCLE = env_int('DB_POOL_RECYCLE', 1800)  # menor que wait_timeout de MySQL
+    DB_POOL_PRE_PING = env_bool('DB_POOL_PRE_PING', True)
+    # Control de admisión: con tantas peticiones esperando una conexión las
+    # nuevas se rechazan con 429 (0 = nunca)
+    DB_MAX_WAITING = env_int('DB_MAX_WAITING', 10)
+
+    # Modo ASGI (asgi.py): URL del engine asyncio para las lecturas (vacía: se
+    # deriva de DATABASE_URL) e hilos para las rutas que siguen siendo síncronas
+    ASYNC_DATABASE_URL = os.environ.get('ASYNC_DATABASE_URL', '')
+    ASGI_SYNC_THREADS = env_int('ASGI_SYNC_THREADS', 16)
+
+    # Réplicas de lectura (URLs separadas por coma) y segundos que un cliente
+    # sigue leyendo del primario después de escribir
+    DATABASE_REPLICA_URLS = os.environ.get('DATABASE_REPLICA_URLS', '')
+    REPLICA_STICKY_SECONDS = env_int('REPLICA_STICKY_SECONDS', 5)
+
+    # JWT
+    JWT_SECRET_KEY = os.environ.get('JWT_SECRET_KEY', 'jwt_clave_secreta')
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    REVOCATION_SYNC_SECONDS = env_int('REVOCATION_SYNC_SECONDS', 5)
+
+    # Límites de peticiones ('memory', 'redis' o 'none'). RATELIMIT_DEFAULT es
+    # por IP para todas las rutas; RATELIMIT_LIMITS cambia los de las vistas,
+    # p. ej. 'login=20/minute,search=none'. Con TESTING no se aplican.
+    RATELIMIT_BACKEND = os.environ.get('RATELIMIT_BACKEND', 'memory')
+    RATELIMIT_DEFAULT = os.environ.get('RATELIMIT_DEFAULT', '600/minute')
+    RATELIMIT_LIMITS = os.environ.get('RATELIMIT_LIMITS', '')
+    RATELIMIT_REDIS_URL = os.environ.get('RATELIMIT_REDIS_URL', '')  # vacía: la del cache
+    # Proxies delante de la app que agregan X-Forwarded-For (0: se usa la IP de
+    # la conexión). Sin esto, detrás de un proxy todos los clientes comparten el límite por IP
+    PROXY_FIX_X_FOR = env_int('PROXY_FIX_X_FOR', 0)
+
+    # Paginación
+    PAGE_SIZE = env_int('PAGE_SIZE', 20)
+    MAX_PAGE_SIZE = env_int('MAX_PAGE_SIZE', 100)
+    BATCH_MAX_ITEMS = env_int('BATCH_MAX_ITEMS', 100)  # elementos por pedido en lote
+
+    # Hash de contraseñas (HASH_POOL_WORKERS = 0 calcula en el mismo proceso)
+    BCRYPT_ROUNDS = env_int('BCRYPT_ROUNDS', 12)
+    HASH_POOL_WORKERS = env_int('HASH_POOL_WORKERS', 2)
+    HASH_MAX_PENDING = env_int('HASH_MAX_PENDING', 32)
+    HASH_TIMEOUT = env_int('HASH_TIMEOUT', 10)
+
+    # Cola de trabajos en segundo plano (JOB_WORKERS = 0: solo `flask blog run-jobs`)
+    JOB_WORKERS = env_int('JOB_WORKERS', 2)
+    JOB_POLL_SECONDS = env_int('JOB_POLL_SECONDS', 1)
+    JOB_MAX_ATTEMPTS = env_int('JOB_MAX_ATTEMPTS', 5)
+    JOB_RETRY_SECONDS = env_int('JOB_RETRY_SECONDS', 2)
+    JOB_LOCK_TIMEOUT = env_int('JOB_LOCK_TIMEOUT', 300)
+    JOB_RETENTION_HOURS = env_int('JOB_RETENTION_HOURS', 24)
+
+    # Feed: seguidores por trabajo de difusión, seguidores desde los que un autor
+    # se lee al pedir el feed en lugar de difundirse y posts copiados al seguir
+    FEED_FANOUT_BATCH = env_int('FEED_FANOUT_BATCH', 1000)
+    FEED_FANOUT_MAX_FOLLOWERS = env_int('FEED_FANOUT_MAX_FOLLOWERS', 10000)
+    FEED_BACKFILL_POSTS = env_int('FEED_BACKFILL_POSTS', 20)
+
+    # Días que se conservan las filas con borrado lógico antes de `flask blog purge-deleted`
+    SOFT_DELETE_RETENTION_DAYS = env_int('SOFT_DELETE_RETENTION_DAYS', 30)
+
+    # Búsqueda ('memory' para el índice en Python o 'mysql' para FULLTEXT)
+    SEARCH_BACKEND = os.environ.get('SEARCH_BACKEND', 'memory')
+    # Cada cuántos segundos el índice en memoria incorpora los cambios de otros procesos (0 = nunca)
+    SEARCH_SYNC_SECONDS = env_int('SEARCH_SYNC_SECONDS', 5)
+
+    # Cache de respuestas ('memory', 'redis' o 'none')
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_TTL = env_int('CACHE_TTL', 60)
+    CACHE_MAX_ENTRIES = env_int('CACHE_MAX_ENTRIES', 1024)
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+
+    # Compresión de las respuestas: codificaciones en orden de preferencia ('br'
+    # requiere el paquete brotli; vacío la desactiva) y tamaño mínimo en bytes
+    COMPRESS_ALGORITHMS = os.environ.get('COMPRESS_ALGORITHMS', 'br,gzip')
+    COMPRESS_MIN_SIZE = env_int('COMPRESS_MIN_SIZE', 1024)
+    COMPRESS_GZIP_LEVEL = env_int('COMPRESS_GZIP_LEVEL', 6)
+    COMPRESS_BROTLI_QUALITY = env_int('COMPRESS_BROTLI_QUALITY', 4)
+
+    # Cache en memoria de categorías y resúmenes de usuario (entities.py): filas
+    # por cache (0 lo desactiva) y segundos que tardan en verse los cambios
+    # hechos por otros procesos
+    ENTITY_CACHE_USERS = env_int('ENTITY_CACHE_USERS', 10000)
+    ENTITY_CACHE_CATEGORIES = env_int('ENTITY_CACHE_CATEGORIES', 1000)
+    ENTITY_CACHE_TTL = env_int('ENTITY_CACHE_TTL', 30)
+
+    # Métricas en formato Prometheus (/metrics)
+    METRICS_ENABLED = env_bool('METRICS_ENABLED', True)
+    # Cabecera Server-Timing con consultas SQL, tiempo en la base y serialización
+    SERVER_TIMING = env_bool('SERVER_TIMING', True)
+
+
+def engine_options(config, url=None, name='primary', asyncio=False):
+    """Opciones del engine de SQLAlchemy a partir de la configuración del pool
+    (asyncio=True para los engines de create_async_engine)"""
+    from metrics import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+
+    url = url or config['SQLALCHEMY_DATABASE_URI']
+    options = {
+        'pool_pre_ping': config['DB_POOL_PRE_PING'],
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        'pool_logging_name': name
+    }
+    # SQLite en memoria usa su propio pool sin tamaño configurable
+    if not url.startswith('sqlite'):
+        options.update(
+            poolclass=InstrumentedAsyncQueuePool if asyncio else InstrumentedQueuePool,
+            pool_size=config['DB_POOL_SIZE'],
+            max_overflow=config['DB_MAX_OVERFLOW'],
+            pool_timeout=config['DB_POOL_TIMEOUT']
+        )
+    return options
+
+
+def replica_binds(config):
+    """Binds 'replica_N' para SQLALCHEMY_BINDS a partir de DATABASE_REPLICA_URLS"""
+    urls = [url.strip() for url in config.get('DATABASE_REPLICA_URLS', '').split(',') if url.strip()]
+    binds = {}
+    for index, url in enumerate(urls):
+        name = 'replica_%d' % index
+        binds[name] = dict(engine_options(config, url, name), url=url)
+    return binds
@@ -0,0 +1,284 @@
+"""Cache en memoria del proceso para entidades chicas y muy leídas.
+
+Guarda por id una tupla inmutable con pocas columnas: las categorías (id,
+nombre) y un resumen de cada usuario (id, nombre, rol, activo). De aquí
+salen el autor anidado en posts y comentarios (sin JOIN con user) y las
+comprobaciones de existencia al crear o seguir categorías y usuarios. Cada cache es un LRU de hasta max_entries filas.
+
+Frescura: los eventos del mapper anotan en la sesión qué filas cambiaron y
+al confirmar el commit se descartan esas entradas; un UPDATE o DELETE
+masivo que toque las columnas del resumen vacía el cache entero. Cada
+descarte incrementa la versión, y una lectura que empezó antes no guarda lo
+que leyó. Los cambios hechos por otros procesos se ven a lo sumo
+ENTITY_CACHE_TTL segundos después.
+
+Los autores se cargan por lotes: al leer posts o comentarios se anotan sus
+user_id, y el primer autor que falta trae de una vez todos los anotados.
+"""
+import threading
+import time
+from collections import OrderedDict, namedtuple
+
+from flask import abort
+from sqlalchemy import event, inspect, select
+from sqlalchemy.orm import Session, object_session
+
+from models import db, User, Category, Post, Comment
+
+
+CategorySummary = namedtuple('CategorySummary', ('id', 'name'))
+UserSummary = namedtuple('UserSummary', ('id', 'name', 'role', 'is_active'))
+
+# Filas por consulta al cargar ids que faltan (por debajo del límite de parámetros de SQLite)
+LOAD_CHUNK = 500
+
+
+class EntityCache:
+    """Resúmenes por id de las filas de un modelo, con LRU y versión"""
+
+    def __init__(self, name, model, summary, max_entries=1000):
+        self.name = name
+        self.model = model
+        self.summary = summary
+        self.columns = [getattr(model, field) for field in summary._fields]
+        # Además de las del resumen: con deleted_at la fila deja de encontrarse
+        self.watched = set(summary._fields) | {'deleted_at'}
+        self.max_entries = max_entries
+        self.ttl = 30
+        self.version = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._all = None  # (versión, vencimiento, filas) si la tabla entra entera
+        self._lock = threading.Lock()
+
+    @property
+    def pending_key(self):
+        return 'entities:%s' % self.name
+
+    @property
+    def loaded_key(self):
+        return 'entities:%s:loaded' % self.name
+
+    def configure(self, max_entries, ttl):
+        """max_entries = 0 desactiva el cache (cada lectura va a la base)"""
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.invalidate()
+
+    #### Lectura ####
+
+    def get(self, entity_id):
+        """Resumen de la fila o None si no existe (o está borrada)"""
+        summary = self._lookup(entity_id)
+        if summary is not None:
+            return summary
+        # Lo leído sirve en la sesión hasta el commit aunque no entre en el LRU (o esté desactivado)
+        loaded = db.session.info.setdefault(self.loaded_key, {})
+        if entity_id not in loaded:
+            # Se aprovecha la consulta para los ids anotados al cargar posts y comentarios
+            pending = db.session.info.pop(self.pending_key, ())
+            ids = {pending_id for pending_id in pending if self._lookup(pending_id, count=False) is None}
+            ids.add(entity_id)
+            loaded.update(dict.fromkeys(ids))
+            loaded.update(self._load(db.session, ids))
+        return loaded[entity_id]
+
+    def get_or_404(self, entity_id):
+        summary = self.get(entity_id)
+        if summary is None:
+            abort(404)
+        return summary
+
+    def get_many(self, ids):
+        """{id: resumen} de las filas que existen, con una consulta para las que faltan"""
+        found = {}
+        missing = set()
+        for entity_id in ids:
+            summary = self._lookup(entity_id)
+            if summary is None:
+                missing.add(entity_id)
+            else:
+                found[entity_id] = summary
+        if missing:
+            found.update(self._load(db.session, missing))
+        return found
+
+    def all(self):
+        """Todas las filas ordenadas por id; se guardan juntas si entran en max_entries"""
+        now = time.monotonic()
+        with self._lock:
+            cached = self._all
+            if cached is not None and cached[0] == self.version and cached[1] > now:
+                self.hits += 1
+                return cached[2]
+            self.misses += 1
+            version = self.version
+        rows = [self.summary(*row) for row in db.session.execute(select(*self.columns).order_by(self.model.id))]
+        if len(rows) <= self.max_entries:
+            with self._lock:
+                if version == self.version:
+                    self._all = (version, now + self.ttl, rows)
+            self._store(rows, version)
+        return rows
+
+    async def prime(self, session):
+        """Carga con una sesión async los ids anotados en ella que no estén en el
+        cache, para que la serialización no tenga que consultar la base"""
+        ids = session.sync_session.info.pop(self.pending_key, set())
+        missing = [entity_id for entity_id in ids if self._lookup(entity_id, count=False) is None]
+        # Donde get() busca lo leído en la petición: sirve aunque no entre en el LRU (o esté desactivado)
+        loaded = db.session.info.setdefault(self.loaded_key, {})
+        loaded.update(dict.fromkeys(missing))
+        for start in range(0, len(missing), LOAD_CHUNK):
+            version = self.version
+            result = await session.execute(self._statement(missing[start:start + LOAD_CHUNK]))
+            rows = [self.summary(*row) for row in result]
+            self._store(rows, version)
+            loaded.update((row.id, row) for row in rows)
+
+    def _lookup(self, entity_id, count=True):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(entity_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(entity_id)
+                if count:
+                    self.hits += 1
+                return entry[1]
+            if count:
+                self.misses += 1
+            return None
+
+    def _statement(self, ids):
+        return select(*self.columns).where(self.model.id.in_(ids))
+
+    def _load(self, session, ids):
+        ids = sorted(ids)
+        found = {}
+        for start in range(0, len(ids), LOAD_CHUNK):
+            version = self.version
+            rows = [self.summary(*row) for row in session.execute(self._statement(ids[start:start + LOAD_CHUNK]))]
+            self._store(rows, version)
+            found.update((row.id, row) for row in rows)
+        return found
+
+    def _store(self, rows, version):
+        """Guarda las filas leídas, salvo que algo se haya invalidado mientras tanto"""
+        if not self.max_entries:
+            return
+        expires_at = time.monotonic() + self.ttl
+        with self._lock:
+            if version != self.version:
+                return
+            for row in rows:
+                self._entries[row.id] = (expires_at, row)
+                self._entries.move_to_end(row.id)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    #### Invalidación ####
+
+    def invalidate(self, ids=None):
+        """Descarta las filas `ids` (None: todas)"""
+        with self._lock:
+            self.version += 1
+            self._all = None
+            if ids is None:
+                self._entries.clear()
+            else:
+                for entity_id in ids:
+                    self._entries.pop(entity_id, None)
+
+    def stats(self):
+        return {'hits': self.hits, 'misses': self.misses, 'entries': len(self._entries)}
+
+
+users = EntityCache('users', User, UserSummary, max_entries=10000)
+categories = EntityCache('categories', Category, CategorySummary, max_entries=1000)
+CACHES = {User: users, Category: categories}
+
+
+def init_app(app):
+    config = app.config
+    users.configure(config.get('ENTITY_CACHE_USERS', 10000), config.get('ENTITY_CACHE_TTL', 30))
+    categories.configure(config.get('ENTITY_CACHE_CATEGORIES', 1000), config.get('ENTITY_CACHE_TTL', 30))
+
+
+#### Autores pendientes ####
+
+def _remember_author(target, context):
+    # Solo si user_id vino en la consulta: leerlo no debe disparar otra (?fields= sin autor)
+    user_id = target.__dict__.get('user_id')
+    if user_id is not None:
+        context.session.info.setdefault(users.pending_key, set()).add(user_id)
+
+
+event.listen(Post, 'load', _remember_author)
+event.listen(Comment, 'load', _remember_author)
+
+
+#### Frescura a partir de los commits ####
+
+def _changes(session):
+    return session.info.setdefault('entity_changes', {})
+
+
+def _record(target, cache):
+    session = object_session(target)
+    if session is not None:
+        ids = _changes(session).setdefault(cache, set())
+        if ids is not None:
+            ids.add(target.id)
+
+
+def _record_row(mapper, connection, target):
+    _record(target, CACHES[mapper.class_])
+
+
+def _record_update(mapper, connection, target):
+    # Cambios en otras columnas (contadores, token_version, ...) no afectan al resumen
+    cache = CACHES[mapper.class_]
+    state = inspect(target)
+    if any(state.attrs[name].history.has_changes() for name in cache.watched if name in state.attrs):
+        _record(target, cache)
+
+
+for _model in CACHES:
+    event.listen(_model, 'after_insert', _record_row)
+    event.listen(_model, 'after_update', _record_update)
+    event.listen(_model, 'after_delete', _record_row)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _record_bulk(orm_execute_state):
+    if not (orm_execute_state.is_update or orm_execute_state.is_delete):
+        return
+    mapper = orm_execute_state.bind_mapper
+    cache = CACHES.get(mapper.class_) if mapper is not None else None
+    if cache is None:
+        return
+    if orm_execute_state.is_update:
+        # Los contadores (post_count, follower_count) no forman parte del resumen
+        values = getattr(orm_execute_state.statement, '_values', None)
+        if values and not {getattr(column, 'key', column) for column in values} & cache.watched:
+            return
+    _changes(orm_execute_state.session)[cache] = None
+
+
+def _forget_loaded(session):
+    for cache in CACHES.values():
+        session.info.pop(cache.loaded_key, None)
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_on_commit(session):
+    _forget_loaded(session)
+    for cache, ids in session.info.pop('entity_changes', {}).items():
+        cache.invalidate(ids)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_on_rollback(session):
+    _forget_loaded(session)
+    session.info.pop('entity_changes', None)
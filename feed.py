@@ -0,0 +1,202 @@
+"""Feed personal: posts de los autores y categorías que sigue cada usuario.
+
+Difusión al escribir: al crearse un post, un trabajo en segundo plano copia
+(user_id, post_id, created_at) a feed_entry para cada seguidor, de a
+FEED_FANOUT_BATCH filas por trabajo; así leer el feed es un solo rango del
+índice (user_id, created_at, post_id), haya los posts que haya.
+
+Los autores con FEED_FANOUT_MAX_FOLLOWERS seguidores o más no se difunden
+(serían demasiadas filas por post): sus posts se leen al pedir el feed y se
+mezclan con los de feed_entry (difusión al leer). Las categorías siempre se
+difunden.
+"""
+from flask import current_app
+from sqlalchemy import select, insert, update, delete, literal, union
+
+from jobs import jobs
+from models import db, User, Post, FeedEntry, post_category, user_follow, category_follow
+from pagination import position_condition
+
+
+def _insert_ignore(table):
+    """INSERT que saltea las filas repetidas (mismo recurso que jobs.enqueue)"""
+    return insert(table).prefix_with('IGNORE', dialect='mysql').prefix_with('OR IGNORE', dialect='sqlite')
+
+
+def _popular(user):
+    """True si los posts del autor se leen al pedir el feed en lugar de difundirse"""
+    return user.follower_count >= current_app.config.get('FEED_FANOUT_MAX_FOLLOWERS', 10000)
+
+
+#### Difusión al escribir ####
+
+def _audience(post, author, after, limit):
+    """Próximos `limit` seguidores del post (del autor o de sus categorías) con id mayor que `after`"""
+    followers = [
+        select(category_follow.c.user_id.label('user_id'))
+        .join(post_category, post_category.c.category_id == category_follow.c.category_id)
+        .where(post_category.c.post_id == post.id)
+    ]
+    if not _popular(author):
+        followers.append(select(user_follow.c.follower_id).where(user_follow.c.followed_id == post.user_id))
+    audience = union(*followers).subquery()
+    return db.session.scalars(
+        select(audience.c.user_id)
+        .join(User, User.id == audience.c.user_id)
+        .where(audience.c.user_id > after, audience.c.user_id != post.user_id, User.deleted_at.is_(None))
+        .order_by(audience.c.user_id)
+        .limit(limit)
+    ).all()
+
+
+@jobs.task('feed.fanout')
+def fan_out(post_id, after=0):
+    """Agrega el post al feed de un lote de seguidores y encola el lote siguiente"""
+    post = db.session.get(Post, post_id)
+    if post is None:
+        return
+    # El autor se lee aunque esté dado de baja (post.author sería None); sus posts no se difunden
+    author = db.session.get(User, post.user_id, execution_options={'include_deleted': True})
+    if author is None or author.deleted_at is not None:
+        return
+    batch_size = current_app.config.get('FEED_FANOUT_BATCH', 1000)
+    user_ids = _audience(post, author, after, batch_size)
+    if not user_ids:
+        return
+    db.session.execute(_insert_ignore(FeedEntry.__table__), [
+        {'user_id': user_id, 'post_id': post.id, 'created_at': post.created_at} for user_id in user_ids
+    ])
+    if len(user_ids) == batch_size:
+        jobs.enqueue('feed.fanout', {'post_id': post.id, 'after': user_ids[-1]},
+                     key='feed:post:%d:after:%d' % (post.id, user_ids[-1]))
+
+
+def post_created(post):
+    """Difunde el post a los seguidores (llamar antes del commit, con el id asignado)"""
+    jobs.enqueue('feed.fanout', {'post_id': post.id}, key='feed:post:%d' % post.id)
+
+
+def categories_added(post, categories):
+    """Difunde el post a los seguidores de las categorías que se le agregaron"""
+    ids = ','.join(str(category.id) for category in sorted(categories, key=lambda category: category.id))
+    # Los seguidores que ya lo tenían se saltean con el INSERT IGNORE
+    jobs.enqueue('feed.fanout', {'post_id': post.id}, key='feed:post:%d:categories:%s' % (post.id, ids))
+
+
+#### Seguir y dejar de seguir ####
+
+def _backfill(user_id, posts):
+    """Copia al feed los últimos FEED_BACKFILL_POSTS posts de `posts` (un select de Post)"""
+    limit = current_app.config.get('FEED_BACKFILL_POSTS', 20)
+    latest = posts.where(Post.deleted_at.is_(None)).order_by(Post.created_at.desc(), Post.id.desc()).limit(limit)
+    latest = latest.with_only_columns(literal(user_id), Post.id, Post.created_at).subquery()
+    db.session.execute(
+        _insert_ignore(FeedEntry.__table__).from_select(['user_id', 'post_id', 'created_at'], select(latest))
+    )
+
+
+def _reachable(user_id):
+    """Posts que llegan al feed del usuario por lo que sigue todavía"""
+    by_author = select(Post.id).join(user_follow, user_follow.c.followed_id == Post.user_id) \
+        .where(user_follow.c.follower_id == user_id)
+    by_category = select(post_category.c.post_id) \
+        .join(category_follow, category_follow.c.category_id == post_category.c.category_id) \
+        .where(category_follow.c.user_id == user_id)
+    return union(by_author, by_category)
+
+
+def _prune(user_id, post_ids):
+    """Quita del feed los posts de `post_ids` que ya no llegan por otro seguimiento"""
+    db.session.execute(
+        delete(FeedEntry).where(
+            FeedEntry.user_id == user_id,
+            FeedEntry.post_id.in_(post_ids),
+            FeedEntry.post_id.not_in(_reachable(user_id))
+        ),
+        execution_options={'synchronize_session': False}
+    )
+
+
+def backfill_user(follower_id, followed_id):
+    """Copia al feed los últimos posts de un autor seguido (también al importar)"""
+    _backfill(follower_id, select(Post).where(Post.user_id == followed_id))
+
+
+def backfill_category(user_id, category_id):
+    """Copia al feed los últimos posts ajenos de una categoría seguida (también al importar)"""
+    _backfill(user_id, select(Post).join(post_category, post_category.c.post_id == Post.id)
+              .where(post_category.c.category_id == category_id, Post.user_id != user_id))
+
+
+def follow_user(follower_id, followed):
+    """Devuelve False si ya lo seguía"""
+    result = db.session.execute(_insert_ignore(user_follow).values(follower_id=follower_id, followed_id=followed.id))
+    if not result.rowcount:
+        return False
+    db.session.execute(
+        update(User).where(User.id == followed.id).values(follower_count=User.follower_count + 1)
+    )
+    if not _popular(followed):
+        backfill_user(follower_id, followed.id)
+    return True
+
+
+def unfollow_user(follower_id, followed):
+    """Devuelve False si no lo seguía"""
+    result = db.session.execute(delete(user_follow).where(
+        user_follow.c.follower_id == follower_id, user_follow.c.followed_id == followed.id
+    ))
+    if not result.rowcount:
+        return False
+    db.session.execute(
+        update(User).where(User.id == followed.id).values(follower_count=User.follower_count - 1)
+    )
+    _prune(follower_id, select(Post.id).where(Post.user_id == followed.id))
+    return True
+
+
+def follow_category(user_id, category):
+    result = db.session.execute(_insert_ignore(category_follow).values(user_id=user_id, category_id=category.id))
+    if not result.rowcount:
+        return False
+    backfill_category(user_id, category.id)
+    return True
+
+
+def unfollow_category(user_id, category):
+    result = db.session.execute(delete(category_follow).where(
+        category_follow.c.user_id == user_id, category_follow.c.category_id == category.id
+    ))
+    if not result.rowcount:
+        return False
+    _prune(user_id, select(post_category.c.post_id).where(post_category.c.category_id == category.id))
+    return True
+
+
+#### Lectura ####
+
+def page_entries(user_id, position, limit):
+    """Las `limit` + 1 entradas (id, created_at) siguientes a `position`, de
+    más nueva a más vieja: el rango de feed_entry mezclado con los posts de
+    los autores populares que sigue el usuario."""
+    entries = select(FeedEntry.post_id.label('id'), FeedEntry.created_at).where(FeedEntry.user_id == user_id)
+    if position:
+        entries = entries.where(position_condition(FeedEntry.created_at, FeedEntry.post_id, *position))
+    rows = db.session.execute(
+        entries.order_by(FeedEntry.created_at.desc(), FeedEntry.post_id.desc()).limit(limit + 1)
+    ).all()
+
+    popular_authors = select(user_follow.c.followed_id) \
+        .join(User, User.id == user_follow.c.followed_id) \
+        .where(user_follow.c.follower_id == user_id,
+               User.follower_count >= current_app.config.get('FEED_FANOUT_MAX_FOLLOWERS', 10000))
+    posts = select(Post.id, Post.created_at).where(Post.user_id.in_(popular_authors), Post.is_published == True)
+    if position:
+        posts = posts.where(position_condition(Post.created_at, Post.id, *position))
+    rows += db.session.execute(
+        posts.order_by(Post.created_at.desc(), Post.id.desc()).limit(limit + 1)
+    ).all()
+
+    # Un post puede estar en los dos lados si el autor pasó a ser popular después de difundirlo
+    unique = {row.id: row for row in rows}
+    return sorted(unique.values(), key=lambda row: (row.created_at, row.id), reverse=True)[:limit + 1]
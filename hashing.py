@@ -0,0 +1,81 @@
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+
+from passlib.hash import bcrypt_sha256
+
+
+class HashingBusy(Exception):
+    """Hay demasiadas operaciones de hash en espera"""
+
+
+# Funciones de módulo para que el pool de procesos pueda serializarlas
+def _hash(password, rounds):
+    return bcrypt_sha256.using(rounds=rounds).hash(password)
+
+
+def _verify(password, password_hash):
+    return bcrypt_sha256.verify(password, password_hash)
+
+
+class PasswordHasher:
+    """Hash y verificación de contraseñas en un pool de procesos acotado.
+
+    El trabajo de bcrypt se hace fuera del worker que atiende la petición y,
+    si ya hay HASH_MAX_PENDING operaciones en curso, se rechaza con
+    HashingBusy en lugar de encolar sin límite. Con HASH_POOL_WORKERS = 0 se
+    calcula en el mismo proceso.
+    """
+
+    def __init__(self):
+        self.rounds = 12
+        self.workers = 0
+        self.timeout = 10
+        self._slots = None
+        self._pool = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.rounds = app.config.get('BCRYPT_ROUNDS', 12)
+        self.workers = app.config.get('HASH_POOL_WORKERS', 2)
+        self.timeout = app.config.get('HASH_TIMEOUT', 10)
+        self._slots = threading.BoundedSemaphore(app.config.get('HASH_MAX_PENDING', 32))
+
+    def hash(self, password):
+        return self._run(_hash, password, self.rounds)
+
+    def verify(self, password, password_hash):
+        return self._run(_verify, password, password_hash)
+
+    def needs_update(self, password_hash):
+        """Indica si el hash se generó con otro costo y conviene regenerarlo"""
+        return bcrypt_sha256.using(rounds=self.rounds).needs_update(password_hash)
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+
+        if not self._slots.acquire(blocking=False):
+            raise HashingBusy("Demasiadas solicitudes de autenticación en curso")
+        try:
+            future = self._get_pool().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # El lugar se libera cuando termina la tarea, no cuando deja de esperarla
+        # la petición: si no, las que vencen el timeout seguirían ocupando el pool
+        future.add_done_callback(lambda _: self._slots.release())
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            raise HashingBusy("La autenticación tardó demasiado")
+
+    def _get_pool(self):
+        # Se crea en el primer uso para no lanzar procesos en los comandos de la CLI
+        if self._pool is None:
+            with self._lock:
+                if self._pool is None:
+                    self._pool = ProcessPoolExecutor(max_workers=self.workers)
+        return self._pool
+
+
+hasher = PasswordHasher()
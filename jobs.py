@@ -0,0 +1,206 @@
+import json
+import os
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+
+from sqlalchemy import event, insert, update, select, delete, or_, and_
+from sqlalchemy.orm import Session
+
+from models import db, Job
+
+
+class JobQueue:
+    """Cola de trabajos persistida en la tabla `job`, sin servicios externos.
+
+    Los trabajos se encolan dentro de la transacción de la vista, así que
+    solo existen si el commit se confirma. Después del commit se despiertan
+    JOB_WORKERS hilos del mismo proceso (se crean en el primer uso) que los
+    toman de a uno: el trabajo y su marca de terminado se confirman juntos,
+    y si falla se reintenta con espera exponencial hasta max_attempts.
+    Varios procesos pueden compartir la cola porque cada trabajo se reclama
+    con un UPDATE condicionado al estado. Con JOB_WORKERS = 0 solo se
+    procesan con `flask blog run-jobs`.
+    """
+
+    PURGE_INTERVAL = 600
+
+    def __init__(self):
+        self.handlers = {}
+        self.app = None
+        self.workers = 2
+        self.poll_seconds = 1
+        self.max_attempts = 5
+        self.retry_seconds = 2
+        self.lock_timeout = timedelta(seconds=300)
+        self.retention = timedelta(hours=24)
+        self.eager = False
+        self.worker_id = '%s:%d' % (socket.gethostname(), os.getpid())
+        self._threads = []
+        self._wakeup = threading.Event()
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._next_purge = 0
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('JOB_WORKERS', 2)
+        self.poll_seconds = app.config.get('JOB_POLL_SECONDS', 1)
+        self.max_attempts = app.config.get('JOB_MAX_ATTEMPTS', 5)
+        self.retry_seconds = app.config.get('JOB_RETRY_SECONDS', 2)
+        self.lock_timeout = timedelta(seconds=app.config.get('JOB_LOCK_TIMEOUT', 300))
+        self.retention = timedelta(hours=app.config.get('JOB_RETENTION_HOURS', 24))
+        # En las pruebas los trabajos corren apenas se confirma el commit
+        self.eager = app.config.get('JOBS_EAGER', app.testing)
+
+    def task(self, kind, max_attempts=None):
+        """Registra la función que ejecuta los trabajos de un tipo"""
+        def decorator(fn):
+            self.handlers[kind] = (fn, max_attempts)
+            return fn
+        return decorator
+
+    def enqueue(self, kind, payload=None, key=None, delay=0):
+        """Agrega un trabajo a la transacción en curso.
+
+        Si ya existe un trabajo con la misma clave de idempotencia no se
+        agrega otro.
+        """
+        _, max_attempts = self.handlers.get(kind, (None, None))
+        now = datetime.utcnow()
+        statement = insert(Job.__table__).values(
+            kind=kind, payload=json.dumps(payload or {}), idempotency_key=key,
+            status='pending', attempts=0, max_attempts=max_attempts or self.max_attempts,
+            run_at=now + timedelta(seconds=delay), created_at=now
+        )
+        if key is not None:
+            statement = statement.prefix_with('IGNORE', dialect='mysql') \
+                .prefix_with('OR IGNORE', dialect='sqlite')
+        db.session.execute(statement)
+        db.session.info['jobs_enqueued'] = True
+
+    def wakeup(self):
+        """Avisa a los workers que hay trabajos nuevos"""
+        if self.eager:
+            # Si el aviso viene de un trabajo en ejecución, lo toma el mismo ciclo
+            if not getattr(self._local, 'running', False):
+                self.run_pending()
+            return
+        if self.workers:
+            self._start_workers()
+            self._wakeup.set()
+
+    #### Ejecución ####
+
+    def run_pending(self):
+        """Ejecuta los trabajos vencidos hasta vaciar la cola; devuelve cuántos corrió"""
+        self._local.running = True
+        try:
+            processed = 0
+            while self.run_next():
+                processed += 1
+            return processed
+        finally:
+            self._local.running = False
+
+    def run_forever(self):
+        while True:
+            if not self.run_next():
+                self._wakeup.wait(self.poll_seconds)
+                self._wakeup.clear()
+
+    def run_next(self):
+        """Reclama y ejecuta un trabajo; devuelve False si no había ninguno"""
+        with self.app.app_context():
+            now = datetime.utcnow()
+            self._maybe_purge(now)
+            claimable = or_(
+                and_(Job.status == 'pending', Job.run_at <= now),
+                # Trabajos de un worker que murió sin terminarlos
+                and_(Job.status == 'running', Job.locked_at < now - self.lock_timeout)
+            )
+            candidates = db.session.scalars(
+                select(Job.id).where(claimable).order_by(Job.run_at).limit(10)
+            ).all()
+            for job_id in candidates:
+                claimed = db.session.execute(
+                    update(Job).where(Job.id == job_id, claimable).values(
+                        status='running', locked_at=now, locked_by=self.worker_id,
+                        attempts=Job.attempts + 1
+                    )
+                ).rowcount
+                db.session.commit()
+                if claimed:
+                    self._run(job_id)
+                    return True
+            return False
+
+    def _run(self, job_id):
+        job = db.session.get(Job, job_id)
+        try:
+            handler = self.handlers.get(job.kind)
+            if handler is None:
+                raise LookupError('Tipo de trabajo desconocido: %s' % job.kind)
+            handler[0](**json.loads(job.payload))
+            job.status = 'done'
+            job.finished_at = datetime.utcnow()
+            job.last_error = None
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            self.app.logger.exception('Falló el trabajo %s', job_id)
+            job = db.session.get(Job, job_id)
+            job.last_error = traceback.format_exc()[-2000:]
+            if job.attempts >= job.max_attempts:
+                job.status = 'failed'
+                job.finished_at = datetime.utcnow()
+            else:
+                job.status = 'pending'
+                job.run_at = datetime.utcnow() + timedelta(seconds=self.retry_seconds * 2 ** (job.attempts - 1))
+            db.session.commit()
+
+    def _maybe_purge(self, now):
+        # Los terminados se guardan un tiempo para que las claves sigan evitando duplicados
+        if time.monotonic() < self._next_purge:
+            return
+        self._next_purge = time.monotonic() + self.PURGE_INTERVAL
+        db.session.execute(delete(Job).where(Job.status == 'done', Job.finished_at < now - self.retention))
+        db.session.commit()
+
+    def _start_workers(self):
+        # Se crean en el primer uso: así no se lanzan en la CLI ni antes del fork del servidor
+        if len(self._threads) == self.workers and all(thread.is_alive() for thread in self._threads):
+            return
+        with self._lock:
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work_loop, name='job-worker', daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _work_loop(self):
+        while True:
+            try:
+                self.run_forever()
+            except Exception:
+                # Error de conexión u otro problema fuera de un trabajo: se reintenta
+                self.app.logger.exception('Error en el worker de trabajos')
+                time.sleep(self.poll_seconds)
+
+
+jobs = JobQueue()
+
+
+#### Aviso después del commit ####
+
+@event.listens_for(Session, 'after_commit')
+def _notify_workers(session):
+    if session.info.pop('jobs_enqueued', False):
+        jobs.wakeup()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_notification(session):
+    session.info.pop('jobs_enqueued', None)
@@ -0,0 +1,291 @@
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, has_request_context, request
+from flask.views import MethodView
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+from models import db
+
+
+#### REGISTRO DE MÉTRICAS (formato de texto de Prometheus) ####
+
+def _format_labels(labels):
+    if not labels:
+        return ''
+    return '{%s}' % ','.join('%s="%s"' % (key, value) for key, value in labels)
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name, description):
+        self.name = name
+        self.description = description
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, key, value) for key, value in self._values.items()]
+
+
+class Gauge(Counter):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        with self._lock:
+            self._values[key] = value
+
+
+class Histogram:
+    kind = 'histogram'
+
+    DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+    def __init__(self, name, description, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.description = description
+        self.buckets = tuple(buckets)
+        self._values = {}  # labels -> [conteo por bucket..., suma, total]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(sorted(labels.items()))
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            data = self._values.get(key)
+            if data is None:
+                data = self._values[key] = [0] * (len(self.buckets) + 2)
+            if index < len(self.buckets):
+                data[index] += 1
+            data[-2] += value
+            data[-1] += 1
+
+    def samples(self):
+        result = []
+        with self._lock:
+            for key, data in self._values.items():
+                cumulative = 0
+                for bound, count in zip(self.buckets, data):
+                    cumulative += count
+                    result.append((self.name + '_bucket', key + (('le', repr(float(bound))),), cumulative))
+                result.append((self.name + '_bucket', key + (('le', '+Inf'),), data[-1]))
+                result.append((self.name + '_sum', key, data[-2]))
+                result.append((self.name + '_count', key, data[-1]))
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def counter(self, name, description):
+        return self._add(Counter(name, description))
+
+    def gauge(self, name, description):
+        return self._add(Gauge(name, description))
+
+    def histogram(self, name, description, buckets=Histogram.DEFAULT_BUCKETS):
+        return self._add(Histogram(name, description, buckets))
+
+    def collector(self, fn):
+        """Registra una función que actualiza gauges justo antes de exponerlos"""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self):
+        for collect in self.collectors:
+            collect()
+        lines = []
+        for metric in self.metrics:
+            lines.append('# HELP %s %s' % (metric.name, metric.description))
+            lines.append('# TYPE %s %s' % (metric.name, metric.kind))
+            for name, labels, value in metric.samples():
+                lines.append('%s%s %s' % (name, _format_labels(labels), value))
+        return '\n'.join(lines) + '\n'
+
+    def _add(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+
+registry = Registry()
+
+
+#### POOL DE CONEXIONES ####
+
+pool_checkouts = registry.counter('db_pool_checkouts_total', 'Conexiones tomadas del pool')
+pool_checkins = registry.counter('db_pool_checkins_total', 'Conexiones devueltas al pool')
+pool_connects = registry.counter('db_pool_connects_total', 'Conexiones nuevas abiertas contra la base')
+pool_invalidations = registry.counter('db_pool_invalidations_total', 'Conexiones descartadas por error')
+pool_timeouts = registry.counter('db_pool_timeouts_total', 'Esperas que superaron pool_timeout')
+pool_wait = registry.histogram('db_pool_wait_seconds', 'Tiempo de espera para obtener una conexión')
+pool_size = registry.gauge('db_pool_size', 'Tamaño configurado del pool')
+pool_checked_out = registry.gauge('db_pool_checked_out', 'Conexiones en uso')
+pool_overflow = registry.gauge('db_pool_overflow', 'Conexiones abiertas por encima de pool_size')
+pool_waiting = registry.gauge('db_pool_waiting', 'Checkouts en curso esperando una conexión')
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool que mide cuánto espera cada checkout por una conexión libre
+    y cuenta los que están esperando (lo usa el control de admisión)"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.waiting = 0
+        self._waiting_lock = threading.Lock()
+
+    def _do_get(self):
+        started = time.perf_counter()
+        with self._waiting_lock:
+            self.waiting += 1
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_timeouts.inc(pool=self._name())
+            raise
+        finally:
+            with self._waiting_lock:
+                self.waiting -= 1
+            pool_wait.observe(time.perf_counter() - started, pool=self._name())
+
+    def _name(self):
+        return self.logging_name or 'primary'
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool, InstrumentedQueuePool):
+    """La misma medición para los engines asyncio (modo ASGI)"""
+
+
+def instrument_engine(name, engine):
+    """Cuenta los eventos del pool de un engine"""
+    event.listen(engine.pool, 'checkout', lambda *args: pool_checkouts.inc(pool=name))
+    event.listen(engine.pool, 'checkin', lambda *args: pool_checkins.inc(pool=name))
+    event.listen(engine.pool, 'connect', lambda *args: pool_connects.inc(pool=name))
+    event.listen(engine.pool, 'invalidate', lambda *args: pool_invalidations.inc(pool=name))
+
+
+#### INSTRUMENTACIÓN POR PETICIÓN ####
+
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+request_duration = registry.histogram('http_request_duration_seconds', 'Duración total de la petición')
+request_queries = registry.histogram('http_request_sql_queries', 'Consultas SQL por petición', QUERY_BUCKETS)
+request_sql_time = registry.histogram('http_request_sql_seconds', 'Tiempo en la base por petición')
+request_serialize_time = registry.histogram('http_request_serialize_seconds', 'Tiempo serializando por petición')
+response_size = registry.histogram('http_response_size_bytes', 'Tamaño del cuerpo de la respuesta', SIZE_BUCKETS)
+
+
+class RequestTimings:
+    """Acumuladores de una petición (viven en flask.g)"""
+    __slots__ = ('started', 'queries', 'sql_time', 'serialize_time')
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.serialize_time = 0.0
+
+
+def current_timings():
+    """Acumuladores de la petición en curso, o None fuera de una petición"""
+    if not has_request_context():
+        return None
+    return g.get('timings')
+
+
+def record_serialization(elapsed):
+    """Suma tiempo de serialización a la petición en curso"""
+    timings = current_timings()
+    if timings is not None:
+        timings.serialize_time += elapsed
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    # En el contexto de la ejecución y no en conn.info: si la consulta falla se descarta con él
+    context._query_started = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = context._query_started
+    timings = current_timings()
+    if timings is not None:
+        timings.queries += 1
+        timings.sql_time += time.perf_counter() - started
+
+
+def instrument_queries(engine):
+    """Mide las consultas de un engine para la petición en curso"""
+    event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+    event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+
+def _start_request():
+    g.timings = RequestTimings()
+
+
+def _finish_request(response):
+    timings = g.pop('timings', None)
+    if timings is None:
+        return response
+    total = time.perf_counter() - timings.started
+    labels = {'endpoint': request.endpoint or 'unknown', 'method': request.method}
+
+    request_duration.observe(total, **labels)
+    request_queries.observe(timings.queries, **labels)
+    request_sql_time.observe(timings.sql_time, **labels)
+    request_serialize_time.observe(timings.serialize_time, **labels)
+    # Las respuestas en streaming no tienen tamaño conocido de antemano (y
+    # calcularlo las consumiría)
+    if not response.is_streamed:
+        response_size.observe(response.calculate_content_length() or 0, **labels)
+
+    if current_app.config.get('SERVER_TIMING', True):
+        response.headers.add('Server-Timing', 'db;desc="%d queries";dur=%.2f, serialize;dur=%.2f, total;dur=%.2f' % (
+            timings.queries, timings.sql_time * 1000, timings.serialize_time * 1000, total * 1000
+        ))
+    return response
+
+
+class MetricsAPI(MethodView):
+    """Endpoint con las métricas en formato Prometheus"""
+
+    def get(self):
+        return Response(registry.render(), mimetype='text/plain; version=0.0.4')
+
+
+def init_app(app):
+    engines = {}
+    with app.app_context():
+        for bind_key, engine in db.engines.items():
+            name = bind_key or 'primary'
+            instrument_engine(name, engine)
+            instrument_queries(engine)
+            engines[name] = engine
+
+    @registry.collector
+    def collect_pool_state():
+        for name, engine in engines.items():
+            pool = engine.pool
+            if isinstance(pool, QueuePool):
+                pool_size.set(pool.size(), pool=name)
+                pool_checked_out.set(pool.checkedout(), pool=name)
+                pool_overflow.set(max(pool.overflow(), 0), pool=name)
+                pool_waiting.set(getattr(pool, 'waiting', 0), pool=name)
+
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
+
+    if app.config.get('METRICS_ENABLED', True):
+        app.add_url_rule('/metrics', view_func=MetricsAPI.as_view('metrics'))
@@ -97,6 +97,13 @@ def run_migrations_online():
     connectable = get_engine()
 
     with connectable.connect() as connection:
+        if connection.dialect.name == 'sqlite':
+            # El modo batch recrea tablas: con las claves foráneas activas, borrar la
+            # tabla vieja fallaría o dispararía los ON DELETE CASCADE. El PRAGMA no
+            # tiene efecto dentro de una transacción, así que va antes de empezarla
+            connection.exec_driver_sql('PRAGMA foreign_keys=OFF')
+            connection.commit()
+
         context.configure(
             connection=connection,
             target_metadata=get_metadata(),
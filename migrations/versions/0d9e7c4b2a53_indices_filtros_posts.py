@@ -0,0 +1,32 @@
+"""Indices para filtrar posts por categoria y autor
+
+Revision ID: 0d9e7c4b2a53
+Revises: f4a61b2c8d90
+Create Date: 2026-10-16 16:57:14.880321
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0d9e7c4b2a53'
+down_revision = 'f4a61b2c8d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post_category', schema=None) as batch_op:
+        batch_op.create_index('ix_post_category_category_post', ['category_id', 'post_id'], unique=False)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_user_created', ['user_id', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_user_created')
+
+    with op.batch_alter_table('post_category', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_category_category_post')
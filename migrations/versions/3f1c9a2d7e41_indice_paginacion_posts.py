@@ -0,0 +1,26 @@
+"""Indice para la paginacion de posts
+
+Revision ID: 3f1c9a2d7e41
+Revises: 9b2c36a46a77
+Create Date: 2026-10-16 10:12:03.418220
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a2d7e41'
+down_revision = '9b2c36a46a77'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_published_created_id', ['is_published', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_published_created_id')
@@ -0,0 +1,32 @@
+"""Versiones de tablas para los GET condicionales
+
+Revision ID: 5c8e1f3a7b20
+Revises: a3d58e2f6c91
+Create Date: 2026-10-17 09:21:44.318502
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5c8e1f3a7b20'
+down_revision = 'a3d58e2f6c91'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('table_version',
+    sa.Column('name', sa.String(length=32), nullable=False),
+    sa.Column('version', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('changed_at', sa.DateTime(), nullable=False),
+    sa.PrimaryKeyConstraint('name')
+    )
+    # Una fila por tabla seguida (ver versions.py)
+    op.execute("INSERT INTO table_version (name, version, changed_at) VALUES "
+               "('post', 0, CURRENT_TIMESTAMP), ('comment', 0, CURRENT_TIMESTAMP), ('category', 0, CURRENT_TIMESTAMP)")
+
+
+def downgrade():
+    op.drop_table('table_version')
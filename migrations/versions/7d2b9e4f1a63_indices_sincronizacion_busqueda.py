@@ -0,0 +1,33 @@
+"""Indices por updated_at para la sincronización del buscador en memoria
+
+Revision ID: 7d2b9e4f1a63
+Revises: 5c8e1f3a7b20
+Create Date: 2026-10-17 10:12:37.604118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7d2b9e4f1a63'
+down_revision = '5c8e1f3a7b20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Las bajas ya tienen ix_post_deleted_at e ix_comment_deleted_at (parciales sobre las borradas)
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_updated_at', ['updated_at'], unique=False)
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_updated_at', ['updated_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_updated_at')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_index('ix_post_updated_at')
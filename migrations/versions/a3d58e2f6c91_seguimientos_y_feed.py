@@ -0,0 +1,71 @@
+"""Seguimientos de usuarios y categorías, y feed personal
+
+Revision ID: a3d58e2f6c91
+Revises: e9a4c7d31b85
+Create Date: 2026-10-17 00:12:37.584210
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3d58e2f6c91'
+down_revision = 'e9a4c7d31b85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('follower_count', sa.Integer(), server_default='0', nullable=False))
+
+    op.create_table('user_follow',
+    sa.Column('follower_id', sa.Integer(), nullable=False),
+    sa.Column('followed_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['follower_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['followed_id'], ['user.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('follower_id', 'followed_id')
+    )
+    with op.batch_alter_table('user_follow', schema=None) as batch_op:
+        batch_op.create_index('ix_user_follow_followed_follower', ['followed_id', 'follower_id'], unique=False)
+
+    op.create_table('category_follow',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['category_id'], ['category.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'category_id')
+    )
+    with op.batch_alter_table('category_follow', schema=None) as batch_op:
+        batch_op.create_index('ix_category_follow_category_user', ['category_id', 'user_id'], unique=False)
+
+    op.create_table('feed_entry',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('post_id', sa.Integer(), nullable=False),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ondelete='CASCADE'),
+    sa.ForeignKeyConstraint(['post_id'], ['post.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('user_id', 'post_id')
+    )
+    with op.batch_alter_table('feed_entry', schema=None) as batch_op:
+        batch_op.create_index('ix_feed_entry_user_created_post', ['user_id', 'created_at', 'post_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('feed_entry', schema=None) as batch_op:
+        batch_op.drop_index('ix_feed_entry_user_created_post')
+    op.drop_table('feed_entry')
+
+    with op.batch_alter_table('category_follow', schema=None) as batch_op:
+        batch_op.drop_index('ix_category_follow_category_user')
+    op.drop_table('category_follow')
+
+    with op.batch_alter_table('user_follow', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_follow_followed_follower')
+    op.drop_table('user_follow')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('follower_count')
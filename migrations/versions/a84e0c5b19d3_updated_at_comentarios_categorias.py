@@ -0,0 +1,36 @@
+"""updated_at en comentarios y categorias
+
+Revision ID: a84e0c5b19d3
+Revises: 3f1c9a2d7e41
+Create Date: 2026-10-16 11:40:27.103955
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a84e0c5b19d3'
+down_revision = '3f1c9a2d7e41'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Valores iniciales para las filas existentes
+    op.execute("UPDATE comment SET updated_at = created_at")
+    op.execute("UPDATE category SET updated_at = CURRENT_TIMESTAMP")
+
+
+def downgrade():
+    with op.batch_alter_table('category', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
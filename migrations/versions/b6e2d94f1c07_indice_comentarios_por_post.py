@@ -0,0 +1,26 @@
+"""Indice para paginar los comentarios de un post
+
+Revision ID: b6e2d94f1c07
+Revises: 0d9e7c4b2a53
+Create Date: 2026-10-16 23:02:41.517204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b6e2d94f1c07'
+down_revision = '0d9e7c4b2a53'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_post_visible_created_id', ['post_id', 'is_visible', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.drop_index('ix_comment_post_visible_created_id')
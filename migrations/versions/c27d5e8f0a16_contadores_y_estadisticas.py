@@ -0,0 +1,74 @@
+"""Contadores desnormalizados y tablas de estadisticas
+
+Revision ID: c27d5e8f0a16
+Revises: a84e0c5b19d3
+Create Date: 2026-10-16 13:05:51.662310
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c27d5e8f0a16'
+down_revision = 'a84e0c5b19d3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('site_stats',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('total_posts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_comments', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('total_users', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_table('daily_stats',
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('posts', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('comments', sa.Integer(), server_default='0', nullable=False),
+    sa.Column('users', sa.Integer(), server_default='0', nullable=False),
+    sa.PrimaryKeyConstraint('day')
+    )
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('comment_count', sa.Integer(), server_default='0', nullable=False))
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('post_count', sa.Integer(), server_default='0', nullable=False))
+
+    # Carga inicial de los contadores a partir de los datos existentes
+    op.execute("""
+        UPDATE post SET
+            comment_count = (SELECT COUNT(*) FROM comment
+                             WHERE comment.post_id = post.id AND comment.is_visible = 1),
+            updated_at = updated_at
+    """)
+    op.execute("""
+        UPDATE user SET post_count = (SELECT COUNT(*) FROM post WHERE post.user_id = user.id)
+    """)
+    op.execute("""
+        INSERT INTO site_stats (id, total_posts, total_comments, total_users)
+        SELECT 1, (SELECT COUNT(*) FROM post), (SELECT COUNT(*) FROM comment), (SELECT COUNT(*) FROM user)
+    """)
+    op.execute("""
+        INSERT INTO daily_stats (day, posts, comments, users)
+        SELECT d, SUM(p), SUM(c), SUM(u) FROM (
+            SELECT DATE(created_at) AS d, 1 AS p, 0 AS c, 0 AS u FROM post
+            UNION ALL SELECT DATE(created_at), 0, 1, 0 FROM comment
+            UNION ALL SELECT DATE(created_at), 0, 0, 1 FROM user
+        ) AS t
+        WHERE d IS NOT NULL
+        GROUP BY d
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_column('post_count')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.drop_column('comment_count')
+
+    op.drop_table('daily_stats')
+    op.drop_table('site_stats')
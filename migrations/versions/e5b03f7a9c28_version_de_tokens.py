@@ -0,0 +1,30 @@
+"""Version de tokens para revocacion
+
+Revision ID: e5b03f7a9c28
+Revises: c27d5e8f0a16
+Create Date: 2026-10-16 14:21:09.538447
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b03f7a9c28'
+down_revision = 'c27d5e8f0a16'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('token_version', sa.Integer(), server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('tokens_revoked_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_user_tokens_revoked_at'), ['tokens_revoked_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_user_tokens_revoked_at'))
+        batch_op.drop_column('tokens_revoked_at')
+        batch_op.drop_column('token_version')
@@ -0,0 +1,104 @@
+"""Borrado lógico (deleted_at), claves foráneas con ON DELETE CASCADE e índices de filas vivas
+
+Revision ID: e9a4c7d31b85
+Revises: d3f8a1e6b254
+Create Date: 2026-10-16 23:41:52.106733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e9a4c7d31b85'
+down_revision = 'd3f8a1e6b254'
+branch_labels = None
+depends_on = None
+
+
+# (tabla, nombre de la restricción, columna, tabla referida); los nombres
+# son los que MySQL asignó a las claves sin nombre de la estructura inicial
+FOREIGN_KEYS = (
+    ('comment', 'comment_ibfk_1', 'post_id', 'post'),
+    ('comment', 'comment_ibfk_2', 'user_id', 'user'),
+    ('post', 'post_ibfk_1', 'user_id', 'user'),
+    ('post_category', 'post_category_ibfk_1', 'category_id', 'category'),
+    ('post_category', 'post_category_ibfk_2', 'post_id', 'post'),
+    ('user_credential', 'user_credential_ibfk_1', 'user_id', 'user'),
+)
+
+LIVE_ROWS = {'sqlite_where': sa.text('deleted_at IS NULL'), 'postgresql_where': sa.text('deleted_at IS NULL')}
+TOMBSTONES = {'sqlite_where': sa.text('deleted_at IS NOT NULL'), 'postgresql_where': sa.text('deleted_at IS NOT NULL')}
+
+
+# En SQLite las claves de la estructura inicial no tienen nombre: el modo batch
+# recrea la tabla y les asigna uno con esta convención para poder reemplazarlas
+SQLITE_NAMING_CONVENTION = {'fk': 'fk_%(table_name)s_%(column_0_name)s_%(referred_table_name)s'}
+
+
+def _replace_foreign_keys(ondelete):
+    sqlite = op.get_bind().dialect.name == 'sqlite'
+    for table, name, column, referred in FOREIGN_KEYS:
+        if sqlite:
+            name = SQLITE_NAMING_CONVENTION['fk'] % {
+                'table_name': table, 'column_0_name': column, 'referred_table_name': referred
+            }
+            batch = op.batch_alter_table(table, schema=None, recreate='always',
+                                         naming_convention=SQLITE_NAMING_CONVENTION)
+        else:
+            batch = op.batch_alter_table(table, schema=None)
+        with batch as batch_op:
+            batch_op.drop_constraint(name, type_='foreignkey')
+            batch_op.create_foreign_key(name, referred, [column], ['id'], ondelete=ondelete)
+
+
+def upgrade():
+    for table in ('user', 'post', 'comment'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.add_column(sa.Column('deleted_at', sa.DateTime(), nullable=True))
+
+    _replace_foreign_keys('CASCADE')
+
+    # Los índices nuevos se crean antes de borrar los viejos: MySQL no deja
+    # borrar el índice que usa una clave foránea si no hay otro que lo cubra
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.create_index('ix_user_deleted_at', ['deleted_at'], unique=False, **TOMBSTONES)
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_live_published_created_id', ['is_published', 'deleted_at', 'created_at', 'id'],
+                              unique=False, **LIVE_ROWS)
+        batch_op.create_index('ix_post_live_user_created', ['user_id', 'deleted_at', 'created_at'],
+                              unique=False, **LIVE_ROWS)
+        batch_op.create_index('ix_post_deleted_at', ['deleted_at'], unique=False, **TOMBSTONES)
+        batch_op.drop_index('ix_post_published_created_id')
+        batch_op.drop_index('ix_post_user_created')
+
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_live_post_visible_created_id',
+                              ['post_id', 'is_visible', 'deleted_at', 'created_at', 'id'], unique=False, **LIVE_ROWS)
+        batch_op.create_index('ix_comment_deleted_at', ['deleted_at'], unique=False, **TOMBSTONES)
+        batch_op.drop_index('ix_comment_post_visible_created_id')
+
+
+def downgrade():
+    with op.batch_alter_table('comment', schema=None) as batch_op:
+        batch_op.create_index('ix_comment_post_visible_created_id', ['post_id', 'is_visible', 'created_at', 'id'], unique=False)
+        batch_op.drop_index('ix_comment_deleted_at')
+        batch_op.drop_index('ix_comment_live_post_visible_created_id')
+
+    with op.batch_alter_table('post', schema=None) as batch_op:
+        batch_op.create_index('ix_post_user_created', ['user_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_post_published_created_id', ['is_published', 'created_at', 'id'], unique=False)
+        batch_op.drop_index('ix_post_deleted_at')
+        batch_op.drop_index('ix_post_live_user_created')
+        batch_op.drop_index('ix_post_live_published_created_id')
+
+    with op.batch_alter_table('user', schema=None) as batch_op:
+        batch_op.drop_index('ix_user_deleted_at')
+
+    _replace_foreign_keys(None)
+
+    # Las filas con borrado lógico vuelven a ser visibles si no se purgaron antes
+    for table in ('comment', 'post', 'user'):
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            batch_op.drop_column('deleted_at')
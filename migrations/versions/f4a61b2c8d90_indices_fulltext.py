@@ -0,0 +1,31 @@
+"""Indices FULLTEXT para la busqueda
+
+Revision ID: f4a61b2c8d90
+Revises: e5b03f7a9c28
+Create Date: 2026-10-16 15:48:36.270114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f4a61b2c8d90'
+down_revision = 'e5b03f7a9c28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Solo MySQL soporta FULLTEXT; en otros motores se usa SEARCH_BACKEND = 'memory'
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.create_index('ft_post_title_content', 'post', ['title', 'content'], mysql_prefix='FULLTEXT')
+    op.create_index('ft_comment_text', 'comment', ['text'], mysql_prefix='FULLTEXT')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'mysql':
+        return
+    op.drop_index('ft_comment_text', table_name='comment')
+    op.drop_index('ft_post_title_content', table_name='post')
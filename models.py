@@ -1,61 +1,230 @@
 from flask_sqlalchemy import SQLAlchemy
 from datetime import datetime
+from sqlalchemy import event, text
+from sqlalchemy.engine import Engine
+from replicas import RoutingSession
+from softdelete import SoftDeleteMixin
 
-db = SQLAlchemy()
+db = SQLAlchemy(session_options={'class_': RoutingSession})
+
+
+@event.listens_for(Engine, 'connect')
+def _sqlite_foreign_keys(dbapi_connection, connection_record):
+    # SQLite solo aplica las claves foráneas (y sus ON DELETE CASCADE) si se activan en cada conexión
+    if 'sqlite' in type(dbapi_connection).__module__:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('PRAGMA foreign_keys=ON')
+        cursor.close()
+
+
+# Las filas borradas (deleted_at) se excluyen de los índices donde la base lo
+# permite (SQLite, PostgreSQL); en MySQL deleted_at va en la clave del índice
+# para que la condición deleted_at IS NULL se resuelva sin leer las filas
+LIVE_ROWS = {'sqlite_where': text('deleted_at IS NULL'), 'postgresql_where': text('deleted_at IS NULL')}
+TOMBSTONES = {'sqlite_where': text('deleted_at IS NOT NULL'), 'postgresql_where': text('deleted_at IS NOT NULL')}
+
+# Caracteres del contenido que se envían como extracto en los listados
+EXCERPT_LENGTH = 200
+
+
+def _author_summary(obj):
+    """Autor de un post o comentario para los serializadores: el ya cargado
+    (p. ej. con joinedload) o el resumen del cache de entidades (entities.py)"""
+    author = obj.__dict__.get('author')
+    if author is not None:
+        return author
+    from entities import users
+    return users.get(obj.user_id)
 
 
 post_category = db.Table('post_category',
-    db.Column('post_id', db.Integer, db.ForeignKey('post.id'), primary_key=True),
-    db.Column('category_id', db.Integer, db.ForeignKey('category.id'), primary_key=True)
+    db.Column('post_id', db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), primary_key=True),
+    # Para filtrar posts por categoría
+    db.Index('ix_post_category_category_post', 'category_id', 'post_id')
 )
 
-class User(db.Model):
+class User(SoftDeleteMixin, db.Model):
     __tablename__ = 'user'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(64), unique=True, nullable=False)
     email = db.Column(db.String(120), unique=True, nullable=False)
-    posts = db.relationship('Post', backref='author', lazy=True)
-    comments = db.relationship('Comment', backref='author', lazy=True)
+    # passive_deletes: al borrar, las filas dependientes las elimina la base (ON DELETE CASCADE)
+    posts = db.relationship('Post', backref='author', lazy=True, passive_deletes=True)
+    comments = db.relationship('Comment', backref='author', lazy=True, passive_deletes=True)
 
     # Campos Agregados (Punto 2)
     role = db.Column(db.String(20), default='user', nullable=False) #admin, moderador, user
     is_active = db.Column(db.Boolean, default=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    # Contadores desnormalizados (se reconstruyen con `flask blog rebuild-counters`)
+    post_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    follower_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    # Revocación de tokens: los JWT con un claim 'ver' menor dejan de ser válidos
+    token_version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    tokens_revoked_at = db.Column(db.DateTime, nullable=True, index=True)
+
+    __table_args__ = (
+        db.Index('ix_user_deleted_at', 'deleted_at', **TOMBSTONES),
+    )
+
 class Category(db.Model):
     __tablename__ = 'category'
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), unique=True, nullable=False)
-    posts = db.relationship('Post', secondary=post_category, back_populates='categories')
+    posts = db.relationship('Post', secondary=post_category, back_populates='categories', passive_deletes=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class Post(db.Model):
+class Post(SoftDeleteMixin, db.Model):
     __tablename__ = 'post'
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     content = db.Column(db.Text, nullable=False)
+    # Comienzo del contenido calculado en la base: con ?fields=excerpt el texto completo no se lee
+    excerpt = db.column_property(db.func.substr(content, 1, EXCERPT_LENGTH), deferred=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    comments = db.relationship('Comment', backref='post', lazy=True)
-    categories = db.relationship('Category', secondary=post_category, back_populates='posts')
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    comments = db.relationship('Comment', backref='post', lazy=True, passive_deletes=True)
+    categories = db.relationship('Category', secondary=post_category, back_populates='posts', passive_deletes=True)
+    author_summary = property(_author_summary)
 
     # Campos Agregados (Punto 2)
     is_published = db.Column(db.Boolean, default=True)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-class Comment(db.Model):
+    # Contador desnormalizado de comentarios visibles
+    comment_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+    # Índices para el listado paginado por cursor, el filtro por autor, la purga
+    # y los cambios desde la última sincronización del buscador (search.py)
+    __table_args__ = (
+        db.Index('ix_post_live_published_created_id', 'is_published', 'deleted_at', 'created_at', 'id', **LIVE_ROWS),
+        db.Index('ix_post_live_user_created', 'user_id', 'deleted_at', 'created_at', **LIVE_ROWS),
+        db.Index('ix_post_deleted_at', 'deleted_at', **TOMBSTONES),
+        db.Index('ix_post_updated_at', 'updated_at'),
+    )
+
+class Comment(SoftDeleteMixin, db.Model):
     __tablename__ = 'comment'
     id = db.Column(db.Integer, primary_key=True)
     text = db.Column(db.Text, nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    post_id = db.Column(db.Integer, db.ForeignKey('post.id'), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=False)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), nullable=False)
+    author_summary = property(_author_summary)
 
     # Nuevo campo (Punto 2)
     is_visible = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    # Índices para el listado paginado de comentarios de un post, la purga y el buscador
+    __table_args__ = (
+        db.Index('ix_comment_live_post_visible_created_id', 'post_id', 'is_visible', 'deleted_at', 'created_at', 'id',
+                 **LIVE_ROWS),
+        db.Index('ix_comment_deleted_at', 'deleted_at', **TOMBSTONES),
+        db.Index('ix_comment_updated_at', 'updated_at'),
+    )
 
 class UserCredential(db.Model):
     __tablename__ = "user_credential"
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey("user.id"), unique=True, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey("user.id", ondelete='CASCADE'), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
-    user = db.relationship("User", backref=db.backref("credential", uselist=False))
+    user = db.relationship("User", backref=db.backref("credential", uselist=False, passive_deletes=True))
+
+
+#### SEGUIMIENTOS Y FEED ####
+
+# Usuarios que sigue cada usuario; el índice inverso da los seguidores de un autor
+user_follow = db.Table('user_follow',
+    db.Column('follower_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('followed_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('created_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_user_follow_followed_follower', 'followed_id', 'follower_id')
+)
+
+# Categorías que sigue cada usuario
+category_follow = db.Table('category_follow',
+    db.Column('user_id', db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('category_id', db.Integer, db.ForeignKey('category.id', ondelete='CASCADE'), primary_key=True),
+    db.Column('created_at', db.DateTime, default=datetime.utcnow),
+    db.Index('ix_category_follow_category_user', 'category_id', 'user_id')
+)
+
+class FeedEntry(db.Model):
+    """Post en el feed de un usuario, copiado al crearse (ver feed.py)"""
+    __tablename__ = 'feed_entry'
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), primary_key=True)
+    post_id = db.Column(db.Integer, db.ForeignKey('post.id', ondelete='CASCADE'), primary_key=True)
+    # El created_at del post, para paginar el feed sin leer la tabla post
+    created_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.Index('ix_feed_entry_user_created_post', 'user_id', 'created_at', 'post_id'),
+    )
+
+
+#### ESTADÍSTICAS ####
+
+class SiteStats(db.Model):
+    """Totales del sitio, una única fila (id=1) actualizada en cada alta/baja"""
+    __tablename__ = 'site_stats'
+    id = db.Column(db.Integer, primary_key=True)
+    total_posts = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    total_comments = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    total_users = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+class DailyStats(db.Model):
+    """Altas por día, usadas para las estadísticas por período"""
+    __tablename__ = 'daily_stats'
+    day = db.Column(db.Date, primary_key=True)
+    posts = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    comments = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    users = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
+
+#### VERSIONES DE TABLAS ####
+
+class TableVersion(db.Model):
+    """Cambios por tabla, incluidas las bajas: los usan los GET condicionales (ver versions.py)"""
+    __tablename__ = 'table_version'
+    name = db.Column(db.String(32), primary_key=True)
+    version = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    changed_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+
+# Una fila por tabla seguida, también al crear el esquema con db.create_all()
+VERSIONED_TABLES = ('post', 'comment', 'category')
+
+@event.listens_for(TableVersion.__table__, 'after_create')
+def _seed_table_versions(target, connection, **kw):
+    connection.execute(target.insert(), [
+        {'name': name, 'version': 0, 'changed_at': datetime.utcnow()} for name in VERSIONED_TABLES
+    ])
+
+
+#### TRABAJOS EN SEGUNDO PLANO ####
+
+class Job(db.Model):
+    """Cola persistente de trabajos a ejecutar después del commit (ver jobs.py)"""
+    __tablename__ = 'job'
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    # Evita encolar dos veces el mismo trabajo (p. ej. al reintentar una petición)
+    idempotency_key = db.Column(db.String(128), unique=True, nullable=True)
+    status = db.Column(db.String(16), default='pending', nullable=False)  # pending, running, done, failed
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, default=5, nullable=False)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(64), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Para que los workers encuentren rápido los trabajos pendientes y vencidos
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
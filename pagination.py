@@ -0,0 +1,116 @@
+import base64
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+
+class InvalidCursor(ValueError):
+    """El cursor recibido no se puede decodificar"""
+
+
+def encode_cursor(created_at, item_id):
+    """Codifica la posición (created_at, id) como un cursor opaco"""
+    raw = json.dumps([created_at.isoformat(), item_id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devuelve la tupla (created_at, id) contenida en el cursor"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, item_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return datetime.fromisoformat(created_at), int(item_id)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Cursor inválido")
+
+
+def encode_offset(offset):
+    """Cursor opaco para resultados ordenados por relevancia"""
+    return base64.urlsafe_b64encode(json.dumps(offset).encode()).decode().rstrip('=')
+
+
+def decode_offset(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        offset = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError
+        return offset
+    except (ValueError, TypeError):
+        raise InvalidCursor("Cursor inválido")
+
+
+def get_page_size():
+    """Lee ?limit= respetando el tamaño por defecto y el máximo configurados"""
+    default = current_app.config.get('PAGE_SIZE', 20)
+    maximum = current_app.config.get('MAX_PAGE_SIZE', 100)
+    limit = request.args.get('limit', default, type=int)
+    return max(1, min(limit, maximum))
+
+
+def position_condition(created_col, id_col, created_at, item_id, descending=True):
+    """Condición de los elementos que siguen a (created_at, id) en el orden indicado"""
+    if descending:
+        return or_(
+            created_col < created_at,
+            and_(created_col == created_at, id_col < item_id)
+        )
+    return or_(
+        created_col > created_at,
+        and_(created_col == created_at, id_col > item_id)
+    )
+
+
+def after_position(query, created_col, id_col, created_at, item_id, descending=True):
+    """Filtra los elementos que siguen a (created_at, id) en el orden indicado"""
+    return query.filter(position_condition(created_col, id_col, created_at, item_id, descending))
+
+
+def order_by_position(query, created_col, id_col, descending=True):
+    if descending:
+        return query.order_by(created_col.desc(), id_col.desc())
+    return query.order_by(created_col.asc(), id_col.asc())
+
+
+def requested_position():
+    """Posición (created_at, id) de ?cursor=, o None en la primera página.
+    Lanza InvalidCursor si el cursor es inválido."""
+    cursor = request.args.get('cursor')
+    return decode_cursor(cursor) if cursor else None
+
+
+def keyset_query(query, created_col, id_col, descending=True):
+    """Aplica ?cursor= y el orden a una Query o a un select().
+
+    Devuelve la consulta limitada a una fila más que la página (para saber si
+    existe una siguiente) y el tamaño de página. Lanza InvalidCursor si
+    ?cursor= es inválido.
+    """
+    limit = get_page_size()
+    position = requested_position()
+    if position:
+        query = after_position(query, created_col, id_col, *position, descending=descending)
+    query = order_by_position(query, created_col, id_col, descending)
+    return query.limit(limit + 1), limit
+
+
+def split_page(items, limit):
+    """Separa la fila extra de keyset_query y arma el cursor de la página siguiente"""
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
+
+
+def keyset_page(query, created_col, id_col, descending=True):
+    """Aplica la paginación por cursor sobre (created_at, id).
+
+    Devuelve la lista de elementos de la página y el cursor de la siguiente
+    (None si no hay más). Lanza InvalidCursor si ?cursor= es inválido.
+    """
+    query, limit = keyset_query(query, created_col, id_col, descending)
+    return split_page(query.all(), limit)
@@ -0,0 +1,238 @@
+"""Límite de peticiones por cliente y control de admisión.
+
+Cada límite es un token bucket ("10/minute": ráfaga de 10 y un token nuevo
+cada 6 s) implementado como GCRA: por cada clave se guarda un solo número,
+el instante teórico en que el bucket vuelve a estar lleno, así que no hace
+falta leer y escribir dos valores juntos. El cliente es el usuario del JWT
+si la vista ya lo verificó, o si no la IP.
+
+Además, antes de cada petición se mira el pool de conexiones del primario:
+si ya hay DB_MAX_WAITING peticiones esperando una conexión, la nueva se
+rechaza con 429 en lugar de sumarse a la cola (y vencer pool_timeout).
+"""
+import inspect
+import math
+import threading
+import time
+from functools import wraps
+
+from flask import request
+from flask_jwt_extended import get_jwt
+
+import metrics
+from models import db
+
+
+UNITS = {'second': 1, 'minute': 60, 'hour': 3600, 'day': 86400}
+
+rate_limited = metrics.registry.counter('http_requests_rate_limited_total', 'Peticiones rechazadas por límite de frecuencia')
+requests_shed = metrics.registry.counter('http_requests_shed_total', 'Peticiones rechazadas con el pool de conexiones agotado')
+
+
+def parse_limit(value):
+    """'10/minute' -> (intervalo entre tokens en segundos, ráfaga); None o '' -> sin límite"""
+    if not value:
+        return None
+    try:
+        count, unit = value.split('/')
+        count = int(count)
+        period = UNITS[unit.strip().rstrip('s')]
+    except (ValueError, KeyError):
+        raise ValueError("Límite inválido %r, usar p. ej. '10/minute'" % value)
+    return period / count, count
+
+
+class MemoryBackend:
+    """Buckets en memoria del proceso.
+
+    El camino normal no toma ningún lock: leer y escribir una clave del dict
+    son operaciones atómicas con el GIL. Dos peticiones simultáneas del mismo
+    cliente pueden leer el mismo valor y pasar ambas; el error es a lo sumo
+    de una petición de más, nunca un rechazo de más. Las claves vencidas se
+    descartan cuando hay más de max_keys.
+    """
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._tat = {}
+        self._prune_lock = threading.Lock()
+
+    def hit(self, key, interval, burst):
+        """Cuenta una petición; devuelve 0 si se admite o los segundos a esperar"""
+        now = time.monotonic()
+        tat = self._tat.get(key, now)
+        new_tat = (tat if tat > now else now) + interval
+        wait = new_tat - now - burst * interval
+        if wait > 0:
+            return wait
+        self._tat[key] = new_tat
+        if len(self._tat) > self.max_keys:
+            self._prune(now)
+        return 0
+
+    def _prune(self, now):
+        if not self._prune_lock.acquire(blocking=False):
+            return
+        try:
+            for key, tat in list(self._tat.items()):
+                if tat <= now:
+                    self._tat.pop(key, None)
+        finally:
+            self._prune_lock.release()
+
+    def clear(self):
+        self._tat.clear()
+
+
+class RedisBackend:
+    """Buckets compartidos entre procesos (requiere el paquete redis)"""
+
+    # El mismo cálculo que MemoryBackend.hit, atómico en Redis y con su reloj
+    SCRIPT = """
+        local clock = redis.call('TIME')
+        local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+        local interval = tonumber(ARGV[1])
+        local tat = tonumber(redis.call('GET', KEYS[1]) or now)
+        if tat < now then tat = now end
+        local new_tat = tat + interval
+        local wait = new_tat - now - tonumber(ARGV[2]) * interval
+        if wait > 0 then return tostring(wait) end
+        redis.call('SET', KEYS[1], tostring(new_tat), 'PX', math.ceil((new_tat - now) * 1000))
+        return '0'
+    """
+
+    def __init__(self, url, prefix='miniblog:rate:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("RATELIMIT_BACKEND='redis' requiere instalar el paquete redis")
+        self.client = redis.Redis.from_url(url)
+        self.prefix = prefix
+        self._hit = self.client.register_script(self.SCRIPT)
+
+    def hit(self, key, interval, burst):
+        return float(self._hit(keys=[self.prefix + key], args=[interval, burst]))
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+def _client_key():
+    """Usuario del JWT si la vista ya lo verificó; si no, la IP"""
+    try:
+        claims = get_jwt()
+    except RuntimeError:
+        claims = {}
+    if claims.get('sub') is not None:
+        return 'user:%s' % claims['sub'], claims.get('role')
+    return 'ip:%s' % request.remote_addr, None
+
+
+def _too_many(wait):
+    return {"error": "Demasiadas solicitudes, reintentar en unos segundos"}, 429, \
+        {"Retry-After": str(max(1, math.ceil(wait)))}
+
+
+class RateLimiter:
+    """Límites por cliente configurables por vista y por rol"""
+
+    # Rutas que no cuentan para el límite general ni se rechazan por carga
+    EXEMPT_ENDPOINTS = ('metrics', 'static')
+
+    def __init__(self):
+        self.backend = None
+        self.default = None
+        self.overrides = {}
+        self.max_waiting = 0
+
+    def init_app(self, app):
+        config = app.config
+        backend = config.get('RATELIMIT_BACKEND', 'memory')
+        # En las pruebas no se limita, salvo que se pida con RATELIMIT_IN_TESTING
+        if app.testing and not config.get('RATELIMIT_IN_TESTING', False):
+            backend = 'none'
+        if backend == 'memory':
+            self.backend = MemoryBackend()
+        elif backend == 'redis':
+            self.backend = RedisBackend(config.get('RATELIMIT_REDIS_URL') or config['CACHE_REDIS_URL'])
+        else:
+            self.backend = None
+
+        self.default = parse_limit(config.get('RATELIMIT_DEFAULT'))
+        # 'login=20/minute,search=none' cambia el límite de las vistas sin tocar el código
+        self.overrides = {}
+        for item in config.get('RATELIMIT_LIMITS', '').split(','):
+            if item.strip():
+                name, _, value = item.partition('=')
+                self.overrides[name.strip()] = parse_limit(value.strip() if value.strip() != 'none' else None)
+
+        self.max_waiting = config.get('DB_MAX_WAITING', 0)
+        app.before_request(self._before_request)
+
+    def _before_request(self):
+        if request.endpoint in self.EXEMPT_ENDPOINTS:
+            return None
+        if self.max_waiting:
+            pool = db.engine.pool
+            if getattr(pool, 'waiting', 0) >= self.max_waiting:
+                requests_shed.inc(endpoint=request.endpoint or 'unknown')
+                return {"error": "Servidor ocupado, reintentar en unos segundos"}, 429, {"Retry-After": "1"}
+        if self.backend is not None and self.default is not None:
+            wait = self.backend.hit('default:ip:%s' % request.remote_addr, *self.default)
+            if wait:
+                rate_limited.inc(limit='default')
+                return _too_many(wait)
+        return None
+
+    def check(self, name, limit, roles):
+        """Cuenta la petición en curso contra el límite `name`; devuelve la respuesta 429 o None"""
+        if self.backend is None:
+            return None
+        client, role = _client_key()
+        if role in roles:
+            limit = roles[role]
+        else:
+            limit = self.overrides.get(name, limit)
+        if limit is None:
+            return None
+        wait = self.backend.hit('%s:%s' % (name, client), *limit)
+        if wait:
+            rate_limited.inc(limit=name)
+            return _too_many(wait)
+        return None
+
+    def limit(self, name, limit, **roles):
+        """Decorador para limitar una vista (también async), p. ej.
+
+            @jwt_required()
+            @limiter.limit('post_create', '30/minute', moderator=None, admin=None)
+
+        Cada rol puede tener su propio límite o None para no limitarlo. Debajo
+        de jwt_required el límite es por usuario; sin JWT, por IP.
+        """
+        parsed = parse_limit(limit)
+        roles = {role: parse_limit(value) for role, value in roles.items()}
+
+        def decorator(fn):
+            if inspect.iscoroutinefunction(fn):
+                @wraps(fn)
+                async def async_wrapper(*args, **kwargs):
+                    rejected = self.check(name, parsed, roles)
+                    if rejected is not None:
+                        return rejected
+                    return await fn(*args, **kwargs)
+                return async_wrapper
+
+            @wraps(fn)
+            def wrapper(*args, **kwargs):
+                rejected = self.check(name, parsed, roles)
+                if rejected is not None:
+                    return rejected
+                return fn(*args, **kwargs)
+            return wrapper
+        return decorator
+
+
+limiter = RateLimiter()
+rate_limit = limiter.limit
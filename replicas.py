@@ -0,0 +1,116 @@
+import inspect
+import random
+import time
+from functools import wraps
+
+from flask import g, has_request_context, request
+from flask_sqlalchemy.session import Session as FlaskSession
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+
+STICKY_COOKIE = 'read_primary'
+
+
+class RoutingSession(FlaskSession):
+    """Sesión que envía las lecturas a una réplica cuando el handler lo pidió.
+
+    El bind elegido queda en session.info['replica'] (ver read_replica). Los
+    flush y los binds explícitos siguen yendo al primario.
+    """
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        replica = self.info.get('replica')
+        if replica is not None and bind is None and not self._flushing:
+            return self._db.engines[replica]
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+class ReplicaRouter:
+    """Reparte los GET seguros entre las réplicas configuradas.
+
+    Las réplicas son los binds 'replica_N' de SQLALCHEMY_BINDS. Después de
+    una escritura la respuesta lleva la cookie 'read_primary' durante
+    REPLICA_STICKY_SECONDS, y mientras esté vigente ese cliente lee del
+    primario para ver sus propios cambios aunque la réplica tenga retraso.
+    """
+
+    def __init__(self):
+        self.binds = []
+        self.sticky_seconds = 5
+
+    def init_app(self, app):
+        self.binds = sorted(key for key in app.config.get('SQLALCHEMY_BINDS', {}) if key.startswith('replica'))
+        self.sticky_seconds = app.config.get('REPLICA_STICKY_SECONDS', 5)
+        app.after_request(self._mark_sticky)
+
+    def choose(self):
+        """Bind de réplica para la petición actual, o None si hay que leer del primario"""
+        if not self.binds:
+            return None
+        sticky_until = request.cookies.get(STICKY_COOKIE, '')
+        if sticky_until.isdigit() and int(sticky_until) > time.time():
+            return None
+        return random.choice(self.binds)
+
+    def read_replica(self, fn):
+        """Decorador para los GET que pueden leer de una réplica.
+
+        La réplica elegida queda en g.read_replica (la cache de respuestas
+        separa lo leído de réplicas) y en la sesión que hace las lecturas.
+        """
+        if inspect.iscoroutinefunction(fn):
+            @wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                # La sesión asyncio (asgi.py) toma la réplica de g al crearse
+                g.read_replica = self.choose()
+                return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @wraps(fn)
+        def wrapper(*args, **kwargs):
+            from models import db
+
+            replica = g.read_replica = self.choose()
+            if replica is not None:
+                # Queda hasta que se descarta la sesión al cerrar el contexto,
+                # así también cubre las respuestas en streaming
+                db.session.info['replica'] = replica
+            return fn(*args, **kwargs)
+        return wrapper
+
+    def _mark_sticky(self, response):
+        if self.binds and g.get('wrote_primary'):
+            response.set_cookie(
+                STICKY_COOKIE, str(int(time.time() + self.sticky_seconds)),
+                max_age=self.sticky_seconds, httponly=True, samesite='Lax'
+            )
+        return response
+
+
+router = ReplicaRouter()
+read_replica = router.read_replica
+
+
+#### DETECCIÓN DE ESCRITURAS ####
+
+@event.listens_for(Session, 'after_flush')
+def _track_writes(session, flush_context):
+    session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _track_bulk_writes(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        orm_execute_state.session.info['wrote'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _mark_written(session):
+    if session.info.pop('wrote', False) and has_request_context():
+        g.wrote_primary = True
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_writes(session):
+    session.info.pop('wrote', None)
@@ -0,0 +1,98 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, User
+
+
+class RevocationIndex:
+    """Índice en memoria de versiones de token revocadas.
+
+    Cada usuario tiene un `token_version` que viaja en el claim 'ver' del JWT.
+    Desactivar al usuario o cambiarle el rol incrementa la versión y los
+    tokens anteriores dejan de aceptarse. La consulta por petición es un
+    acceso a un dict; la base solo se lee cada REVOCATION_SYNC_SECONDS para
+    incorporar las revocaciones hechas por otros procesos. Las entradas más
+    viejas que la duración del token se descartan, porque esos tokens ya
+    vencieron, así que la memoria queda acotada por las revocaciones del
+    último período.
+    """
+
+    def __init__(self):
+        self.sync_interval = 5
+        self.token_lifetime = timedelta(hours=24)
+        self._versions = {}
+        self._watermark = None
+        self._next_sync = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.sync_interval = app.config.get('REVOCATION_SYNC_SECONDS', 5)
+        self.token_lifetime = app.config.get('JWT_ACCESS_TOKEN_EXPIRES', timedelta(hours=24))
+
+    def revoke(self, user):
+        """Invalida los tokens emitidos hasta ahora (se aplica al confirmar el commit)"""
+        version = (user.token_version or 0) + 1
+        revoked_at = datetime.utcnow()
+        user.token_version = version
+        user.tokens_revoked_at = revoked_at
+        pending = db.session.info.setdefault('revoked_users', [])
+        pending.append((user.id, version, revoked_at))
+
+    def is_revoked(self, jwt_payload):
+        self._maybe_sync()
+        entry = self._versions.get(int(jwt_payload['sub']))
+        return entry is not None and jwt_payload.get('ver', 0) < entry[0]
+
+    def record(self, user_id, version, revoked_at):
+        current = self._versions.get(user_id)
+        if current is None or current[0] < version:
+            self._versions[user_id] = (version, revoked_at)
+
+    def _maybe_sync(self):
+        if time.monotonic() < self._next_sync:
+            return
+        # Si otro hilo ya está sincronizando se usa el índice actual
+        if not self._lock.acquire(blocking=False):
+            return
+        try:
+            self._sync()
+        finally:
+            self._lock.release()
+
+    def _sync(self):
+        now = datetime.utcnow()
+        oldest = now - self.token_lifetime
+        since = max(self._watermark or oldest, oldest)
+
+        # Con los usuarios dados de baja: la baja también revoca sus tokens
+        rows = db.session.query(
+            User.id, User.token_version, User.tokens_revoked_at
+        ).filter(User.tokens_revoked_at >= since).execution_options(include_deleted=True).all()
+        for user_id, version, revoked_at in rows:
+            self.record(user_id, version, revoked_at)
+
+        for user_id, (_, revoked_at) in list(self._versions.items()):
+            if revoked_at < oldest:
+                self._versions.pop(user_id, None)
+
+        # Margen para no perder commits que terminaron durante la consulta
+        self._watermark = now - timedelta(seconds=self.sync_interval)
+        self._next_sync = time.monotonic() + self.sync_interval
+
+
+revocations = RevocationIndex()
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_revocations(session):
+    for user_id, version, revoked_at in session.info.pop('revoked_users', []):
+        revocations.record(user_id, version, revoked_at)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_revocations(session):
+    session.info.pop('revoked_users', None)
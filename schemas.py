@@ -23,6 +23,8 @@ class UserSchema(Schema):
     role = fields.Str(dump_only=True)
     is_active = fields.Bool(dump_only=True)
     created_at = fields.DateTime(dump_only=True)
+    post_count = fields.Int(dump_only=True)
+    follower_count = fields.Int(dump_only=True)
 
 
 #### POST ####
@@ -31,11 +33,14 @@ class PostSchema(Schema):
     id = fields.Int(dump_only=True)
     title = fields.Str(required=True, validate=validate.Length(min=1, max=100))
     content = fields.Str(required=True)
+    excerpt = fields.Str(dump_only=True)
     created_at = fields.DateTime(dump_only=True)
     updated_at = fields.DateTime(dump_only=True)
     is_published = fields.Bool(dump_only=True)
     user_id = fields.Int(dump_only=True)
-    author = fields.Nested('UserSchema', only=['id', 'name'], dump_only=True)
+    comment_count = fields.Int(dump_only=True)
+    author = fields.Nested('UserSchema', only=['id', 'name'], dump_only=True, attribute='author_summary')
+    categories = fields.Pluck('CategorySchema', 'name', many=True, dump_only=True)
 
 
 #### COMENTARIO ####
@@ -47,7 +52,7 @@ class CommentSchema(Schema):
     is_visible = fields.Bool(dump_only=True)
     user_id = fields.Int(dump_only=True)
     post_id = fields.Int(dump_only=True)
-    author = fields.Nested('UserSchema', only=['id', 'name'], dump_only=True)
+    author = fields.Nested('UserSchema', only=['id', 'name'], dump_only=True, attribute='author_summary')
 
 
 #### CATEGORIA ####
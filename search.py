@@ -0,0 +1,310 @@
+import heapq
+import math
+import re
+import threading
+import time
+import unicodedata
+from collections import defaultdict
+from datetime import datetime, timedelta
+from itertools import chain
+
+from sqlalchemy import event, inspect, or_, text
+from sqlalchemy.orm import Session
+
+from models import db, Post, Comment, TableVersion
+
+
+TOKEN_RE = re.compile(r'\w+')
+
+STOPWORDS = {
+    'de', 'la', 'que', 'el', 'en', 'y', 'a', 'los', 'se', 'del', 'las', 'un',
+    'por', 'con', 'no', 'una', 'su', 'para', 'es', 'al', 'lo', 'como', 'mas',
+    'pero', 'sus', 'le', 'ya', 'o', 'the', 'of', 'and', 'to', 'in', 'is'
+}
+
+
+def tokenize(value):
+    """Pasa a minúsculas, quita acentos y separa en palabras"""
+    normalized = unicodedata.normalize('NFKD', value.lower())
+    normalized = ''.join(ch for ch in normalized if not unicodedata.combining(ch))
+    return [tok for tok in TOKEN_RE.findall(normalized) if len(tok) > 1 and tok not in STOPWORDS]
+
+
+class InvertedIndex:
+    """Índice invertido con ranking BM25 para un tipo de documento"""
+
+    K1 = 1.2
+    B = 0.75
+
+    def __init__(self):
+        self.postings = defaultdict(dict)   # término -> {doc_id: frecuencia}
+        self.doc_terms = {}                 # doc_id -> {término: frecuencia}
+        self.doc_len = {}
+        self.total_len = 0
+
+    def add(self, doc_id, value):
+        self.remove(doc_id)
+        terms = defaultdict(int)
+        for token in tokenize(value):
+            terms[token] += 1
+        if not terms:
+            return
+        for term, freq in terms.items():
+            self.postings[term][doc_id] = freq
+        self.doc_terms[doc_id] = terms
+        length = sum(terms.values())
+        self.doc_len[doc_id] = length
+        self.total_len += length
+
+    def remove(self, doc_id):
+        terms = self.doc_terms.pop(doc_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            docs = self.postings[term]
+            docs.pop(doc_id, None)
+            if not docs:
+                del self.postings[term]
+        self.total_len -= self.doc_len.pop(doc_id)
+
+    def search(self, query, offset, limit):
+        """Devuelve ([(doc_id, score)], total) ordenado por relevancia"""
+        n_docs = len(self.doc_len)
+        if not n_docs:
+            return [], 0
+        avg_len = self.total_len / n_docs
+
+        scores = defaultdict(float)
+        for term in set(tokenize(query)):
+            docs = self.postings.get(term)
+            if not docs:
+                continue
+            idf = math.log(1 + (n_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for doc_id, freq in docs.items():
+                norm = self.K1 * (1 - self.B + self.B * self.doc_len[doc_id] / avg_len)
+                scores[doc_id] += idf * freq * (self.K1 + 1) / (freq + norm)
+
+        top = heapq.nlargest(offset + limit, scores.items(), key=lambda item: (item[1], item[0]))
+        return top[offset:], len(scores)
+
+
+class MemorySearchEngine:
+    """Motor portable en Python puro, se construye en la primera búsqueda.
+
+    Los commits del proceso se aplican al confirmarse; los de otros procesos
+    se incorporan cada sync_interval segundos releyendo los posts y
+    comentarios con updated_at o deleted_at desde la última sincronización
+    (como revocation.py). La consulta solo se hace si table_version indica
+    que hubo cambios en posts o comentarios.
+    """
+
+    def __init__(self, sync_interval=5):
+        self.indexes = {'posts': InvertedIndex(), 'comments': InvertedIndex()}
+        self.comments_by_post = defaultdict(set)
+        self.built = False
+        self.sync_interval = sync_interval
+        self._watermark = None
+        self._seen_versions = None
+        self._next_sync = 0
+        self._lock = threading.RLock()
+
+    def search(self, kind, query, offset, limit):
+        with self._lock:
+            if not self.built:
+                self.build()
+            else:
+                self._maybe_sync()
+            results, total = self.indexes[kind].search(query, offset, limit)
+        return [doc_id for doc_id, _ in results], total
+
+    def build(self):
+        with self._lock:
+            started = datetime.utcnow()
+            self._seen_versions = self._table_versions()
+            posts = db.session.query(Post.id, Post.title, Post.content) \
+                .filter(Post.is_published == True) \
+                .yield_per(1000)
+            for post_id, title, content in posts:
+                self.indexes['posts'].add(post_id, '%s %s' % (title, content))
+
+            comments = db.session.query(Comment.id, Comment.post_id, Comment.text) \
+                .filter(Comment.is_visible == True) \
+                .yield_per(1000)
+            for comment_id, post_id, value in comments:
+                self.indexes['comments'].add(comment_id, value)
+                self.comments_by_post[post_id].add(comment_id)
+            self.built = True
+            self._advance(started)
+
+    def _table_versions(self):
+        return db.session.query(TableVersion.name, TableVersion.version) \
+            .filter(TableVersion.name.in_(('post', 'comment'))).order_by(TableVersion.name).all()
+
+    def _maybe_sync(self):
+        if not self.sync_interval or time.monotonic() < self._next_sync:
+            return
+        started = datetime.utcnow()
+        versions = self._table_versions()
+        if versions != self._seen_versions:
+            self._seen_versions = versions
+            self._sync()
+            self._advance(started)
+        else:
+            self._next_sync = time.monotonic() + self.sync_interval
+
+    def _advance(self, started):
+        # Margen para no perder commits que terminaron durante la consulta
+        self._watermark = started - timedelta(seconds=self.sync_interval)
+        self._next_sync = time.monotonic() + self.sync_interval
+
+    def _sync(self):
+        """Reindexa lo que cambió desde la marca, incluidas las bajas lógicas"""
+        since = self._watermark
+        changes = []
+        posts = db.session.query(Post.id, Post.title, Post.content, Post.is_published, Post.deleted_at) \
+            .filter(or_(Post.updated_at >= since, Post.deleted_at >= since)) \
+            .execution_options(include_deleted=True).yield_per(1000)
+        for post_id, title, content, is_published, deleted_at in posts:
+            removed = not is_published or deleted_at is not None
+            changes.append(('post', post_id, post_id, None if removed else '%s %s' % (title, content)))
+
+        comments = db.session.query(Comment.id, Comment.post_id, Comment.text, Comment.is_visible, Comment.deleted_at) \
+            .filter(or_(Comment.updated_at >= since, Comment.deleted_at >= since)) \
+            .execution_options(include_deleted=True).yield_per(1000)
+        for comment_id, post_id, value, is_visible, deleted_at in comments:
+            removed = not is_visible or deleted_at is not None
+            changes.append(('comment', comment_id, post_id, None if removed else value))
+        self.apply(changes)
+
+    def apply(self, changes):
+        """Aplica los cambios confirmados: ('post'|'comment', id, post_id, texto o None)"""
+        with self._lock:
+            if not self.built:
+                return
+            for kind, doc_id, post_id, value in changes:
+                if kind == 'post':
+                    if value is None:
+                        self.indexes['posts'].remove(doc_id)
+                        # Los comentarios del post se borran junto con él
+                        for comment_id in self.comments_by_post.pop(doc_id, ()):
+                            self.indexes['comments'].remove(comment_id)
+                    else:
+                        self.indexes['posts'].add(doc_id, value)
+                else:
+                    if value is None:
+                        self.indexes['comments'].remove(doc_id)
+                        self.comments_by_post[post_id].discard(doc_id)
+                    else:
+                        self.indexes['comments'].add(doc_id, value)
+                        self.comments_by_post[post_id].add(doc_id)
+
+
+class MySQLSearchEngine:
+    """Búsqueda con los índices FULLTEXT de MySQL"""
+
+    QUERIES = {
+        'posts': (
+            "SELECT id FROM post WHERE is_published = 1 AND deleted_at IS NULL "
+            "AND MATCH (title, content) AGAINST (:q IN NATURAL LANGUAGE MODE) "
+            "ORDER BY MATCH (title, content) AGAINST (:q IN NATURAL LANGUAGE MODE) DESC, id DESC "
+            "LIMIT :limit OFFSET :offset",
+            "SELECT COUNT(*) FROM post WHERE is_published = 1 AND deleted_at IS NULL "
+            "AND MATCH (title, content) AGAINST (:q IN NATURAL LANGUAGE MODE)"
+        ),
+        'comments': (
+            "SELECT id FROM comment WHERE is_visible = 1 AND deleted_at IS NULL "
+            "AND MATCH (text) AGAINST (:q IN NATURAL LANGUAGE MODE) "
+            "ORDER BY MATCH (text) AGAINST (:q IN NATURAL LANGUAGE MODE) DESC, id DESC "
+            "LIMIT :limit OFFSET :offset",
+            "SELECT COUNT(*) FROM comment WHERE is_visible = 1 AND deleted_at IS NULL "
+            "AND MATCH (text) AGAINST (:q IN NATURAL LANGUAGE MODE)"
+        )
+    }
+
+    def search(self, kind, query, offset, limit):
+        page_sql, count_sql = self.QUERIES[kind]
+        params = {'q': query, 'limit': limit, 'offset': offset}
+        ids = db.session.execute(text(page_sql), params).scalars().all()
+        total = db.session.execute(text(count_sql), params).scalar()
+        return ids, total
+
+    def apply(self, changes):
+        # MySQL mantiene el índice FULLTEXT por su cuenta
+        pass
+
+
+class SearchEngine:
+    """Punto de acceso al motor configurado en SEARCH_BACKEND"""
+
+    def __init__(self):
+        self.engine = MemorySearchEngine()
+
+    def init_app(self, app):
+        backend = app.config.get('SEARCH_BACKEND', 'memory')
+        if backend == 'mysql':
+            self.engine = MySQLSearchEngine()
+        else:
+            self.engine = MemorySearchEngine(app.config.get('SEARCH_SYNC_SECONDS', 5))
+
+    def search(self, kind, query, offset, limit):
+        return self.engine.search(kind, query, offset, limit)
+
+    def apply(self, changes):
+        self.engine.apply(changes)
+
+
+search_engine = SearchEngine()
+
+
+#### Actualización incremental a partir de los commits ####
+
+def _changes_for(obj, deleted):
+    if isinstance(obj, Post):
+        removed = deleted or not obj.is_published or obj.deleted_at is not None
+        return ('post', obj.id, obj.id, None if removed else '%s %s' % (obj.title, obj.content))
+    if isinstance(obj, Comment):
+        removed = deleted or not obj.is_visible or obj.deleted_at is not None
+        return ('comment', obj.id, obj.post_id, None if removed else obj.text)
+    return None
+
+
+# Solo estos campos afectan al índice (p. ej. actualizar comment_count no reindexa el post)
+INDEXED_FIELDS = ('title', 'content', 'text', 'is_published', 'is_visible', 'deleted_at')
+
+
+def _text_changed(obj):
+    attrs = inspect(obj).attrs
+    return any(name in attrs and attrs[name].history.has_changes() for name in INDEXED_FIELDS)
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_search_changes(session, flush_context):
+    changes = session.info.setdefault('search_changes', [])
+    dirty = [obj for obj in session.dirty if _text_changed(obj)]
+    for obj in chain(session.new, dirty):
+        change = _changes_for(obj, deleted=False)
+        if change:
+            changes.append(change)
+    for obj in session.deleted:
+        change = _changes_for(obj, deleted=True)
+        if change:
+            changes.append(change)
+
+
+def record_removals(session, kind, rows):
+    """Anota bajas hechas con un UPDATE masivo, que no pasan por el flush.
+    `rows` son pares (id, post_id) de 'post' o 'comment'."""
+    changes = session.info.setdefault('search_changes', [])
+    changes.extend((kind, doc_id, post_id, None) for doc_id, post_id in rows)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_search_changes(session):
+    changes = session.info.pop('search_changes', None)
+    if changes:
+        search_engine.apply(changes)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_search_changes(session):
+    session.info.pop('search_changes', None)
@@ -0,0 +1,137 @@
+import time
+
+from flask.json.provider import DefaultJSONProvider
+from marshmallow import fields
+
+from metrics import record_serialization
+from schemas import UserSchema, PostSchema, CommentSchema, CategorySchema
+
+try:
+    import orjson
+except ImportError:  # dependencia opcional
+    orjson = None
+
+
+#### SERIALIZADORES PRECOMPILADOS ####
+
+def _identity(value):
+    return value
+
+
+def _datetime_converter(field):
+    data_format = field.format or field.DEFAULT_FORMAT
+    format_func = field.SERIALIZATION_FUNCS.get(data_format)
+    if format_func:
+        return format_func
+    return lambda value: value.strftime(data_format)
+
+
+def _converter(field):
+    """Función que replica field._serialize para valores no nulos, o None si no hay atajo"""
+    if isinstance(field, fields.Integer) and not field.as_string:
+        return int
+    if isinstance(field, fields.String):
+        return str
+    if type(field) is fields.Boolean:
+        return _identity
+    if type(field) is fields.DateTime:
+        return _datetime_converter(field)
+    if isinstance(field, fields.Pluck):
+        nested = field.schema.dump_fields[field.field_name]
+        convert = _converter(nested)
+        attr = nested.attribute or field.field_name
+        if convert is None:
+            return None
+        if field.many:
+            return lambda items: [
+                None if getattr(item, attr) is None else convert(getattr(item, attr)) for item in items
+            ]
+        return lambda item: None if getattr(item, attr) is None else convert(getattr(item, attr))
+    if isinstance(field, fields.Nested):
+        nested = _compile(field.schema)
+        if field.many or field.schema.many:
+            return lambda items: [nested(item) for item in items]
+        return nested
+    return None
+
+
+def _compile(schema):
+    """Genera una función dump(obj) -> dict para una instancia de Schema"""
+    namespace = {}
+    lines = ['def dump(obj):', '    result = {}']
+    for index, (name, field) in enumerate(schema.dump_fields.items()):
+        key = field.data_key or name
+        attr = field.attribute or name
+        convert = _converter(field)
+        if convert is None:
+            # Tipo de campo sin atajo: se delega en marshmallow
+            namespace['f%d' % index] = field
+            namespace['get%d' % index] = schema.get_attribute
+            lines.append('    result[%r] = f%d.serialize(%r, obj, accessor=get%d)' % (key, index, name, index))
+            continue
+        namespace['c%d' % index] = convert
+        lines.append('    value = getattr(obj, %r, None)' % attr)
+        lines.append('    result[%r] = None if value is None else c%d(value)' % (key, index))
+    lines.append('    return result')
+    exec('\n'.join(lines), namespace)
+    return namespace['dump']
+
+
+class Serializer:
+    """Equivalente a Schema().dump() compilado a partir de la definición del schema.
+
+    Se genera al importar el módulo a partir de los campos declarados, así que
+    agregar o quitar un campo en schemas.py se refleja automáticamente.
+    """
+
+    def __init__(self, schema_cls, **schema_kwargs):
+        self.schema = schema_cls(**schema_kwargs)
+        self._dump = _compile(self.schema)
+        self._subsets = {}
+
+    def only(self, names):
+        """Serializador con solo los campos `names` (?fields=), compilado una vez por combinación"""
+        key = frozenset(names)
+        serializer = self._subsets.get(key)
+        if serializer is None:
+            serializer = self._subsets[key] = Serializer(type(self.schema), only=sorted(key))
+        return serializer
+
+    def dump(self, obj):
+        started = time.perf_counter()
+        result = self._dump(obj)
+        record_serialization(time.perf_counter() - started)
+        return result
+
+    def dump_many(self, objs):
+        dump = self._dump
+        started = time.perf_counter()
+        result = [dump(obj) for obj in objs]
+        record_serialization(time.perf_counter() - started)
+        return result
+
+
+user_serializer = Serializer(UserSchema)
+# El extracto solo se envía si se pide con ?fields=
+post_serializer = Serializer(PostSchema, exclude=('excerpt',))
+comment_serializer = Serializer(CommentSchema)
+category_serializer = Serializer(CategorySchema)
+
+
+#### JSON ####
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Proveedor JSON de Flask que usa orjson si está instalado.
+
+    Mantiene sort_keys y la salida compacta del proveedor por defecto; la
+    única diferencia es que los caracteres no ASCII se envían en UTF-8 en
+    lugar de como escapes \\uXXXX.
+    """
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs.get('indent') or kwargs.get('cls'):
+            return super().dumps(obj, **kwargs)
+        return orjson.dumps(
+            obj, default=self.default,
+            option=orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS
+        ).decode()
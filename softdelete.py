@@ -0,0 +1,51 @@
+"""Borrado lógico con deleted_at.
+
+Los usuarios, posts y comentarios no se borran al momento: se marcan con
+deleted_at y todas las consultas del ORM dejan de verlos (_hide_deleted),
+incluidas las relaciones y los conteos. `flask blog purge-deleted` los borra
+de verdad cuando pasa SOFT_DELETE_RETENTION_DAYS, en lotes cortos, y las
+claves foráneas con ON DELETE CASCADE se llevan las filas que dependen de
+ellos sin pasar por el ORM.
+"""
+import time
+
+from sqlalchemy import Column, DateTime, event, select, delete
+from sqlalchemy.orm import Session, with_loader_criteria
+
+
+class SoftDeleteMixin:
+    deleted_at = Column(DateTime, nullable=True)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _hide_deleted(orm_execute_state):
+    # Las cargas de relaciones y columnas diferidas heredan el criterio de la consulta original
+    if (orm_execute_state.is_select
+            and not orm_execute_state.is_column_load
+            and not orm_execute_state.is_relationship_load
+            and not orm_execute_state.execution_options.get('include_deleted', False)):
+        orm_execute_state.statement = orm_execute_state.statement.options(with_loader_criteria(
+            SoftDeleteMixin, lambda cls: cls.deleted_at.is_(None), include_aliases=True
+        ))
+
+
+def purge(session, model, cutoff, chunk_size=500, pause=0):
+    """Borra las filas de `model` marcadas antes de `cutoff` y devuelve cuántas.
+
+    Cada lote de `chunk_size` filas es su propia transacción, así los
+    bloqueos duran poco aunque haya millones de filas para borrar; `pause`
+    deja respirar a la réplica entre lotes.
+    """
+    total = 0
+    while True:
+        ids = session.scalars(
+            select(model.id).where(model.deleted_at < cutoff).order_by(model.id).limit(chunk_size),
+            execution_options={'include_deleted': True}
+        ).all()
+        if not ids:
+            return total
+        session.execute(delete(model).where(model.id.in_(ids)), execution_options={'synchronize_session': False})
+        session.commit()
+        total += len(ids)
+        if pause:
+            time.sleep(pause)
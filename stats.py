@@ -0,0 +1,212 @@
+import hashlib
+from collections import Counter, defaultdict
+from datetime import date
+
+from sqlalchemy import text, update, insert, select, func, bindparam, or_
+
+from jobs import jobs
+from models import db, User, Post, Comment, SiteStats, DailyStats, Job, user_follow
+
+
+# Recalcula las altas por día a partir de las tablas principales (sin las filas borradas)
+DAILY_ROLLUP_SQL = text("""
+    INSERT INTO daily_stats (day, posts, comments, users)
+    SELECT d, SUM(p), SUM(c), SUM(u) FROM (
+        SELECT DATE(created_at) AS d, 1 AS p, 0 AS c, 0 AS u FROM post WHERE deleted_at IS NULL
+        UNION ALL SELECT DATE(created_at), 0, 1, 0 FROM comment WHERE deleted_at IS NULL
+        UNION ALL SELECT DATE(created_at), 0, 0, 1 FROM user WHERE deleted_at IS NULL
+    ) AS t
+    WHERE d IS NOT NULL
+    GROUP BY d
+""")
+
+
+def adjust(posts=0, comments=0, users=0, day=None):
+    """Suma los deltas a los totales y, si se indica el día, a su fila diaria"""
+    result = db.session.execute(
+        update(SiteStats).where(SiteStats.id == 1).values(
+            total_posts=SiteStats.total_posts + posts,
+            total_comments=SiteStats.total_comments + comments,
+            total_users=SiteStats.total_users + users
+        )
+    )
+    if result.rowcount == 0:
+        db.session.execute(insert(SiteStats).values(
+            id=1, total_posts=max(posts, 0),
+            total_comments=max(comments, 0), total_users=max(users, 0)
+        ))
+
+    if day is None:
+        return
+    result = db.session.execute(
+        update(DailyStats).where(DailyStats.day == day).values(
+            posts=DailyStats.posts + posts,
+            comments=DailyStats.comments + comments,
+            users=DailyStats.users + users
+        )
+    )
+    if result.rowcount == 0:
+        db.session.execute(insert(DailyStats).values(
+            day=day, posts=max(posts, 0),
+            comments=max(comments, 0), users=max(users, 0)
+        ))
+
+
+def _bump_post_count(user_id, delta):
+    db.session.execute(
+        update(User).where(User.id == user_id).values(post_count=User.post_count + delta)
+    )
+
+
+def _bump_comment_count(post, delta):
+    # Se asigna updated_at a sí mismo para que el contador no cuente como edición del post
+    post.comment_count = Post.comment_count + delta
+    post.updated_at = Post.updated_at
+
+
+#### Totales del sitio (en segundo plano) ####
+
+# La fila única de SiteStats la actualizarían todas las escrituras a la vez;
+# se aplica desde la cola de trabajos para que las vistas no esperen su bloqueo
+
+@jobs.task('stats.adjust')
+def apply_adjustment(posts=0, comments=0, users=0, day=None):
+    adjust(posts, comments, users, date.fromisoformat(day) if day else None)
+
+
+def _enqueue_adjustment(key, day, **deltas):
+    jobs.enqueue('stats.adjust', dict(deltas, day=day.isoformat()), key=key)
+
+
+#### Altas y bajas (llamar antes del commit, con created_at ya asignado) ####
+
+def user_created(user):
+    _enqueue_adjustment('stats:user:%d:created' % user.id, user.created_at.date(), users=1)
+
+
+def post_created(post):
+    _enqueue_adjustment('stats:post:%d:created' % post.id, post.created_at.date(), posts=1)
+    _bump_post_count(post.user_id, 1)
+
+
+def post_deleted(post, removed_comments):
+    _enqueue_adjustment('stats:post:%d:deleted' % post.id, post.created_at.date(),
+                        posts=-1, comments=-removed_comments)
+    _bump_post_count(post.user_id, -1)
+
+
+def comment_created(comment, post):
+    _enqueue_adjustment('stats:comment:%d:created' % comment.id, comment.created_at.date(), comments=1)
+    _bump_comment_count(post, 1)
+
+
+def comment_deleted(comment):
+    _enqueue_adjustment('stats:comment:%d:deleted' % comment.id, comment.created_at.date(), comments=-1)
+    if comment.is_visible:
+        _bump_comment_count(comment.post, -1)
+
+
+#### Altas y bajas en lote ####
+
+def _batch_key(action, ids):
+    digest = hashlib.sha1(','.join(str(item_id) for item_id in sorted(ids)).encode()).hexdigest()
+    return 'stats:%s:%s' % (action, digest)
+
+
+def posts_created(posts):
+    """Equivalente a post_created para varios posts del mismo autor"""
+    by_day = Counter(post.created_at.date() for post in posts)
+    for day, count in by_day.items():
+        ids = [post.id for post in posts if post.created_at.date() == day]
+        _enqueue_adjustment(_batch_key('posts-created', ids), day, posts=count)
+    _bump_post_count(posts[0].user_id, len(posts))
+
+
+def comments_deleted(comments):
+    """Equivalente a comment_deleted para varios comentarios, en una sola sentencia por tabla"""
+    by_day = Counter(comment.created_at.date() for comment in comments)
+    for day, count in by_day.items():
+        ids = [comment.id for comment in comments if comment.created_at.date() == day]
+        _enqueue_adjustment(_batch_key('comments-deleted', ids), day, comments=-count)
+
+    by_post = Counter(comment.post_id for comment in comments if comment.is_visible)
+    _decrement_comment_counts(by_post)
+    return set(by_post)
+
+
+def _decrement_comment_counts(by_post):
+    """Resta {post_id: comentarios} a comment_count con un solo executemany"""
+    if not by_post:
+        return
+    post = Post.__table__
+    db.session.execute(
+        update(post).where(post.c.id == bindparam('post_id')).values(
+            comment_count=post.c.comment_count - bindparam('removed'),
+            updated_at=post.c.updated_at
+        ),
+        [{'post_id': post_id, 'removed': removed} for post_id, removed in by_post.items()]
+    )
+
+
+def _per_day(column, *criteria):
+    """Filas por día de creación; DATE() devuelve texto en SQLite y date en MySQL"""
+    day = func.date(column)
+    rows = db.session.execute(select(day, func.count()).where(*criteria).group_by(day))
+    return {(value if isinstance(value, date) else date.fromisoformat(value)): count for value, count in rows}
+
+
+def user_deleted(user):
+    """Baja de un usuario con sus posts, los comentarios de esos posts y sus
+    comentarios en posts ajenos. Cuenta con consultas agrupadas, sin cargar
+    las filas; llamar antes de marcarlas. Devuelve los ids de los posts
+    ajenos cuyo comment_count cambió."""
+    own_posts = select(Post.id).where(Post.user_id == user.id)
+    deltas = defaultdict(Counter)
+    for day, count in _per_day(Post.created_at, Post.user_id == user.id).items():
+        deltas[day]['posts'] -= count
+    for day, count in _per_day(Comment.created_at, or_(Comment.user_id == user.id, Comment.post_id.in_(own_posts))).items():
+        deltas[day]['comments'] -= count
+    deltas[user.created_at.date()]['users'] -= 1
+    for day, values in deltas.items():
+        _enqueue_adjustment('stats:user:%d:deleted:%s' % (user.id, day.isoformat()), day, **values)
+
+    by_post = dict(db.session.execute(
+        select(Comment.post_id, func.count())
+        .where(Comment.user_id == user.id, Comment.is_visible == True, Comment.post_id.not_in(own_posts))
+        .group_by(Comment.post_id)
+    ).all())
+    _decrement_comment_counts(by_post)
+    user.post_count = 0
+    return set(by_post)
+
+
+def rebuild():
+    """Reconstruye todos los contadores desde cero"""
+    # Las sentencias UPDATE/INSERT no pasan por el filtro de softdelete: las filas borradas se excluyen a mano
+    visible_comments = (
+        select(func.count(Comment.id))
+        .where(Comment.post_id == Post.id, Comment.is_visible == True, Comment.deleted_at.is_(None))
+        .scalar_subquery()
+    )
+    db.session.execute(
+        update(Post).values(comment_count=visible_comments, updated_at=Post.updated_at)
+    )
+
+    user_posts = select(func.count(Post.id)).where(Post.user_id == User.id, Post.deleted_at.is_(None)).scalar_subquery()
+    user_followers = select(func.count()).select_from(user_follow).where(user_follow.c.followed_id == User.id).scalar_subquery()
+    db.session.execute(update(User).values(post_count=user_posts, follower_count=user_followers))
+
+    # Los ajustes pendientes ya quedan contados en el recálculo
+    db.session.execute(db.delete(Job).where(Job.kind == 'stats.adjust', Job.status == 'pending'))
+
+    db.session.execute(db.delete(SiteStats))
+    db.session.execute(insert(SiteStats).values(
+        id=1,
+        total_posts=select(func.count(Post.id)).where(Post.deleted_at.is_(None)).scalar_subquery(),
+        total_comments=select(func.count(Comment.id)).where(Comment.deleted_at.is_(None)).scalar_subquery(),
+        total_users=select(func.count(User.id)).where(User.deleted_at.is_(None)).scalar_subquery()
+    ))
+
+    db.session.execute(db.delete(DailyStats))
+    db.session.execute(DAILY_ROLLUP_SQL)
+    db.session.commit()
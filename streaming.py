@@ -0,0 +1,78 @@
+from flask import Response, current_app, request, stream_with_context
+
+from pagination import after_position, order_by_position
+
+
+STREAM_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'json': 'application/json'
+}
+
+
+def requested_stream_format():
+    """Formato de streaming pedido con ?stream=ndjson|json.
+
+    Va solo en la URL (no se negocia con Accept): la clave del cache de
+    respuestas y el ETag se arman con la ruta completa.
+    """
+    fmt = request.args.get('stream')
+    return fmt if fmt in STREAM_MIMETYPES else None
+
+
+def stream_query(query, serializer, fmt, batch_size=500, keyset=None):
+    """Respuesta que itera la consulta por lotes y serializa a medida que envía.
+
+    En memoria solo hay un lote de filas por vez, en lugar de la lista
+    completa, su volcado y el JSON final. Con keyset=(created_col, id_col)
+    los lotes se piden como páginas por cursor (más recientes primero) en
+    lugar de con yield_per, lo que permite usar selectinload en colecciones
+    y no deja un cursor abierto en el servidor durante toda la respuesta.
+    """
+    dumps = current_app.json.dumps
+
+    def generate():
+        first = True
+        if fmt == 'json':
+            yield '['
+
+        for batch in _batches(query, batch_size, keyset):
+            chunk = []
+            for row in batch:
+                data = dumps(serializer.dump(row))
+                if fmt == 'ndjson':
+                    chunk.append(data + '\n')
+                else:
+                    chunk.append(data if first else ',' + data)
+                first = False
+            if chunk:
+                yield ''.join(chunk)
+
+        if fmt == 'json':
+            yield ']'
+
+    return Response(stream_with_context(generate()), mimetype=STREAM_MIMETYPES[fmt])
+
+
+def _batches(query, batch_size, keyset):
+    if keyset is None:
+        batch = []
+        for row in query.yield_per(batch_size):
+            batch.append(row)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+        return
+
+    created_col, id_col = keyset
+    ordered = order_by_position(query, created_col, id_col)
+    page = ordered
+    while True:
+        batch = page.limit(batch_size).all()
+        if batch:
+            yield batch
+        if len(batch) < batch_size:
+            return
+        last = batch[-1]
+        page = after_position(ordered, created_col, id_col, last.created_at, last.id)
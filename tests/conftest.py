@@ -0,0 +1,110 @@
+import asyncio
+from contextlib import contextmanager
+
+import pytest
+from sqlalchemy import event
+
+from app import create_app
+from models import db, User, Post, Category, Comment
+
+
+def make_app(**config):
+    # Sin cache de respuestas: cada petición tiene que llegar a la base
+    options = {
+        'SQLALCHEMY_DATABASE_URI': 'sqlite://',
+        'TESTING': True,
+        'BCRYPT_ROUNDS': 4,
+        'CACHE_BACKEND': 'none',
+    }
+    options.update(config)
+    return create_app(options)
+
+
+@pytest.fixture
+def app():
+    # Sin un contexto activo durante el test: cada petición abre el suyo y su sesión, como en producción
+    app = make_app()
+    # Solo el bind principal: db.metadatas conserva los binds de réplica de tests anteriores
+    with app.app_context():
+        db.create_all(bind_key=None)
+    yield app
+    with app.app_context():
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@contextmanager
+def asgi_client(app):
+    """Cliente de las vistas async (asgi.py) con el event loop en otro hilo.
+
+    La app tiene que usar una base en archivo: el engine async abre sus propias conexiones.
+    """
+    from asgi import AsgiApp, async_db
+    from benchmarks.run import AsgiClient, start_event_loop
+
+    loop = start_event_loop()
+    try:
+        yield AsgiClient(AsgiApp(app), loop)
+    finally:
+        asyncio.run_coroutine_threadsafe(async_db.dispose(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+
+
+class QueryCounter:
+    """Cuenta las sentencias SQL que llegan al cursor mientras está activo"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _count(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        self.statements = []
+        event.listen(self.engine, 'before_cursor_execute', self._count)
+        return self
+
+    def __exit__(self, *exc_info):
+        event.remove(self.engine, 'before_cursor_execute', self._count)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(app):
+    with app.app_context():
+        return QueryCounter(db.engine)
+
+
+@pytest.fixture
+def seed(app):
+    def seed_app(*args, **kwargs):
+        with app.app_context():
+            return seed_blog(*args, **kwargs)
+    return seed_app
+
+
+def seed_blog(posts, comments_per_post, authors=5):
+    """Posts con dos categorías y comentarios de autores distintos; devuelve los ids de los posts"""
+    users = [User(name='user%d' % i, email='user%d@example.com' % i, role='user') for i in range(authors)]
+    categories = [Category(name='categoria%d' % i) for i in range(3)]
+    db.session.add_all(users + categories)
+    db.session.flush()
+    post_ids = []
+    for i in range(posts):
+        post = Post(title='Post %d' % i, content='Contenido %d' % i, user_id=users[i % authors].id,
+                    categories=[categories[i % 3], categories[(i + 1) % 3]], comment_count=comments_per_post)
+        db.session.add(post)
+        db.session.flush()
+        db.session.add_all(Comment(text='Comentario %d' % j, post_id=post.id, user_id=users[j % authors].id)
+                           for j in range(comments_per_post))
+        post_ids.append(post.id)
+    db.session.commit()
+    return post_ids
@@ -0,0 +1,55 @@
+"""Escrituras hechas por otro proceso sobre la misma base.
+
+Se simulan con sentencias Core sobre el engine, fuera de la sesión: así no
+pasan por los eventos que invalidan los caches de este proceso, y lo único
+que cambia además de las filas es table_version, como pasaría con una
+escritura de otro worker.
+"""
+from datetime import datetime
+
+import pytest
+from sqlalchemy import insert, update
+
+from conftest import make_app, seed_blog
+from models import db, Post, Category, TableVersion
+
+
+@pytest.fixture
+def cached_app(tmp_path):
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'blog.db'), CACHE_BACKEND='memory')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        seed_blog(posts=1, comments_per_post=0)
+    yield app
+    with app.app_context():
+        db.drop_all(bind_key=None)
+
+
+def write_elsewhere(app, table, statement):
+    with app.app_context(), db.engine.begin() as connection:
+        connection.execute(statement)
+        connection.execute(update(TableVersion.__table__).where(TableVersion.name == table)
+                           .values(version=TableVersion.version + 1, changed_at=datetime.utcnow()))
+
+
+def test_cached_post_is_not_served_with_new_etag(cached_app):
+    client = cached_app.test_client()
+    first = client.get('/api/posts/1')
+    assert first.get_json()['title'] == 'Post 0'
+
+    write_elsewhere(cached_app, 'post', update(Post).where(Post.id == 1).values(title='Editado'))
+
+    second = client.get('/api/posts/1')
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert second.get_json()['title'] == 'Editado'
+
+
+def test_category_list_follows_other_processes(cached_app):
+    client = cached_app.test_client()
+    first = client.get('/api/categories')
+
+    write_elsewhere(cached_app, 'category', insert(Category).values(name='nueva', updated_at=datetime.utcnow()))
+
+    second = client.get('/api/categories')
+    assert second.headers['ETag'] != first.headers['ETag']
+    assert 'nueva' in [category['name'] for category in second.get_json()]
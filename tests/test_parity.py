@@ -0,0 +1,113 @@
+"""Las vistas async (asgi.py) responden lo mismo que las de Flask (views.py).
+
+Las dos apps comparten la base (en archivo: el engine async abre sus propias
+conexiones) y cada petición se envía a ambas con Comparison, la misma de
+benchmarks/parity.py: status, cuerpo, ETag, Last-Modified y Content-Type.
+"""
+import json
+
+import pytest
+
+from benchmarks.parity import Comparison
+from benchmarks.run import AppClient
+from conftest import asgi_client, make_app, seed_blog
+from models import db, User
+
+# El engine async de asgi.py necesita el driver asyncio de SQLite
+pytest.importorskip('aiosqlite')
+
+POSTS = 12
+MISSING = POSTS + 100
+
+READ_PATHS = [
+    '/api/posts',
+    '/api/posts?limit=5',
+    '/api/posts?category=categoria1',
+    '/api/posts?category=1&limit=3',
+    '/api/posts?author=user2',
+    '/api/posts?since=2024-01-01T10:00:00&until=2024-01-02',
+    '/api/posts?since=ayer',
+    '/api/posts?cursor=invalido',
+    '/api/posts?stream=ndjson',
+    '/api/posts?fields=id,title,excerpt&limit=5',
+    '/api/posts?fields=author,categories,comment_count',
+    '/api/posts?fields=desconocido',
+    '/api/posts/1',
+    '/api/posts/%d' % POSTS,
+    '/api/posts/%d' % MISSING,
+    '/api/posts/1/comments',
+    '/api/posts/1/comments?limit=2',
+    '/api/posts/%d/comments' % MISSING,
+    '/api/posts/1/comments?cursor=invalido',
+    '/api/categories',
+    '/api/categories?stream=json',
+]
+
+VALIDATED_PATHS = ('/api/posts', '/api/posts/1', '/api/posts/1/comments', '/api/categories')
+
+
+def login(app, client, username, role=None):
+    email = '%s@example.com' % username
+    client.fetch('POST', '/api/register', json={'username': username, 'email': email, 'password': 'secret1'})
+    if role is not None:
+        with app.app_context():
+            User.query.filter_by(email=email).update({'role': role})
+            db.session.commit()
+    status, _, body = client.fetch('POST', '/api/login', json={'email': email, 'password': 'secret1'})
+    assert status == 200, body
+    return {'Authorization': 'Bearer ' + json.loads(body)['access_token']}
+
+
+@pytest.fixture(params=['none', 'memory'])
+def parity_app(request, tmp_path):
+    # Con 'memory' las dos apps comparten además la cache de respuestas
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'blog.db'),
+                   CACHE_BACKEND=request.param, RATELIMIT_BACKEND='none')
+    with app.app_context():
+        db.create_all(bind_key=None)
+        seed_blog(POSTS, comments_per_post=4)
+    yield app
+    with app.app_context():
+        db.drop_all(bind_key=None)
+
+
+@pytest.fixture
+def comparison(parity_app):
+    with asgi_client(parity_app) as asgi:
+        yield Comparison(AppClient(parity_app), asgi)
+
+
+def test_reads(comparison):
+    for path in READ_PATHS:
+        comparison.check('GET', path)
+        comparison.check('HEAD', path)
+    comparison.check_pages('/api/posts?limit=5')
+    comparison.check_pages('/api/posts/1/comments?limit=3')
+    comparison.check('GET', '/api/posts', {'Accept-Encoding': 'gzip'})
+    assert comparison.mismatches == []
+
+
+def test_not_modified(comparison):
+    for path in VALIDATED_PATHS:
+        comparison.check_not_modified(path)
+    assert comparison.mismatches == []
+
+
+def test_reads_after_writes(parity_app, comparison):
+    # Las escrituras van a Flask en los dos modos; después las dos apps tienen que ver lo mismo
+    wsgi, asgi = comparison.clients['wsgi'], comparison.clients['asgi']
+    user = login(parity_app, wsgi, 'paridad')
+    admin = login(parity_app, wsgi, 'admin-paridad', role='admin')
+    writes = [
+        (asgi, 'POST', '/api/posts', user, {'title': 'Paridad', 'content': 'Post creado por el modo ASGI'}),
+        (wsgi, 'POST', '/api/posts/1/comments', user, {'text': 'Comentario creado por el modo WSGI'}),
+        (asgi, 'PUT', '/api/categories/1', admin, {'name': 'categoria-paridad'}),
+        (wsgi, 'PUT', '/api/posts/1', admin, {'content': 'Contenido editado'}),
+        (asgi, 'DELETE', '/api/posts/2', admin, None),
+    ]
+    for client, method, path, headers, body in writes:
+        status, _, response = client.fetch(method, path, headers, body)
+        assert status < 300, (method, path, response)
+        for read_path in VALIDATED_PATHS:
+            comparison.check('GET', read_path)
+    assert comparison.mismatches == []
@@ -0,0 +1,66 @@
+"""Consultas SQL por petición en los GET públicos más usados.
+
+Los números quedan fijos: una consulta de más (p. ej. un N+1 al serializar
+autores o categorías) hace fallar el test. Se mide con el cache de
+respuestas apagado y el de entidades vacío, y con dos tamaños de datos para
+comprobar que la cantidad no crece con las filas.
+"""
+import json
+
+import pytest
+
+import entities
+from conftest import QueryCounter, asgi_client, make_app, seed_blog
+from models import db
+
+
+# (ruta, consultas): validador del GET condicional + filas + categorías (selectinload) + autores (entities.py)
+EXPECTED = (
+    ('/api/posts', 4),
+    ('/api/posts/{post_id}', 4),
+    # El post y la página de comentarios salen de una sola consulta (comment_page_query)
+    ('/api/posts/{post_id}/comments', 3),
+)
+
+
+def measure(client, count_queries, path):
+    entities.users.invalidate()
+    entities.categories.invalidate()
+    with count_queries:
+        response = client.get(path)
+    assert response.status_code == 200
+    return count_queries.count
+
+
+@pytest.mark.parametrize('posts', [3, 20])
+@pytest.mark.parametrize('path, expected', EXPECTED)
+def test_queries_per_request(client, count_queries, seed, posts, path, expected):
+    post_ids = seed(posts, comments_per_post=posts)
+    assert measure(client, count_queries, path.format(post_id=post_ids[0])) == expected
+
+
+def test_queries_with_warm_entity_cache(client, count_queries, seed):
+    post_ids = seed(5, comments_per_post=5)
+    client.get('/api/posts')
+    # Los autores ya están en el cache de entidades: no hace falta consultarlos
+    with count_queries:
+        assert client.get('/api/posts').status_code == 200
+    assert count_queries.count == 3
+    with count_queries:
+        assert client.get('/api/posts/%d/comments' % post_ids[0]).status_code == 200
+    assert count_queries.count == 2
+
+
+def test_async_views_without_entity_cache(tmp_path):
+    # Con ENTITY_CACHE_USERS=0 los autores salen de users.prime(), sin consultas al engine sync
+    app = make_app(SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'blog.db'), ENTITY_CACHE_USERS=0)
+    with app.app_context():
+        db.create_all(bind_key=None)
+        post_ids = seed_blog(5, comments_per_post=5)
+        counter = QueryCounter(db.engine)
+    with asgi_client(app) as client, counter:
+        for path in ('/api/posts', '/api/posts/%d' % post_ids[0], '/api/posts/%d/comments' % post_ids[0]):
+            status, headers, body = client.fetch('GET', path)
+            assert status == 200
+            assert 'user' in json.dumps(json.loads(body))
+    assert counter.count == 0
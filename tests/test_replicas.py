@@ -0,0 +1,88 @@
+"""Reparto de lecturas entre primario y réplica (replicas.py).
+
+El primario y la réplica son dos bases SQLite distintas con el mismo
+esquema pero distinto contenido, así cada respuesta muestra de dónde leyó.
+"""
+import time
+
+import pytest
+from sqlalchemy.orm import Session
+
+from conftest import make_app
+from models import db, User, Post
+from replicas import STICKY_COOKIE
+
+
+def add_post(session, title):
+    user = User(name='autor', email='autor@example.com', role='user')
+    session.add(user)
+    session.flush()
+    session.add(Post(title=title, content='...', user_id=user.id))
+    session.commit()
+
+
+@pytest.fixture
+def replica_app(tmp_path):
+    app = make_app(
+        SQLALCHEMY_DATABASE_URI='sqlite:///%s' % (tmp_path / 'primary.db'),
+        DATABASE_REPLICA_URLS='sqlite:///%s' % (tmp_path / 'replica.db'),
+        REPLICA_STICKY_SECONDS=5,
+    )
+    with app.app_context():
+        db.create_all(bind_key=None)
+        # La réplica de prueba tiene el mismo esquema que el primario
+        replica = db.engines['replica_0']
+        db.metadata.create_all(replica)
+        add_post(db.session, 'en el primario')
+        with Session(replica) as session:
+            add_post(session, 'en la réplica')
+    yield app
+
+
+def titles(response):
+    assert response.status_code == 200
+    return [item['title'] for item in response.get_json()['items']]
+
+
+def login(client):
+    response = client.post('/api/register', json={'username': 'ana', 'email': 'ana@example.com', 'password': 'secret1'})
+    assert response.status_code == 201
+    response = client.post('/api/login', json={'email': 'ana@example.com', 'password': 'secret1'})
+    return {'Authorization': 'Bearer ' + response.get_json()['access_token']}
+
+
+def test_get_reads_from_replica(replica_app):
+    client = replica_app.test_client()
+    assert titles(client.get('/api/posts')) == ['en la réplica']
+    assert client.get_cookie(STICKY_COOKIE) is None
+
+
+def test_write_goes_to_primary_and_sticks(replica_app):
+    client = replica_app.test_client()
+    headers = login(client)
+    response = client.post('/api/posts', json={'title': 'nuevo', 'content': '...'}, headers=headers)
+    assert response.status_code == 201
+    assert client.get_cookie(STICKY_COOKIE) is not None
+
+    # Mientras dura la cookie el cliente lee del primario y ve su propio post
+    assert titles(client.get('/api/posts')) == ['nuevo', 'en el primario']
+    with replica_app.app_context(), Session(db.engines['replica_0']) as session:
+        assert [post.title for post in session.query(Post)] == ['en la réplica']
+
+    # Otro cliente sin la cookie sigue leyendo de la réplica
+    assert titles(replica_app.test_client().get('/api/posts')) == ['en la réplica']
+
+
+def test_expired_sticky_cookie_reads_from_replica(replica_app):
+    client = replica_app.test_client()
+    client.set_cookie(STICKY_COOKIE, str(int(time.time()) - 1))
+    assert titles(client.get('/api/posts')) == ['en la réplica']
+    client.set_cookie(STICKY_COOKIE, str(int(time.time()) + 60))
+    assert titles(client.get('/api/posts')) == ['en el primario']
+
+
+def test_without_replicas_reads_primary(app, client):
+    with app.app_context():
+        add_post(db.session, 'único')
+    assert titles(client.get('/api/posts')) == ['único']
+    assert client.get_cookie(STICKY_COOKIE) is None
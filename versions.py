@@ -0,0 +1,64 @@
+"""Versión y último cambio de cada tabla, para los GET condicionales.
+
+MAX(updated_at) solo ve las filas vivas: después de un borrado (lógico o
+real) el máximo no cambia o baja, y If-Modified-Since contestaría 304 con
+datos viejos. Por eso cada escritura sobre posts, comentarios o categorías
+incrementa en la misma transacción la fila de su tabla en table_version
+(version + 1, changed_at = ahora), tanto en el flush del ORM como en los
+INSERT/UPDATE/DELETE masivos. Los validadores de views.py arman el ETag y
+Last-Modified con estas filas.
+"""
+from datetime import datetime
+
+from sqlalchemy import event, select, update
+from sqlalchemy.orm import Session
+
+from models import TableVersion
+
+
+# Tabla escrita -> fila de table_version que cambia
+TRACKED = {
+    'post': 'post',
+    'post_category': 'post',
+    'comment': 'comment',
+    'category': 'category',
+}
+
+
+def changes(name):
+    """(versión, último cambio) de la tabla `name` como subconsultas escalares"""
+    where = TableVersion.name == name
+    return (
+        select(TableVersion.version).where(where).scalar_subquery(),
+        select(TableVersion.changed_at).where(where).scalar_subquery()
+    )
+
+
+def _bump(session, names):
+    if names:
+        session.connection().execute(
+            update(TableVersion.__table__)
+            .where(TableVersion.name.in_(sorted(names)))
+            .values(version=TableVersion.version + 1, changed_at=datetime.utcnow())
+        )
+
+
+@event.listens_for(Session, 'after_flush')
+def _bump_flushed(session, flush_context):
+    names = set()
+    for obj in session.new | session.deleted:
+        names.add(TRACKED.get(obj.__table__.name))
+    for obj in session.dirty:
+        if session.is_modified(obj):
+            names.add(TRACKED.get(obj.__table__.name))
+    names.discard(None)
+    _bump(session, names)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _bump_bulk(orm_execute_state):
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        name = TRACKED.get(getattr(table, 'name', None))
+        if name is not None:
+            _bump(orm_execute_state.session, {name})
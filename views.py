@@ -1,8 +1,7 @@
-from datetime import timedelta
-from flask import request, jsonify
+from datetime import datetime, timedelta
+from flask import request, jsonify, abort, current_app
 from marshmallow import ValidationError
 from flask.views import MethodView
-from passlib.hash import bcrypt_sha256
 from flask_jwt_extended import (
     jwt_required,
     create_access_token,
@@ -11,9 +10,29 @@ from flask_jwt_extended import (
 )
 
 from functools import wraps
-from models import db, User, UserCredential, Post, Category, Comment
+from sqlalchemy import func, and_, or_, select, delete
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import selectinload, load_only
+from models import db, User, UserCredential, Post, Category, Comment, SiteStats, DailyStats, post_category
+from pagination import (
+    keyset_page, get_page_size, position_condition, requested_position, split_page,
+    encode_offset, decode_offset, InvalidCursor
+)
+from cache import cache
+from conditional import conditional
+from versions import changes
+import entities
+import feed
+import stats
+from hashing import hasher, HashingBusy
+from ratelimit import rate_limit
+from revocation import revocations
+from replicas import read_replica
+from search import search_engine, record_removals
+from streaming import requested_stream_format, stream_query
+from serializers import user_serializer, post_serializer, comment_serializer, category_serializer
 from schemas import (
-    UserSchema, RegisterSchema, LoginSchema,
+    RegisterSchema, LoginSchema,
     PostSchema, CommentSchema, CategorySchema
 )
 
@@ -41,17 +60,170 @@ def check_ownership(user_id, resource_owner_id):
     return user_id == resource_owner_id
 
 
+def parse_post_filters(args):
+    """Traduce ?category=, ?author=, ?since= y ?until= a condiciones sobre Post.
+
+    category y author aceptan id o nombre; el nombre se resuelve con una
+    subconsulta para que todo quede en una sola consulta indexada.
+    Lanza ValueError si alguna fecha es inválida.
+    """
+    conditions = []
+
+    category = args.get('category')
+    if category:
+        if category.isdigit():
+            category_id = int(category)
+        else:
+            category_id = select(Category.id).where(Category.name == category).scalar_subquery()
+        conditions.append(Post.id.in_(
+            select(post_category.c.post_id).where(post_category.c.category_id == category_id)
+        ))
+
+    author = args.get('author')
+    if author:
+        if author.isdigit():
+            conditions.append(Post.user_id == int(author))
+        else:
+            conditions.append(Post.user_id == select(User.id).where(User.name == author).scalar_subquery())
+
+    if args.get('since'):
+        conditions.append(Post.created_at >= datetime.fromisoformat(args['since']))
+    if args.get('until'):
+        conditions.append(Post.created_at < datetime.fromisoformat(args['until']))
+
+    return conditions
+
+
+# Campos de ?fields= que son columnas (o expresiones SQL) de Post
+POST_COLUMNS = ('id', 'title', 'content', 'excerpt', 'created_at', 'updated_at', 'is_published', 'user_id',
+                'comment_count')
+POST_FIELDS = POST_COLUMNS + ('author', 'categories')
+
+
+def post_fieldset(value):
+    """Serializador y opciones de carga para ?fields=title,excerpt,...
+
+    Sin ?fields= se envía el post completo. Con ?fields= el SELECT trae solo
+    las columnas pedidas (más id y created_at, que usa el cursor) y solo se
+    cargan las relaciones pedidas: sin 'content' el texto no sale de la base.
+    El autor sale del cache de entidades (entities.py), sin JOIN con user.
+    Lanza ValueError si algún campo no existe.
+    """
+    if not value:
+        return post_serializer, [selectinload(Post.categories)]
+
+    names = {name.strip() for name in value.split(',') if name.strip()}
+    unknown = names.difference(POST_FIELDS)
+    if unknown or not names:
+        raise ValueError("Campos inválidos: %s (disponibles: %s)" % (', '.join(sorted(unknown)), ', '.join(POST_FIELDS)))
+
+    columns = {Post.id, Post.created_at}
+    columns.update(getattr(Post, name) for name in names.intersection(POST_COLUMNS))
+    options = []
+    if 'author' in names:
+        columns.add(Post.user_id)
+    if 'categories' in names:
+        options.append(selectinload(Post.categories))
+    return post_serializer.only(names), [load_only(*columns)] + options
+
+
+def latest(*values):
+    present = [value for value in values if value is not None]
+    return max(present) if present else None
+
+
+# Validadores para los GET condicionales (consultas sin cargar filas). Cada
+# versión devuelve la consulta y la función que arma (last_modified, token)
+# con su fila; el modo ASGI (asgi.py) ejecuta las mismas consultas
+def query_validator(version):
+    """Validador para conditional() que ejecuta la consulta de `version` en db.session"""
+    def validator(**kwargs):
+        statement, token = version(**kwargs)
+        row = db.session.execute(statement).first()
+        return None if row is None else token(*row)
+    return validator
+
+
+def post_list_version():
+    # Last-Modified sale de table_version (versions.py): las bajas también lo mueven.
+    # Los posts incluyen los nombres de sus categorías: renombrarlas o borrarlas
+    # (el DELETE se lleva sus filas de post_category por CASCADE) también cambia el ETag
+    statement = select(*changes('post'), *changes('category'))
+
+    def token(version, changed_at, categories, categories_changed):
+        return latest(changed_at, categories_changed), '%s|%s' % (version, categories)
+    return statement, token
+
+
+def post_detail_version(post_id):
+    # comment_count cambia sin tocar updated_at: la fecha es la del último cambio en posts
+    statement = select(
+        Post.updated_at, Post.comment_count, *changes('post'), *changes('category')
+    ).where(Post.id == post_id)
+
+    def token(updated_at, comments, version, changed_at, categories, categories_changed):
+        return latest(changed_at, categories_changed), '%s|%s|%s' % (updated_at, comments, categories)
+    return statement, token
+
+
+def comment_list_version(post_id):
+    statement = select(
+        Post.id, func.max(Comment.updated_at), func.count(Comment.id), *changes('comment')
+    ).select_from(Post).outerjoin(Comment, and_(
+        Comment.post_id == Post.id, Comment.is_visible == True
+    )).where(Post.id == post_id).group_by(Post.id)
+
+    def token(_, last_modified, total, version, changed_at):
+        return changed_at, '%s|%s' % (last_modified, total)
+    return statement, token
+
+
+def category_list_version():
+    statement = select(*changes('category'))
+
+    def token(version, changed_at):
+        return changed_at, '%s' % version
+    return statement, token
+
+
+def comment_page_query(post_id, position, limit):
+    """Una sola consulta: el post (para el 404 y el total desnormalizado)
+    con la página de comentarios unida por LEFT JOIN. El orden va por el
+    índice (post_id, is_visible, created_at, id)."""
+    join_on = [Comment.post_id == Post.id, Comment.is_visible == True]
+    if position:
+        join_on.append(position_condition(Comment.created_at, Comment.id, *position, descending=False))
+    return (select(Post.comment_count, Comment)
+            .select_from(Post)
+            .outerjoin(Comment, and_(*join_on))
+            .where(Post.id == post_id)
+            .order_by(Comment.created_at.asc(), Comment.id.asc())
+            .limit(limit + 1))
+
+
+def comment_page(rows, limit):
+    """Respuesta de GET /api/posts/<id>/comments a partir de las filas de comment_page_query"""
+    comments, next_cursor = split_page([comment for _, comment in rows if comment is not None], limit)
+    return {
+        "items": comment_serializer.dump_many(comments),
+        "next_cursor": next_cursor,
+        "total": rows[0][0]
+    }
+
+
 #### AUTENTICACIÓN ####
 
 class UserRegisterAPI(MethodView):
     """Endpoint para registro de nuevos usuarios"""
+    @rate_limit('register', '5/minute')
     def post(self):
         try:
             data = RegisterSchema().load(request.json)
         except ValidationError as err:
             return {"error": err.messages}, 400
         
-        if User.query.filter_by(email=data['email']).first():
+        # Los usuarios borrados conservan el email hasta la purga
+        if User.query.filter_by(email=data['email']).execution_options(include_deleted=True).first():
             return jsonify({"error": "Email ya está en uso"}), 400
         
         # Crear usuario
@@ -59,18 +231,25 @@ class UserRegisterAPI(MethodView):
         db.session.add(new_user)
         db.session.flush()
         
-        # Hash de contraseña y crear credenciales
-        password_hash = bcrypt_sha256.hash(data['password'])
+        # Hash de contraseña (en el pool de procesos) y crear credenciales
+        try:
+            password_hash = hasher.hash(data['password'])
+        except HashingBusy as err:
+            db.session.rollback()
+            return {"error": str(err)}, 429, {"Retry-After": "1"}
         credentials = UserCredential(
             user_id=new_user.id, 
             password_hash=password_hash
         )  
         db.session.add(credentials)
+        stats.user_created(new_user)
         db.session.commit()
-        return UserSchema().dump(new_user), 201
+        return user_serializer.dump(new_user), 201
     
 class LoginAPI(MethodView):
     """Endpoint para autenticación de usuarios"""
+    # Cada intento calcula un bcrypt: se limita por IP
+    @rate_limit('login', '10/minute')
     def post(self):
         try:
             data = LoginSchema().load(request.json)
@@ -83,19 +262,32 @@ class LoginAPI(MethodView):
         if not user or not user.credential:
             return {"error": "Credenciales inválidas"}, 401
         
-        # Verificar contraseña
-        if not bcrypt_sha256.verify(data["password"], user.credential.password_hash):
-            return {"error": "Credenciales inválidas"}, 401
+        # Verificar contraseña (en el pool de procesos)
+        try:
+            if not hasher.verify(data["password"], user.credential.password_hash):
+                return {"error": "Credenciales inválidas"}, 401
+        except HashingBusy as err:
+            return {"error": str(err)}, 429, {"Retry-After": "1"}
         
         # Verificar que el usuario esté activo
         if not user.is_active:
             return {"error": "Usuario desactivado"}, 401
 
+        # Regenerar el hash si cambió el costo configurado (BCRYPT_ROUNDS)
+        if hasher.needs_update(user.credential.password_hash):
+            try:
+                user.credential.password_hash = hasher.hash(data["password"])
+                db.session.commit()
+            except HashingBusy:
+                # No es crítico: se reintenta en el próximo login
+                db.session.rollback()
+
         # Crear token JWT con claims adicionales
         additional_claims = {
             "email": user.email,
             "role": user.role,
-            "name": user.name
+            "name": user.name,
+            "ver": user.token_version
         }
         identity = str(user.id)
         token = create_access_token(
@@ -110,13 +302,42 @@ class LoginAPI(MethodView):
 class PostListAPI(MethodView):
     """Endpoints para listar y crear posts"""
 
-    # Listar posts
+    # Listar posts (paginado por cursor, con filtros opcionales)
+    @rate_limit('post_list', '120/minute')
+    @read_replica
+    @conditional(query_validator(post_list_version))
+    @cache.cached('post', 'category')
     def get(self):
-        posts = Post.query.filter_by(is_published=True).order_by(Post.created_at.desc()).all()
-        return PostSchema(many=True).dump(posts), 200
+        try:
+            filters = parse_post_filters(request.args)
+        except ValueError:
+            return {"error": "Fecha inválida, usar formato ISO (AAAA-MM-DD)"}, 400
+        try:
+            serializer, load = post_fieldset(request.args.get('fields'))
+        except ValueError as err:
+            return {"error": str(err)}, 400
+
+        query = Post.query.filter(Post.is_published == True, *filters).options(*load)
+
+        # Modo streaming (opcional): todos los posts, sin paginar. Se leen por
+        # cursor porque yield_per no admite el selectinload de las categorías
+        fmt = requested_stream_format()
+        if fmt:
+            return stream_query(query, serializer, fmt, keyset=(Post.created_at, Post.id))
+
+        try:
+            posts, next_cursor = keyset_page(query, Post.created_at, Post.id)
+        except InvalidCursor as err:
+            return {"error": str(err)}, 400
+
+        return {
+            "items": serializer.dump_many(posts),
+            "next_cursor": next_cursor
+        }, 200
     
     # Crear post (requiere estar autenticado)
     @jwt_required()
+    @rate_limit('post_create', '30/minute', moderator=None, admin=None)
     def post(self):
         try:
             data = PostSchema().load(request.json)
@@ -131,6 +352,9 @@ class PostListAPI(MethodView):
             user_id=user_id
         )
         db.session.add(new_post)
+        db.session.flush()
+        stats.post_created(new_post)
+        feed.post_created(new_post)
         db.session.commit()
         
         return {"message": "Post creado", "post_id": new_post.id}, 201
@@ -139,9 +363,12 @@ class PostDetailAPI(MethodView):
     """Endpoints para ver, editar y eliminar posts específicos"""
 
     # Ver post
+    @read_replica
+    @conditional(query_validator(post_detail_version))
+    @cache.cached('post:{post_id}', 'post:bulk', 'category')
     def get(self, post_id):
-        post = Post.query.get_or_404(post_id)
-        return PostSchema().dump(post), 200
+        post = Post.query.options(selectinload(Post.categories)).get_or_404(post_id)
+        return post_serializer.dump(post), 200
     
     # Editar post
     @jwt_required()
@@ -175,10 +402,15 @@ class PostDetailAPI(MethodView):
         if not check_ownership(user_id, post.user_id):
             return {"error": "No autorizado"}, 403
         
-        # Borrar todos los comentarios del post
-        Comment.query.filter_by(post_id=post.id).delete(synchronize_session=False)
+        # Borrado lógico del post y de sus comentarios con un solo UPDATE;
+        # `flask blog purge-deleted` borra las filas más adelante
+        now = datetime.utcnow()
+        removed = Comment.query.filter(
+            Comment.post_id == post.id, Comment.deleted_at.is_(None)
+        ).update({Comment.deleted_at: now}, synchronize_session=False)
 
-        db.session.delete(post)
+        stats.post_deleted(post, removed)
+        post.deleted_at = now
         db.session.commit()
         return {"message": "Post eliminado"}, 200
     
@@ -189,15 +421,26 @@ class CommentListAPI(MethodView):
     """Endpoints para listar y crear comentarios en un post"""
 
     # Listar comentarios existentes
+    @read_replica
+    @conditional(query_validator(comment_list_version))
+    @cache.cached('comment:{post_id}', 'comment:bulk', 'post:{post_id}', 'post:bulk')
     def get(self, post_id):
-        Post.query.get_or_404(post_id)
-        comments = Comment.query.filter_by(post_id=post_id, is_visible=True).all()
-        return CommentSchema(many=True).dump(comments), 200
+        limit = get_page_size()
+        try:
+            position = requested_position()
+        except InvalidCursor as err:
+            return {"error": str(err)}, 400
+
+        rows = db.session.execute(comment_page_query(post_id, position, limit)).all()
+        if not rows:
+            abort(404)
+        return comment_page(rows, limit), 200
     
     # Crear comentario en un post
     @jwt_required()
+    @rate_limit('comment_create', '60/minute', moderator=None, admin=None)
     def post(self, post_id):
-        Post.query.get_or_404(post_id)
+        post = Post.query.get_or_404(post_id)
         
         try:
             data = CommentSchema().load(request.json)
@@ -212,6 +455,8 @@ class CommentListAPI(MethodView):
             post_id=post_id
         )
         db.session.add(new_comment)
+        db.session.flush()
+        stats.comment_created(new_comment, post)
         db.session.commit()
         
         return {"message": "Comentario creado", "comment_id": new_comment.id}, 201
@@ -232,7 +477,8 @@ class CommentDetailAPI(MethodView):
         if comment.user_id != user_id and role not in ['moderator', 'admin']:
             return {"error": "No autorizado"}, 403
         
-        db.session.delete(comment)
+        stats.comment_deleted(comment)
+        comment.deleted_at = datetime.utcnow()
         db.session.commit()
         return {"message": "Comentario eliminado"}, 200
     
@@ -257,15 +503,183 @@ class CommentDetailAPI(MethodView):
             return {"error": err.messages}, 400
     
 
+####  OPERACIONES EN LOTE  ####
+
+def batch_items(data, key, allow_empty=False):
+    """Lista de elementos de un pedido en lote ({key: [...]} o directamente la
+    lista), o un mensaje de error si no es válida"""
+    items = data.get(key) if isinstance(data, dict) else data
+    if not isinstance(items, list) or (not items and not allow_empty):
+        return None, "Se espera una lista no vacía"
+    maximum = current_app.config.get('BATCH_MAX_ITEMS', 100)
+    if len(items) > maximum:
+        return None, "Como máximo %d elementos por pedido" % maximum
+    return items, None
+
+
+def batch_status(results, success=200):
+    """Código de una operación por lotes a partir del de cada elemento: `success`
+    si salieron todos, 207 (Multi-Status) si solo una parte y, si no salió
+    ninguno, el de los elementos cuando es el mismo para todos o si no 400"""
+    failed = {result["status"] for result in results if result["status"] >= 400}
+    if not failed:
+        return success
+    if len(failed) < len({result["status"] for result in results}):
+        return 207
+    return failed.pop() if len(failed) == 1 else 400
+
+
+class PostBatchAPI(MethodView):
+    """Alta de varios posts en una sola petición y una sola transacción"""
+
+    @jwt_required()
+    @rate_limit('post_create', '30/minute', moderator=None, admin=None)
+    def post(self):
+        items, error = batch_items(request.json, 'posts')
+        if error:
+            return {"error": error}, 400
+
+        # Se valida todo junto y se reporta el error de cada elemento por su índice
+        schema = PostSchema(many=True)
+        errors = schema.validate(items)
+        valid = [index for index in range(len(items)) if index not in errors]
+        loaded = schema.load([items[index] for index in valid]) if valid else []
+
+        user_id = int(get_jwt_identity())
+        posts = [Post(title=data['title'], content=data['content'], user_id=user_id) for data in loaded]
+        if posts:
+            # Un solo flush: SQLAlchemy agrupa los INSERT cuando el motor lo permite
+            db.session.add_all(posts)
+            db.session.flush()
+            stats.posts_created(posts)
+            for post in posts:
+                feed.post_created(post)
+            db.session.commit()
+
+        created = dict(zip(valid, posts))
+        results = []
+        for index in range(len(items)):
+            if index in created:
+                results.append({"index": index, "status": 201, "post_id": created[index].id})
+            else:
+                results.append({"index": index, "status": 400, "error": errors[index]})
+
+        return {"results": results, "created": len(posts)}, batch_status(results, 201)
+
+
+class CommentBatchDeleteAPI(MethodView):
+    """Baja de varios comentarios (moderación) en una sola transacción"""
+
+    @jwt_required()
+    def post(self):
+        ids, error = batch_items(request.json, 'ids')
+        if error or not all(isinstance(item, int) for item in ids):
+            return {"error": error or "Los ids deben ser enteros"}, 400
+        ids = list(dict.fromkeys(ids))
+
+        user_id = int(get_jwt_identity())
+        role = get_jwt().get('role')
+
+        # Una sola consulta trae todos los comentarios con sus autores
+        comments = {comment.id: comment for comment in Comment.query.filter(Comment.id.in_(ids))}
+
+        results = []
+        deleted = []
+        for comment_id in ids:
+            comment = comments.get(comment_id)
+            if comment is None:
+                results.append({"id": comment_id, "status": 404, "error": "Comentario no encontrado"})
+            # Mismo permiso que la baja individual: autor, moderador o admin
+            elif not (check_ownership(user_id, comment.user_id) or role == 'moderator'):
+                results.append({"id": comment_id, "status": 403, "error": "No autorizado"})
+            else:
+                results.append({"id": comment_id, "status": 200})
+                deleted.append(comment)
+
+        if deleted:
+            touched_posts = stats.comments_deleted(deleted)
+            now = datetime.utcnow()
+            for comment in deleted:
+                comment.deleted_at = now
+            db.session.commit()
+            # El UPDATE masivo de los contadores no pasa por el ORM: se invalida a mano
+            cache.invalidate('post', *('post:%d' % post_id for post_id in touched_posts))
+
+        return {"results": results, "deleted": len(deleted)}, batch_status(results)
+
+
+class PostCategoriesAPI(MethodView):
+    """Reemplaza las categorías de un post"""
+
+    @jwt_required()
+    def put(self, post_id):
+        post = Post.query.options(selectinload(Post.categories)).get_or_404(post_id)
+        user_id = int(get_jwt_identity())
+
+        # Permiso para el propietario o admin
+        if not check_ownership(user_id, post.user_id):
+            return {"error": "No autorizado"}, 403
+
+        # Una lista vacía quita todas las categorías
+        items, error = batch_items(request.json, 'categories', allow_empty=True)
+        if error:
+            return {"error": error}, 400
+        if not all(isinstance(item, (int, str)) for item in items):
+            return {"error": "Cada categoría debe ser un id o un nombre"}, 400
+
+        # Se resuelven ids y nombres con una sola consulta
+        ids = [item for item in items if isinstance(item, int)]
+        names = [item for item in items if isinstance(item, str)]
+        found = Category.query.filter(or_(Category.id.in_(ids), Category.name.in_(names))).all() if items else []
+        by_id = {category.id: category for category in found}
+        by_name = {category.name: category for category in found}
+
+        current = set(post.categories)
+        wanted = []
+        results = []
+        for item in items:
+            category = by_id.get(item) if isinstance(item, int) else by_name.get(item)
+            if category is None:
+                results.append({"category": item, "status": 404, "error": "Categoría no encontrada"})
+                continue
+            if category not in wanted:
+                wanted.append(category)
+            results.append({"category": item, "status": 200, "change": "unchanged" if category in current else "added"})
+        for category in current - set(wanted):
+            results.append({"category": category.name, "status": 200, "change": "removed"})
+
+        # El flush agrega y quita las filas de post_category con executemany
+        post.categories = wanted
+        post.updated_at = datetime.utcnow()
+        added = [category for category in wanted if category not in current]
+        if added:
+            feed.categories_added(post, added)
+        db.session.commit()
+
+        return {
+            "post_id": post.id,
+            "categories": [category.name for category in post.categories],
+            "results": results
+        }, batch_status(results)
+
+
 ####  CATEGORÍAS  ####
 
 class CategoryListAPI(MethodView):
     """Endpoints para listar y crear categorías"""
 
     # Listar todas las categorías
+    @read_replica
+    @conditional(query_validator(category_list_version))
+    @cache.cached('category')
     def get(self):
-        categories = Category.query.all()
-        return CategorySchema(many=True).dump(categories), 200
+        fmt = requested_stream_format()
+        if fmt:
+            return stream_query(Category.query.order_by(Category.id), category_serializer, fmt)
+
+        # De la base y no de entities.categories: el ETag y el cache de respuestas (quizás
+        # compartido) ya ven las escrituras de otros procesos y el LRU puede ir atrasado
+        return category_serializer.dump_many(Category.query.order_by(Category.id).all()), 200
     
     # Crear nueva categoría (solo admin y moderador)
     @jwt_required()
@@ -276,12 +690,17 @@ class CategoryListAPI(MethodView):
         except ValidationError as err:
             return {"error": err.messages}, 400
         
-        if Category.query.filter_by(name=data['name']).first():
+        if any(category.name == data['name'] for category in entities.categories.all()):
             return {"error": "La categoría ya existe"}, 400
         
         new_category = Category(name=data['name'])
         db.session.add(new_category)
-        db.session.commit()
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Creada por otro proceso después de la última lectura del cache
+            db.session.rollback()
+            return {"error": "La categoría ya existe"}, 400
         
         return {"message": "Categoría creada", "category_id": new_category.id}, 201
 
@@ -309,16 +728,136 @@ class CategoryDetailAPI(MethodView):
     @role_required("admin")
     def delete(self, category_id):
         
-        category = Category.query.get_or_404(category_id)
-        
+        Category.query.get_or_404(category_id)
+
+        # Un solo DELETE: las filas de post_category las borra la base (ON DELETE CASCADE)
         try:
-            db.session.delete(category)
+            db.session.execute(delete(Category).where(Category.id == category_id))
             db.session.commit()
-            return {"message": "Categoría eliminada"}, 200
-        except:
+        except IntegrityError:
+            db.session.rollback()
+            current_app.logger.exception('No se pudo borrar la categoría %d', category_id)
             return {"error": "No es posible borrar la categoría"}, 400
+        return {"message": "Categoría eliminada"}, 200
         
 
+####  SEGUIMIENTOS Y FEED  ####
+
+class UserFollowAPI(MethodView):
+    """Seguir y dejar de seguir a un usuario"""
+
+    @jwt_required()
+    def post(self, user_id):
+        follower_id = int(get_jwt_identity())
+        if follower_id == user_id:
+            return {"error": "No es posible seguirse a uno mismo"}, 400
+        user = User.query.get_or_404(user_id)
+
+        created = feed.follow_user(follower_id, user)
+        db.session.commit()
+        if not created:
+            return {"message": "Ya seguías a este usuario"}, 200
+        return {"message": "Usuario seguido"}, 201
+
+    @jwt_required()
+    def delete(self, user_id):
+        # Solo hace falta el id: alcanza con el resumen del cache de entidades
+        user = entities.users.get_or_404(user_id)
+        if not feed.unfollow_user(int(get_jwt_identity()), user):
+            return {"error": "No seguías a este usuario"}, 404
+        db.session.commit()
+        return {"message": "Dejaste de seguir al usuario"}, 200
+
+
+class CategoryFollowAPI(MethodView):
+    """Seguir y dejar de seguir una categoría"""
+
+    @jwt_required()
+    def post(self, category_id):
+        category = entities.categories.get_or_404(category_id)
+
+        created = feed.follow_category(int(get_jwt_identity()), category)
+        db.session.commit()
+        if not created:
+            return {"message": "Ya seguías esta categoría"}, 200
+        return {"message": "Categoría seguida"}, 201
+
+    @jwt_required()
+    def delete(self, category_id):
+        category = entities.categories.get_or_404(category_id)
+        if not feed.unfollow_category(int(get_jwt_identity()), category):
+            return {"error": "No seguías esta categoría"}, 404
+        db.session.commit()
+        return {"message": "Dejaste de seguir la categoría"}, 200
+
+
+class FeedAPI(MethodView):
+    """Posts de los autores y categorías que sigue el usuario, paginados por cursor"""
+
+    @jwt_required()
+    def get(self):
+        limit = get_page_size()
+        try:
+            position = requested_position()
+            serializer, load = post_fieldset(request.args.get('fields'))
+        except (InvalidCursor, ValueError) as err:
+            return {"error": str(err)}, 400
+
+        entries, next_cursor = split_page(feed.page_entries(int(get_jwt_identity()), position, limit), limit)
+
+        # Los posts de la página en una sola consulta; los borrados o despublicados se omiten
+        posts = Post.query.filter(Post.id.in_([entry.id for entry in entries]), Post.is_published == True) \
+            .options(*load)
+        by_id = {post.id: post for post in posts}
+        return {
+            "items": serializer.dump_many([by_id[entry.id] for entry in entries if entry.id in by_id]),
+            "next_cursor": next_cursor
+        }, 200
+
+
+####  BÚSQUEDA  ####
+
+class SearchAPI(MethodView):
+    """Endpoint de búsqueda de texto sobre posts y comentarios"""
+
+    SEARCHABLE = {
+        'posts': (Post, post_serializer),
+        'comments': (Comment, comment_serializer)
+    }
+
+    @rate_limit('search', '60/minute')
+    def get(self):
+        query = request.args.get('q', '').strip()
+        if not query:
+            return {"error": "Falta el parámetro q"}, 400
+
+        kind = request.args.get('type', 'posts')
+        if kind not in self.SEARCHABLE:
+            return {"error": "Tipo inválido, usar posts o comments"}, 400
+
+        try:
+            offset = decode_offset(request.args['cursor']) if 'cursor' in request.args else 0
+        except InvalidCursor as err:
+            return {"error": str(err)}, 400
+        limit = get_page_size()
+
+        ids, total = search_engine.search(kind, query, offset, limit)
+
+        # Se cargan las filas de la página y se respeta el orden por relevancia
+        model, serializer = self.SEARCHABLE[kind]
+        options = [selectinload(Post.categories)] if model is Post else []
+        rows = model.query.options(*options).filter(model.id.in_(ids)).all() if ids else []
+        by_id = {row.id: row for row in rows}
+        items = [by_id[item_id] for item_id in ids if item_id in by_id]
+
+        next_offset = offset + limit
+        return {
+            "items": serializer.dump_many(items),
+            "next_cursor": encode_offset(next_offset) if next_offset < total else None,
+            "total": total
+        }, 200
+
+
 ####  USUARIOS (ADMIN) ####
 
 class UserListAPI(MethodView):
@@ -326,8 +865,12 @@ class UserListAPI(MethodView):
     @jwt_required()
     @role_required("admin")
     def get(self):
+        fmt = requested_stream_format()
+        if fmt:
+            return stream_query(User.query.order_by(User.id), user_serializer, fmt)
+
         users = User.query.all()
-        return UserSchema(many=True).dump(users), 200
+        return user_serializer.dump_many(users), 200
 
 class UserProfileAPI(MethodView):
     """Endpoint para ver el perfil del usuario autenticado"""
@@ -335,7 +878,7 @@ class UserProfileAPI(MethodView):
     def get(self):
         user_id = int(get_jwt_identity())
         user = User.query.get_or_404(user_id)
-        return UserSchema().dump(user), 200
+        return user_serializer.dump(user), 200
 
 
 class UserDetailAPI(MethodView):
@@ -353,17 +896,38 @@ class UserDetailAPI(MethodView):
             return {"error": "No autorizado"}, 403
         
         user = User.query.get_or_404(user_id)
-        return UserSchema().dump(user), 200
+        return user_serializer.dump(user), 200
 
-    # Desactivar un usuario (solo admin)
+    # Dar de baja un usuario con su contenido (solo admin)
     @jwt_required()
     @role_required("admin")
     def delete(self, user_id):
         user = User.query.get_or_404(user_id)
+        touched_posts = stats.user_deleted(user)
+
+        # Borrado lógico con UPDATE masivos: sus posts, los comentarios de
+        # esos posts y sus comentarios en posts ajenos
+        now = datetime.utcnow()
+        own_posts = select(Post.id).where(Post.user_id == user.id)
+        removed_comments = or_(Comment.user_id == user.id, Comment.post_id.in_(own_posts))
+        # El índice de búsqueda borra los comentarios junto con su post
+        record_removals(db.session, 'post', db.session.execute(select(Post.id, Post.id).where(Post.user_id == user.id)))
+        record_removals(db.session, 'comment', db.session.execute(
+            select(Comment.id, Comment.post_id).where(Comment.user_id == user.id, Comment.post_id.not_in(own_posts))
+        ))
+        Comment.query.filter(removed_comments, Comment.deleted_at.is_(None)) \
+            .update({Comment.deleted_at: now}, synchronize_session=False)
+        Post.query.filter(Post.user_id == user.id, Post.deleted_at.is_(None)) \
+            .update({Post.deleted_at: now}, synchronize_session=False)
+
         user.is_active = False
+        user.deleted_at = now
+        revocations.revoke(user)
         db.session.commit()
+        # El UPDATE masivo de los contadores no pasa por el ORM: se invalida a mano
+        cache.invalidate('post', *('post:%d' % post_id for post_id in touched_posts))
 
-        return {"message": "Usuario desactivado"}, 200
+        return {"message": "Usuario eliminado"}, 200
 
 class UserRoleAPI(MethodView):
     """Endpoint para cambiar el rol de un usuario (solo admin)"""
@@ -380,6 +944,8 @@ class UserRoleAPI(MethodView):
             return {"error": "Rol inválido"}, 400
         
         user.role = data['role']
+        # El rol viaja en el token: se invalidan los emitidos con el rol anterior
+        revocations.revoke(user)
         db.session.commit()
         
         return {"message": "Rol actualizado"}, 200
@@ -391,19 +957,26 @@ class StatsAPI(MethodView):
     """Endpoint para obtener estadísticas del sistema (admin y moderador)"""
     @jwt_required()
     @role_required("admin", "moderator")
+    @read_replica
     def get(self):
         claims = get_jwt()
         role = claims.get('role')
         
-        stats = {
-            'total_posts': Post.query.count(),
-            'total_comments': Comment.query.count(),
-            'total_users': User.query.count()
+        # Totales desnormalizados (ver stats.py)
+        totals = db.session.get(SiteStats, 1) or SiteStats(total_posts=0, total_comments=0, total_users=0)
+        result = {
+            'total_posts': totals.total_posts,
+            'total_comments': totals.total_comments,
+            'total_users': totals.total_users
         }
         
         if role == 'admin':
             from datetime import datetime, timedelta
-            last_week = datetime.utcnow() - timedelta(days=7)
-            stats['posts_last_week'] = Post.query.filter(Post.created_at >= last_week).count()
-        
-        return jsonify(stats), 200
\ No newline at end of file
+            last_week = (datetime.utcnow() - timedelta(days=7)).date()
+            result['posts_last_week'] = db.session.query(
+                func.coalesce(func.sum(DailyStats.posts), 0)
+            ).filter(DailyStats.day >= last_week).scalar()
+            result['cache'] = cache.stats()
+            result['entity_cache'] = {'users': entities.users.stats(), 'categories': entities.categories.stats()}
+        
+        return jsonify(result), 200
\ No newline at end of file